@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Aggregations over a parsed MonthModel
+
+Builds day x nozzle and day x frentista tables and provides group-by,
+rolling windows and top-k on them. NumPy is used when installed; the
+same functions fall back to pure Python otherwise and return the same
+values (as lists instead of ndarrays).
+
+Usage: python3 aggregate.py <csv_file> [--window N] [--top K]
+"""
+import argparse
+import re
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+FRENTISTA_LINE = 'Venda Frentistas.'
+
+def fuel_of(nozzle_name):
+    """Fuel part of a nozzle name ('G,C. Bico 01' -> 'G,C')"""
+    return re.split(r'\s*Bico', nozzle_name, maxsplit=1)[0].strip(' ,.:')
+
+def _matrix(rows, width):
+    if not HAVE_NUMPY:
+        return rows
+    # reshape(0, -1) cannot infer the width of a month without valid days
+    return np.array(rows, dtype=float).reshape(len(rows), width) if rows else np.zeros((0, width))
+
+class Table:
+    """Day x name matrix of floats
+
+    days are the row labels (day numbers), names the column labels and
+    data a 2-D ndarray (or a list of row lists without NumPy).
+    """
+
+    def __init__(self, days, names, data):
+        self.days = list(days)
+        self.names = list(names)
+        self.data = data
+
+    def column(self, name):
+        i = self.names.index(name)
+        if HAVE_NUMPY:
+            return self.data[:, i]
+        return [row[i] for row in self.data]
+
+    def row_totals(self):
+        """Total per day"""
+        if HAVE_NUMPY:
+            return self.data.sum(axis=1)
+        return [sum(row) for row in self.data]
+
+    def column_totals(self):
+        """Total per name"""
+        if HAVE_NUMPY:
+            return self.data.sum(axis=0)
+        return [sum(col) for col in zip(*self.data)] if self.data else [0.0] * len(self.names)
+
+    def group_columns(self, key):
+        """New Table whose columns are the sums of columns sharing key(name)"""
+        groups = OrderedDict()
+        for i, name in enumerate(self.names):
+            groups.setdefault(key(name), []).append(i)
+        if HAVE_NUMPY:
+            data = np.stack([self.data[:, idx].sum(axis=1) for idx in groups.values()], axis=1) \
+                if groups else np.zeros((len(self.days), 0))
+        else:
+            data = [[sum(row[i] for i in idx) for idx in groups.values()] for row in self.data]
+        return Table(self.days, groups.keys(), data)
+
+def day_nozzle_table(model, field='venda', valid_only=True):
+    """Day x nozzle table of a NozzleColumns field (venda, litros, ...)
+
+    valid_only skips days without positive venda and litros totals, which
+    are blank or partially filled in the sheets.
+    """
+    names = model.nozzles.names
+    values = getattr(model.nozzles, field)
+    days, rows = [], []
+    for day, block in sorted(model.days.items()):
+        if valid_only and not (block.venda > 0 and block.litros > 0):
+            continue
+        row = [0.0] * len(names)
+        for i in model.nozzle_rows(day):
+            row[model.nozzles.nozzle[i]] += values[i]
+        days.append(day)
+        rows.append(row)
+    return Table(days, names, _matrix(rows, len(names)))
+
+def day_frentista_table(model, line=FRENTISTA_LINE, valid_only=True):
+    """Day x frentista table of one payment line ('Venda Frentistas.', 'Pix', ...)"""
+    names = []
+    for block in model.days.values():
+        if block.frentistas is not None:
+            names.extend(n for n in block.frentistas.names if n and n not in names)
+    index = {name: i for i, name in enumerate(names)}
+
+    days, rows = [], []
+    for day, block in sorted(model.days.items()):
+        if valid_only and not (block.venda > 0 and block.litros > 0):
+            continue
+        row = [0.0] * len(names)
+        if block.frentistas is not None:
+            values = block.frentistas.rows.get(line)
+            if values is not None:
+                for name, value in zip(block.frentistas.names, values):
+                    if name:
+                        row[index[name]] += value
+        days.append(day)
+        rows.append(row)
+    return Table(days, names, _matrix(rows, len(names)))
+
+def group_sum(keys, values):
+    """Sum values by key, keeping first-seen key order"""
+    if HAVE_NUMPY:
+        # Keys may be tuples such as (year, month), so codes are assigned in Python
+        codes = OrderedDict()
+        inverse = np.fromiter((codes.setdefault(key, len(codes)) for key in keys), dtype=np.intp)
+        sums = np.bincount(inverse, weights=np.asarray(values, dtype=float), minlength=len(codes))
+        return OrderedDict((key, float(sums[code])) for key, code in codes.items())
+    totals = OrderedDict()
+    for key, value in zip(keys, values):
+        totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+def rolling_mean(values, window):
+    """Trailing mean over window values; the first window-1 entries average what is available"""
+    if window < 1:
+        raise ValueError("window must be >= 1")
+    if HAVE_NUMPY:
+        values = np.asarray(values, dtype=float)
+        sums = np.cumsum(values)
+        sums[window:] = sums[window:] - sums[:-window]
+        counts = np.minimum(np.arange(1, len(values) + 1), window)
+        return sums / counts
+    result = []
+    total = 0.0
+    for i, value in enumerate(values):
+        total += value
+        if i >= window:
+            total -= values[i - window]
+        result.append(total / min(i + 1, window))
+    return result
+
+def top_k(labels, values, k):
+    """The k largest (label, value) pairs, largest first"""
+    if HAVE_NUMPY:
+        values = np.asarray(values, dtype=float)
+        # Stable sort so ties keep day order, as in the pure-Python path
+        idx = np.argsort(-values, kind='stable')[:max(k, 0)]
+        return [(labels[i], float(values[i])) for i in idx]
+    return sorted(zip(labels, values), key=lambda item: item[1], reverse=True)[:k]
+
+def main():
+    from month_model import load_csv_model
+
+    parser = argparse.ArgumentParser(description='Per-nozzle, per-fuel and per-frentista aggregates')
+    parser.add_argument('csv_file')
+    parser.add_argument('--window', type=int, default=7, help='Rolling window in days (default: 7)')
+    parser.add_argument('--top', type=int, default=5, help='Number of top days (default: 5)')
+    args = parser.parse_args()
+
+    model = load_csv_model(args.csv_file)
+    venda = day_nozzle_table(model, 'venda')
+    litros = day_nozzle_table(model, 'litros')
+    print(f"Backend: {'numpy' if HAVE_NUMPY else 'pure python'}, {len(venda.days)} valid days")
+
+    print("\nPer fuel:")
+    fuel_venda = venda.group_columns(fuel_of)
+    fuel_litros = litros.group_columns(fuel_of)
+    for name, v, lt in zip(fuel_venda.names, fuel_venda.column_totals(), fuel_litros.column_totals()):
+        print(f"  {name:<12} {lt:>12,.2f} L  R$ {v:>14,.2f}")
+
+    print("\nPer nozzle:")
+    for name, v in zip(venda.names, venda.column_totals()):
+        print(f"  {name:<16} R$ {v:>14,.2f}")
+
+    daily = venda.row_totals()
+    print(f"\nDaily sales with {args.window}-day rolling mean:")
+    for day, v, mean in zip(venda.days, daily, rolling_mean(daily, args.window)):
+        print(f"  Day {day:02d}: R$ {v:>12,.2f}   mean R$ {mean:>12,.2f}")
+
+    print(f"\nTop {args.top} days:")
+    for day, v in top_k(venda.days, daily, args.top):
+        print(f"  Day {day:02d}: R$ {v:,.2f}")
+
+    frentistas = day_frentista_table(model)
+    print(f"\nPer frentista ({FRENTISTA_LINE}):")
+    for name, v in zip(frentistas.names, frentistas.column_totals()):
+        print(f"  {name:<20} R$ {v:>14,.2f}")
+
+if __name__ == '__main__':
+    main()
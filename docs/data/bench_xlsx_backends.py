@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Check and benchmark the worksheet XML backends of xlsx_to_csv
+
+Every sheet of every workbook is decoded with each backend in
+XML_BACKENDS, in the default, sparse and use_dimension modes, and the
+CSV bytes are compared. A small built-in workbook whose cells and rows
+omit the r attribute checks implicit positions against known rows.
+Then each backend is timed over all sheets and reported in cells per
+second. Exits with status 1 when any output differs.
+
+Usage: python3 bench_xlsx_backends.py [workbook.xlsx ...] [--repeat N]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+import zipfile
+
+import instrument
+from xlsx_fixtures import write_raw_workbook
+from xlsx_to_csv import XML_BACKENDS, get_shared_strings, iter_worksheet_rows, list_sheets
+
+DEFAULT_WORKBOOKS = (os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Posto,Jorro, 2026.xlsx'),)
+
+MODES = {
+    'default': {},
+    'sparse': {'sparse': True},
+    'use_dimension': {'use_dimension': True},
+}
+
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+# Row 1 is positioned by r, row 2 follows it implicitly, row 4 has an
+# explicit r again and its cells continue after an explicit C4
+IMPLICIT_SHEET = f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="{_MAIN_NS}"><dimension ref="A1:D4"/><sheetData>
+<row r="1"><c t="s"><v>0</v></c><c><v>1.5</v></c></row>
+<row><c><v>2</v></c><c/><c t="s"><v>1</v></c></row>
+<row r="4"><c r="C4"><v>3</v></c><c><v>4</v></c></row>
+</sheetData></worksheet>'''
+IMPLICIT_ROWS = [
+    ['Caixa', '1.5', '', ''],
+    ['2', '', 'Total.', ''],
+    ['', '', '', ''],
+    ['', '', '3', '4'],
+]
+
+def implicit_workbook():
+    """In-memory .xlsx with the IMPLICIT_SHEET worksheet"""
+    buffer = io.BytesIO()
+    write_raw_workbook(buffer, IMPLICIT_SHEET,
+                       f'<sst xmlns="{_MAIN_NS}"><si><t>Caixa</t></si><si><t>Total.</t></si></sst>',
+                       sheet_name='Implicit')
+    buffer.seek(0)
+    return zipfile.ZipFile(buffer, 'r')
+
+def csv_bytes(rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for row in rows:
+        writer.writerow(row)
+    return output.getvalue().encode('utf-8')
+
+def check_implicit():
+    """Mismatch messages for the implicit position workbook"""
+    failures = []
+    with implicit_workbook() as zf:
+        shared_strings = get_shared_strings(zf)
+        for backend in XML_BACKENDS:
+            rows = list(iter_worksheet_rows(zf, 'Implicit', shared_strings, backend=backend))
+            if rows != IMPLICIT_ROWS:
+                failures.append(f"implicit positions ({backend}): {rows}")
+    return failures
+
+def check_workbook(path):
+    """Mismatch messages for every sheet and mode of a workbook"""
+    failures = []
+    with zipfile.ZipFile(path, 'r') as zf:
+        shared_strings = get_shared_strings(zf)
+        for name, sheet_file in list_sheets(zf):
+            for mode, options in MODES.items():
+                outputs = {backend: csv_bytes(iter_worksheet_rows(zf, name, shared_strings, sheet_file,
+                                                                  backend=backend, **options))
+                           for backend in XML_BACKENDS}
+                reference = outputs[XML_BACKENDS[0]]
+                for backend, data in outputs.items():
+                    if data != reference:
+                        failures.append(f"{os.path.basename(path)} '{name}' {mode}: "
+                                        f"{backend} differs from {XML_BACKENDS[0]}")
+    return failures
+
+def time_backend(paths, backend, repeat):
+    """(cells, best seconds) to decode every sheet of paths with backend"""
+    best = None
+    cells = 0
+    for _ in range(repeat):
+        instrument.reset()
+        started = time.perf_counter()
+        for path in paths:
+            with zipfile.ZipFile(path, 'r') as zf:
+                shared_strings = get_shared_strings(zf)
+                for name, sheet_file in list_sheets(zf):
+                    for _ in iter_worksheet_rows(zf, name, shared_strings, sheet_file, backend=backend):
+                        pass
+        elapsed = time.perf_counter() - started
+        cells = instrument.summary()['counters'].get('xlsx.cells', 0)
+        best = elapsed if best is None else min(best, elapsed)
+    instrument.reset()
+    return cells, best
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare and time the xlsx worksheet XML backends')
+    parser.add_argument('workbooks', nargs='*', default=list(DEFAULT_WORKBOOKS),
+                        help='Workbooks to check (default: the sample workbook)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing runs per backend, best kept (default: 3)')
+    args = parser.parse_args()
+
+    failures = check_implicit()
+    for path in args.workbooks:
+        failures += check_workbook(path)
+    for failure in failures:
+        print(f"MISMATCH {failure}")
+    print(f"Output check: {'FAILED' if failures else 'identical'} "
+          f"({len(args.workbooks)} workbooks, modes {', '.join(MODES)})")
+
+    print(f"\n{'Backend':<10}{'Cells':>12}{'Seconds':>10}{'Cells/s':>14}")
+    for backend in XML_BACKENDS:
+        cells, seconds = time_backend(args.workbooks, backend, args.repeat)
+        print(f"{backend:<10}{cells:>12,}{seconds:>10.3f}{cells / seconds:>14,.0f}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of the data pipeline on synthetic workbooks
+
+Generates workbooks with synthetic_workbook.py (1..N stations, 1..10
+years) and times each stage: xlsx -> CSV conversion, MonthModel
+parsing, analysis and aggregation, reconciliation and the batched
+frentista migration against an in-memory SQLite database seeded
+with one Fechamento per day. Each run is appended as one JSON line to
+the results file and compared with the previous run of the same size.
+
+Usage: python3 benchmark.py [--stations N] [--years N] [--workers N] [--results PATH]
+"""
+import argparse
+import calendar
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+
+import aggregate
+import migrate_frentista
+from analyze_year import analyze_model
+from db_executor import SqliteExecutor
+from month_model import month_sheets
+from parse_cache import load_sheet_model
+from reconcile import concentrador_mismatches, encerrantes_mensal, fechamento_mensal
+from synthetic_workbook import generate
+from xlsx_to_csv import convert_all_sheets, list_sheets
+
+STAGES = ('generate', 'convert', 'parse', 'analyze', 'reconcile', 'migrate')
+DEFAULT_RESULTS = 'benchmark_results.jsonl'
+
+SCHEMA = '''
+CREATE TABLE "Fechamento" (id INTEGER PRIMARY KEY, data TEXT, total_vendas REAL, posto_id INT);
+CREATE TABLE "FechamentoFrentista" (
+    id INTEGER PRIMARY KEY, fechamento_id INT, frentista_id INT, posto_id INT,
+    valor_cartao_credito REAL DEFAULT 0, valor_cartao_debito REAL DEFAULT 0, valor_nota REAL DEFAULT 0,
+    valor_pix REAL DEFAULT 0, valor_dinheiro REAL DEFAULT 0, valor_moedas REAL DEFAULT 0,
+    baratao REAL DEFAULT 0, encerrante REAL DEFAULT 0
+);
+CREATE UNIQUE INDEX "FechamentoFrentista_fechamento_frentista_key"
+    ON "FechamentoFrentista" (fechamento_id, frentista_id);
+'''
+
+def fake_database(years):
+    """In-memory SQLite executor with one Fechamento per day of the given years"""
+    executor = SqliteExecutor(':memory:')
+    executor.executescript(SCHEMA)
+    rows = [(datetime.date(year, month, day).isoformat(),)
+            for year in years for month in range(1, 13)
+            for day in range(1, calendar.monthrange(year, month)[1] + 1)]
+    executor.executemany('INSERT INTO "Fechamento" (data, total_vendas, posto_id) VALUES (%s, 0, 1)', rows)
+    return executor
+
+class Stage:
+    """Accumulated seconds and processed items of one pipeline stage"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.items = 0
+
+    @contextlib.contextmanager
+    def timing(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def to_dict(self, unit):
+        return {
+            'seconds': round(self.seconds, 4),
+            'items': self.items,
+            'unit': unit,
+            'per_s': round(self.items / self.seconds, 1) if self.seconds else None,
+        }
+
+UNITS = {
+    'generate': 'sheets', 'convert': 'rows', 'parse': 'rows',
+    'analyze': 'months', 'reconcile': 'months', 'migrate': 'records',
+}
+
+def run_benchmark(workdir, stations, years, workers=None, start_year=2026):
+    stages = {name: Stage() for name in STAGES}
+
+    with stages['generate'].timing():
+        workbooks = generate(os.path.join(workdir, 'xlsx'), stations, years, start_year)
+    stages['generate'].items = len(workbooks) * 12
+
+    databases = {}
+    for station, year, path in workbooks:
+        with zipfile.ZipFile(path, 'r') as zip_ref:
+            sheets = month_sheets(name for name, _ in list_sheets(zip_ref))
+
+        csv_dir = os.path.join(workdir, 'csv', f'{station:02d}_{year}')
+        with stages['convert'].timing():
+            results = convert_all_sheets(path, csv_dir, workers)
+        stages['convert'].items += sum(r[2] for r in results)
+
+        for month, sheet_name in sorted(sheets.items()):
+            with stages['parse'].timing():
+                model = load_sheet_model(path, sheet_name)
+            stages['parse'].items += model.row_count
+
+            with stages['analyze'].timing():
+                analyze_model(sheet_name, model)
+                venda = aggregate.day_nozzle_table(model)
+                venda.group_columns(aggregate.fuel_of).column_totals()
+                aggregate.rolling_mean(venda.row_totals(), 7)
+                aggregate.day_frentista_table(model).column_totals()
+            stages['analyze'].items += 1
+
+            with stages['reconcile'].timing():
+                fechamento_mensal(model, year, month)
+                encerrantes_mensal(model)
+                concentrador_mismatches(model)
+            stages['reconcile'].items += 1
+
+            executor = databases.get(station)
+            if executor is None:
+                executor = databases[station] = fake_database(range(start_year, start_year + years))
+            migrate_frentista.executor = executor
+            with stages['migrate'].timing(), contextlib.redirect_stdout(io.StringIO()):
+                totals = migrate_frentista.process_month_batch(
+                    model, sorted(model.days), 'month', f'{month:02d}', str(year), execute=executor.execute)
+            stages['migrate'].items += totals['inserted'] + totals['updated']
+
+    for executor in databases.values():
+        executor.close()
+    return {name: stage.to_dict(UNITS[name]) for name, stage in stages.items()}
+
+def git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+def previous_run(results_path, params):
+    """Last recorded run with the same parameters, or None"""
+    if not os.path.exists(results_path):
+        return None
+    previous = None
+    with open(results_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('params') == params:
+                previous = entry
+    return previous
+
+def print_results(stages, previous=None):
+    print(f"{'Stage':<11}{'Seconds':>10}{'Items':>10}  {'Unit':<8}{'Per second':>14}{'vs prev':>10}")
+    for name, stage in stages.items():
+        delta = ''
+        if previous and name in previous['stages'] and previous['stages'][name]['seconds']:
+            change = stage['seconds'] / previous['stages'][name]['seconds'] - 1
+            delta = f"{change * 100:+.1f}%"
+        per_s = f"{stage['per_s']:,.0f}" if stage['per_s'] else '-'
+        print(f"{name:<11}{stage['seconds']:>10.3f}{stage['items']:>10}  {stage['unit']:<8}{per_s:>14}{delta:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic workbooks')
+    parser.add_argument('--stations', type=int, default=1, help='Number of stations (default: 1)')
+    parser.add_argument('--years', type=int, default=1, choices=range(1, 11), metavar='1-10',
+                        help='Years per station (default: 1)')
+    parser.add_argument('--workers', type=int, default=None, help='Conversion worker processes')
+    parser.add_argument('--results', default=DEFAULT_RESULTS,
+                        help=f'JSON lines file runs are appended to (default: {DEFAULT_RESULTS})')
+    parser.add_argument('--workdir', help='Keep generated files here instead of a temporary directory')
+    parser.add_argument('--label', help='Free-form label stored with the run')
+    args = parser.parse_args()
+
+    params = {'stations': args.stations, 'years': args.years, 'workers': args.workers}
+    started = time.perf_counter()
+    if args.workdir:
+        stages = run_benchmark(args.workdir, args.stations, args.years, args.workers)
+    else:
+        with tempfile.TemporaryDirectory(prefix='posto-bench-') as workdir:
+            stages = run_benchmark(workdir, args.stations, args.years, args.workers)
+
+    previous = previous_run(args.results, params)
+    print_results(stages, previous)
+    if previous:
+        print(f"Compared with {previous['timestamp']} ({previous.get('revision') or 'unknown revision'})")
+
+    entry = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'label': args.label,
+        'python': platform.python_version(),
+        'numpy': aggregate.HAVE_NUMPY,
+        'params': params,
+        'total_s': round(time.perf_counter() - started, 3),
+        'stages': stages,
+    }
+    with open(args.results, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+    print(f"Total {entry['total_s']:.2f}s, recorded in {args.results}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Local checkpoint store for incremental frentista migrations
+
+Keeps, per month and day, a content hash of every frentista payload that
+was written successfully, so later runs only send what changed.
+"""
+import hashlib
+import json
+import os
+import threading
+
+def payload_hash(values):
+    """Stable short hash of a model_frentista_data payload"""
+    encoded = json.dumps(values, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+class CheckpointStore:
+    """JSON-file checkpoint of migrated payload hashes
+
+    Layout: {scope: {"days": {day: {frentista_id: hash}}}} where scope
+    identifies the month being migrated (e.g. "1:2026-01"). The file is
+    rewritten atomically after every committed day. An interrupted run
+    resumes by hash, not by position: every day is checked again, and
+    only payloads whose hash differs from the store are sent. Days may
+    commit out of order (worker threads), and earlier days edited in the
+    sheet are still picked up.
+    """
+
+    def __init__(self, path, scope):
+        self.path = path
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._data = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+        self._entry = self._data.setdefault(scope, {'days': {}})
+
+    def committed_days(self):
+        """Sorted day numbers with at least one committed payload"""
+        with self._lock:
+            return sorted(int(day) for day in self._entry['days'])
+
+    def changed(self, day, hashes):
+        """Return the frentista ids whose hash differs from the checkpoint"""
+        with self._lock:
+            stored = self._entry['days'].get(str(day), {})
+            return [fid for fid, digest in hashes.items() if stored.get(str(fid)) != digest]
+
+    def commit_day(self, day, hashes):
+        """Record the hashes written for a day and persist the store"""
+        with self._lock:
+            stored = self._entry['days'].setdefault(str(day), {})
+            stored.update({str(fid): digest for fid, digest in hashes.items()})
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
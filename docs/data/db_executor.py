@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Pluggable SQL executors for the migration scripts
+
+Every executor takes a query with %s placeholders plus a params list and
+returns the result rows as a list of dicts. Each call is timed. A query
+without params is sent as it is, so a literal % needs no escaping.
+"""
+import json
+import math
+import os
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+
+import instrument
+
+SUPABASE_PROJECT_ID = 'kilndogpsffkgkealkaq'
+
+class QueryError(Exception):
+    """A query failed on the backend"""
+
+def sql_literal(value):
+    """Render a Python value as a SQL literal"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and not math.isfinite(value):
+        # repr() gives nan/inf, which are not SQL; Postgres spells them as strings
+        if math.isnan(value):
+            return "'NaN'::float8"
+        return "'Infinity'::float8" if value > 0 else "'-Infinity'::float8"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def inline_params(query, params):
+    """Substitute %s placeholders with SQL literals (for backends without binding)"""
+    if not params:
+        return query
+    values = iter(params)
+    return re.sub(r'%s', lambda _: sql_literal(next(values)), query)
+
+class QueryExecutor:
+    """Base executor: runs queries and keeps per-query timings"""
+
+    name = 'base'
+
+    def __init__(self, log_queries=False):
+        self.log_queries = log_queries
+        self.timings = []
+        self._timings_lock = threading.Lock()
+
+    def execute(self, query, params=None):
+        started = time.perf_counter()
+        try:
+            # None (not ()) keeps drivers from %-formatting a query without params
+            return self._execute(query, params or None)
+        except Exception:
+            instrument.count(f'db.{self.name}.errors')
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._timings_lock:
+                self.timings.append(elapsed)
+            instrument.add_time(f'db.{self.name}.query', elapsed)
+            instrument.count(f'db.{self.name}.queries')
+            if self.log_queries:
+                first_line = next((line.strip() for line in query.splitlines() if line.strip()), '')
+                print(f"  [{self.name}] {elapsed * 1000:.1f} ms  {first_line[:60]}")
+
+    __call__ = execute
+
+    def _execute(self, query, params):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def summary(self):
+        """Return count, total, mean and max query time in seconds"""
+        with self._timings_lock:
+            timings = list(self.timings)
+        total = sum(timings)
+        return {
+            'backend': self.name,
+            'queries': len(timings),
+            'total_s': total,
+            'mean_s': total / len(timings) if timings else 0.0,
+            'max_s': max(timings) if timings else 0.0,
+        }
+
+    def print_summary(self):
+        stats = self.summary()
+        print(f"Queries ({stats['backend']}): {stats['queries']} in {stats['total_s']:.3f}s "
+              f"(mean {stats['mean_s'] * 1000:.1f} ms, max {stats['max_s'] * 1000:.1f} ms)")
+
+class McpExecutor(QueryExecutor):
+    """Fallback backend: one supabase-mcp-server subprocess per query"""
+
+    name = 'mcp'
+
+    def __init__(self, project_id=SUPABASE_PROJECT_ID, log_queries=False):
+        super().__init__(log_queries)
+        self.project_id = project_id
+
+    def _execute(self, query, params):
+        cmd = [
+            'supabase-mcp-server',
+            'execute_sql',
+            '--project-id', self.project_id,
+            '--query', inline_params(query, params)
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise QueryError(f"Error executing query: {result.stderr}")
+
+        # Parse JSON output
+        try:
+            # Extract the JSON from the output
+            match = re.search(r'<untrusted-data-[0-9a-f-]+>(.*?)</untrusted-data-', result.stdout, re.DOTALL)
+            if match:
+                return json.loads(match.group(1))
+        except json.JSONDecodeError as e:
+            raise QueryError(f"Error parsing JSON: {e}")
+
+        return None
+
+class PostgresExecutor(QueryExecutor):
+    """Direct Postgres backend with a thread-safe connection pool (psycopg2)"""
+
+    name = 'postgres'
+
+    def __init__(self, dsn, min_connections=1, max_connections=4, log_queries=False):
+        super().__init__(log_queries)
+        try:
+            from psycopg2.pool import ThreadedConnectionPool
+            from psycopg2.extras import RealDictCursor
+        except ImportError:
+            raise RuntimeError("The postgres backend needs psycopg2 (pip install psycopg2-binary)")
+
+        self._cursor_factory = RealDictCursor
+        self._pool = ThreadedConnectionPool(min_connections, max_connections, dsn)
+
+    def _execute(self, query, params):
+        conn = self._pool.getconn()
+        try:
+            with conn.cursor(cursor_factory=self._cursor_factory) as cursor:
+                cursor.execute(query, params)
+                rows = [dict(row) for row in cursor.fetchall()] if cursor.description else []
+            conn.commit()
+            return rows
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.putconn(conn)
+
+    def close(self):
+        self._pool.closeall()
+
+class SqliteExecutor(QueryExecutor):
+    """Local SQLite stand-in for testing the migration queries"""
+
+    name = 'sqlite'
+
+    def __init__(self, path, log_queries=False):
+        super().__init__(log_queries)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+    def _execute(self, query, params):
+        with self._lock:
+            cursor = self._conn.execute(query.replace('%s', '?'), params or ())
+            rows = [dict(row) for row in cursor.fetchall()] if cursor.description else []
+            self._conn.commit()
+            return rows
+
+    def executescript(self, script):
+        """Run a multi-statement SQL script, e.g. a schema or a migration file"""
+        with self._lock:
+            self._conn.executescript(script)
+
+    def executemany(self, query, rows):
+        """Run one %s-placeholder query per params tuple and commit once"""
+        with self._lock:
+            self._conn.executemany(query.replace('%s', '?'), rows)
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+BACKENDS = ('mcp', 'postgres', 'sqlite')
+
+def make_executor(backend='mcp', dsn=None, pool_size=4, log_queries=False):
+    """Build an executor by backend name
+
+    dsn defaults to $DATABASE_URL for postgres and is the database path
+    for sqlite.
+    """
+    if backend == 'mcp':
+        return McpExecutor(log_queries=log_queries)
+    if backend == 'postgres':
+        dsn = dsn or os.environ.get('DATABASE_URL')
+        if not dsn:
+            raise ValueError("The postgres backend needs --dsn or DATABASE_URL")
+        return PostgresExecutor(dsn, max_connections=pool_size, log_queries=log_queries)
+    if backend == 'sqlite':
+        if not dsn:
+            raise ValueError("The sqlite backend needs --dsn <database path>")
+        return SqliteExecutor(dsn, log_queries=log_queries)
+    raise ValueError(f"Unknown backend '{backend}'")
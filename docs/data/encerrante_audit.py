@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Audit nozzle readings (encerrantes) across months and years
+
+Every day block lists each nozzle's Inicial and Fechamento readings, the
+litres sold and the price. The readings of a nozzle must chain: a day's
+Inicial is the Fechamento of the previous recorded day, also across
+month and year boundaries, and Litros is Fechamento - Inicial. All
+readings of the given workbooks are loaded into one set of contiguous
+columns (Readings) and every check runs as a single pass over them,
+vectorized with NumPy when it is installed:
+
+    continuity        Inicial differs from the nozzle's previous Fechamento
+    arithmetic        Litros differs from Fechamento - Inicial
+    rollback          Fechamento is below Inicial
+    price_jump        Valor LT $ changed by more than --price-jump since the previous reading
+    concentrador_gap  |Concentrador x Frentista| of a day exceeds --max-gap
+
+The workbooks must belong to one posto; their year is read from the file
+name ('Posto,Jorro, 2026.xlsx') or given with --year.
+
+Usage: python3 encerrante_audit.py <xlsx_or_csv> [...] [--year 2026] [--limit N] [--csv anomalies.csv]
+"""
+import argparse
+import calendar
+import csv
+import datetime
+import os
+import re
+import sys
+import time
+import zipfile
+from array import array
+
+import instrument
+from month_model import month_sheets
+from parse_cache import load_month_model, load_sheet_model, open_cache
+from reconcile import nozzle_number
+from xlsx_to_csv import list_sheets
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+ANOMALY_KINDS = ('continuity', 'arithmetic', 'rollback', 'price_jump', 'concentrador_gap')
+
+DEFAULT_TOLERANCE = 0.01
+DEFAULT_PRICE_JUMP = 0.10
+DEFAULT_MAX_GAP = 100.0
+
+YEAR_RE = re.compile(r'(?<!\d)(\d{4})(?!\d)')
+
+class Readings:
+    """Recorded nozzle readings and day totals of several months as parallel columns
+
+    Nozzle columns hold one entry per (day, nozzle) with a Fechamento
+    reading; day columns one entry per day with sales. Dates are stored
+    as proleptic ordinals, nozzles as indexes into names (one per bico
+    number, so 'G,C. Bico 01' and 'G,C.Bico 01' are the same nozzle).
+    """
+
+    __slots__ = ('date', 'nozzle', 'inicial', 'fechamento', 'litros', 'preco',
+                 'day_date', 'diferenca', 'names', '_codes')
+
+    def __init__(self):
+        self.date = array('i')
+        self.nozzle = array('i')
+        self.inicial = array('d')
+        self.fechamento = array('d')
+        self.litros = array('d')
+        self.preco = array('d')
+        self.day_date = array('i')
+        self.diferenca = array('d')
+        self.names = []
+        self._codes = {}
+
+    def add_month(self, model, year, month):
+        """Append the day blocks of a MonthModel"""
+        nozzles = model.nozzles
+        last_day = calendar.monthrange(year, month)[1]
+        for day, block in sorted(model.days.items()):
+            if day > last_day:
+                # The sheets are copied from a 31-day template
+                continue
+            ordinal = datetime.date(year, month, day).toordinal()
+            if block.venda > 0:
+                self.day_date.append(ordinal)
+                self.diferenca.append(block.diferenca)
+            for i in model.nozzle_rows(day):
+                # A blank day still carries the previous inicial with fechamento 0
+                if nozzles.fechamento[i] <= 0:
+                    continue
+                name = nozzles.names[nozzles.nozzle[i]]
+                key = nozzle_number(name)
+                code = self._codes.get(key)
+                if code is None:
+                    code = self._codes[key] = len(self.names)
+                    self.names.append(name)
+                self.date.append(ordinal)
+                self.nozzle.append(code)
+                self.inicial.append(nozzles.inicial[i])
+                self.fechamento.append(nozzles.fechamento[i])
+                self.litros.append(nozzles.litros[i])
+                self.preco.append(nozzles.preco[i])
+
+    def __len__(self):
+        return len(self.date)
+
+def source_year(path, default=None):
+    """Year of a workbook from the last 4-digit number of its file name, else default"""
+    years = YEAR_RE.findall(os.path.basename(path))
+    if years:
+        return int(years[-1])
+    if default is None:
+        raise ValueError(f"{path}: no year in the file name; give --year")
+    return int(default)
+
+def source_months(path, month=None):
+    """(month, sheet name or None) of a source; a CSV source is one month"""
+    if not path.lower().endswith('.xlsx'):
+        if month is None:
+            raise ValueError(f"{path}: a CSV source needs --month")
+        return [(month, None)]
+    with zipfile.ZipFile(path, 'r') as zip_ref:
+        return sorted(month_sheets(name for name, _ in list_sheets(zip_ref)).items())
+
+@instrument.timed('audit.load')
+def load_readings(sources, default_year=None, month=None, cache=None):
+    """Readings of every month of sources, which must not overlap"""
+    readings = Readings()
+    seen = set()
+    for path in sources:
+        year = source_year(path, default_year)
+        for number, sheet in source_months(path, month):
+            if (year, number) in seen:
+                raise ValueError(f"{path}: {year}-{number:02d} is already loaded from another source")
+            seen.add((year, number))
+            model = load_sheet_model(path, sheet, cache) if sheet else load_month_model(path, cache)
+            readings.add_month(model, year, number)
+    instrument.count('audit.readings', len(readings))
+    return readings
+
+def _numpy_checks(r, tolerance, price_jump, max_gap):
+    date = np.frombuffer(r.date, dtype=np.int32)
+    nozzle = np.frombuffer(r.nozzle, dtype=np.int32)
+    inicial = np.frombuffer(r.inicial)
+    fechamento = np.frombuffer(r.fechamento)
+    litros = np.frombuffer(r.litros)
+    preco = np.frombuffer(r.preco)
+    # Chronological per nozzle; the previous reading of order[k] is order[k - 1]
+    order = np.lexsort((date, nozzle))
+    same = nozzle[order[1:]] == nozzle[order[:-1]]
+    cur, prev = order[1:], order[:-1]
+
+    found = []
+    idx = np.nonzero(same & (np.abs(inicial[cur] - fechamento[prev]) > tolerance))[0]
+    found.append(('continuity', cur[idx], inicial[cur[idx]], fechamento[prev[idx]], date[prev[idx]]))
+    idx = np.nonzero(np.abs(fechamento - inicial - litros) > tolerance)[0]
+    found.append(('arithmetic', idx, litros[idx], fechamento[idx] - inicial[idx], None))
+    idx = np.nonzero(fechamento < inicial)[0]
+    found.append(('rollback', idx, fechamento[idx], inicial[idx], None))
+    # A price of 0 is a blank Valor LT $ cell, not a price
+    priced = same & (preco[cur] > 0) & (preco[prev] > 0)
+    idx = np.nonzero(priced & (np.abs(preco[cur] - preco[prev]) > price_jump * preco[prev]))[0]
+    found.append(('price_jump', cur[idx], preco[cur[idx]], preco[prev[idx]], date[prev[idx]]))
+
+    anomalies = []
+    for kind, rows, values, expected, previous in found:
+        for k, i in enumerate(rows.tolist()):
+            anomalies.append((kind, r.date[i], r.names[r.nozzle[i]], float(values[k]), float(expected[k]),
+                              None if previous is None else int(previous[k])))
+
+    diferenca = np.frombuffer(r.diferenca)
+    for i in np.nonzero(np.abs(diferenca) > max_gap)[0].tolist():
+        anomalies.append(('concentrador_gap', r.day_date[i], None, r.diferenca[i], 0.0, None))
+    return anomalies
+
+def _python_checks(r, tolerance, price_jump, max_gap):
+    anomalies = []
+    order = sorted(range(len(r)), key=lambda i: (r.nozzle[i], r.date[i]))
+    prev = None
+    for i in order:
+        name = r.names[r.nozzle[i]]
+        if prev is not None and r.nozzle[prev] == r.nozzle[i]:
+            if abs(r.inicial[i] - r.fechamento[prev]) > tolerance:
+                anomalies.append(('continuity', r.date[i], name, r.inicial[i], r.fechamento[prev], r.date[prev]))
+            if r.preco[i] > 0 and r.preco[prev] > 0 and abs(r.preco[i] - r.preco[prev]) > price_jump * r.preco[prev]:
+                anomalies.append(('price_jump', r.date[i], name, r.preco[i], r.preco[prev], r.date[prev]))
+        prev = i
+    for i in range(len(r)):
+        name = r.names[r.nozzle[i]]
+        if abs(r.fechamento[i] - r.inicial[i] - r.litros[i]) > tolerance:
+            anomalies.append(('arithmetic', r.date[i], name, r.litros[i], r.fechamento[i] - r.inicial[i], None))
+        if r.fechamento[i] < r.inicial[i]:
+            anomalies.append(('rollback', r.date[i], name, r.fechamento[i], r.inicial[i], None))
+    for date, diferenca in zip(r.day_date, r.diferenca):
+        if abs(diferenca) > max_gap:
+            anomalies.append(('concentrador_gap', date, None, diferenca, 0.0, None))
+    return anomalies
+
+@instrument.timed('audit.check')
+def audit(readings, tolerance=DEFAULT_TOLERANCE, price_jump=DEFAULT_PRICE_JUMP, max_gap=DEFAULT_MAX_GAP):
+    """Anomalies of readings as (kind, date ordinal, nozzle name, value, expected, previous date ordinal)
+
+    previous is the date of the reading compared against (continuity and
+    price_jump), nozzle name is None for day-level kinds. Sorted by kind,
+    date and nozzle.
+    """
+    checks = _numpy_checks if HAVE_NUMPY else _python_checks
+    anomalies = checks(readings, tolerance, price_jump, max_gap)
+    rank = {kind: i for i, kind in enumerate(ANOMALY_KINDS)}
+    anomalies.sort(key=lambda a: (rank[a[0]], a[1], a[2] or ''))
+    return anomalies
+
+def _date(ordinal):
+    return datetime.date.fromordinal(ordinal).isoformat() if ordinal else ''
+
+def describe(anomaly):
+    kind, date, name, value, expected, previous = anomaly
+    if kind == 'continuity':
+        return (f"{_date(date)} {name}: Inicial {value:,.3f} != Fechamento {expected:,.3f} of {_date(previous)} "
+                f"({value - expected:+,.3f})")
+    if kind == 'arithmetic':
+        return f"{_date(date)} {name}: Litros {value:,.3f} != Fechamento - Inicial {expected:,.3f}"
+    if kind == 'rollback':
+        return f"{_date(date)} {name}: Fechamento {value:,.3f} < Inicial {expected:,.3f}"
+    if kind == 'price_jump':
+        return f"{_date(date)} {name}: Valor LT $ {expected:.2f} ({_date(previous)}) -> {value:.2f}"
+    return f"{_date(date)}: Concentrador x Frentista R$ {value:,.2f}"
+
+def print_report(readings, anomalies, limit):
+    """Count per kind and month, then the largest anomalies of each kind"""
+    first = _date(min(readings.date)) if len(readings) else '-'
+    last = _date(max(readings.date)) if len(readings) else '-'
+    print(f"{len(readings)} readings of {len(readings.names)} nozzles and {len(readings.day_date)} days, "
+          f"{first} to {last}")
+
+    # One column per month, or per year when the anomalies span more than twelve months
+    width = 7 if len({_date(a[1])[:7] for a in anomalies}) <= 12 else 4
+    periods = sorted({_date(a[1])[:width] for a in anomalies})
+    counts = {}
+    for anomaly in anomalies:
+        key = (anomaly[0], _date(anomaly[1])[:width])
+        counts[key] = counts.get(key, 0) + 1
+    print(f"\n{'Kind':<18}{'Total':>7}  " + ' '.join(f"{p:>7}" for p in periods))
+    for kind in ANOMALY_KINDS:
+        total = sum(n for (k, _), n in counts.items() if k == kind)
+        print(f"{kind:<18}{total:>7}  " + ' '.join(f"{counts.get((kind, p), 0) or '.':>7}" for p in periods))
+
+    for kind in ANOMALY_KINDS:
+        items = [a for a in anomalies if a[0] == kind]
+        if not items:
+            continue
+        items.sort(key=lambda a: abs(a[3] - a[4]), reverse=True)
+        print(f"\n{kind} ({len(items)}, largest first):")
+        for anomaly in items[:limit]:
+            print(f"  {describe(anomaly)}")
+        if len(items) > limit:
+            print(f"  ... {len(items) - limit} more")
+
+def write_csv(anomalies, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['kind', 'date', 'nozzle', 'value', 'expected', 'previous_date'])
+        for kind, date, name, value, expected, previous in anomalies:
+            writer.writerow([kind, _date(date), name or '', value, expected, _date(previous)])
+
+def main():
+    parser = argparse.ArgumentParser(description='Check nozzle reading continuity and anomalies across years')
+    parser.add_argument('sources', nargs='+', help='Workbooks (or monthly CSVs) of one posto, in any order')
+    parser.add_argument('--year', type=int, help='Year of sources without one in the file name')
+    parser.add_argument('--month', type=int, help='Month of a CSV source')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Litres ignored in continuity and arithmetic checks (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--price-jump', type=float, default=DEFAULT_PRICE_JUMP,
+                        help=f'Relative price change reported (default: {DEFAULT_PRICE_JUMP})')
+    parser.add_argument('--max-gap', type=float, default=DEFAULT_MAX_GAP,
+                        help=f'Concentrador x Frentista amount reported, in R$ (default: {DEFAULT_MAX_GAP})')
+    parser.add_argument('--limit', type=int, default=10, help='Anomalies listed per kind (default: 10)')
+    parser.add_argument('--csv', metavar='PATH', help='Also write every anomaly to a CSV file')
+    parser.add_argument('--cache-dir', help='Parse cache directory (default: $POSTO_CACHE_DIR, off if unset)')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrument.run('encerrante_audit', args):
+        started = time.perf_counter()
+        try:
+            readings = load_readings(args.sources, args.year, args.month, open_cache(args.cache_dir))
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        loaded = time.perf_counter()
+        anomalies = audit(readings, args.tolerance, args.price_jump, args.max_gap)
+        checked = time.perf_counter()
+
+        print_report(readings, anomalies, args.limit)
+        if args.csv:
+            write_csv(anomalies, args.csv)
+            print(f"\nWrote {len(anomalies)} anomalies to {args.csv}")
+        print(f"\nLoaded in {loaded - started:.2f}s, checked in {(checked - loaded) * 1000:.1f}ms "
+              f"({'numpy' if HAVE_NUMPY else 'pure python'})")
+
+if __name__ == '__main__':
+    main()
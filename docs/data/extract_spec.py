@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Declarative extraction of daily and monthly metrics from a caixa sheet
+
+A spec is a list of Field entries, each naming a metric and saying where
+its value sits: the label that marks the row (and the column the label is
+in), and the value column, either fixed or found from a header cell of
+the same block ('Caixa.', 'Venda  bico R$.', ...). compile_spec() turns
+the list into lookup tables once; Extractor.extract() then reads every
+metric of every day and summary block in a single pass over the rows and
+reports the fields whose label (or header) a block did not have. Blocks
+are found with month_model.block_key, the same split parse_month uses.
+
+Usage: python3 extract_spec.py <csv_or_xlsx> [sheet]
+"""
+import csv
+import sys
+
+import instrument
+from month_model import CARD_TAXA, CARD_TOTAL, LABEL_COL, NOZZLE_LITROS, block_key, cell_text
+
+# Value column sentinel: first non-blank cell right of the label
+NEXT = 'next'
+
+# Block kinds a field applies to
+DAY = 'day'
+SUMMARY = 'summary'
+ANY = (DAY, SUMMARY)
+
+class Field:
+    """Where one metric is read from
+
+    label is matched against the stripped cell at label_col (any column
+    when label_col is None). The value comes from column, from the column
+    of the block's header cell equal to header, or with column=NEXT from
+    the first non-blank cell after the label. Blank cells read as 0.0; a
+    non-numeric value leaves the metric unset.
+    """
+
+    __slots__ = ('name', 'label', 'label_col', 'column', 'header', 'scope')
+
+    def __init__(self, name, label, label_col=LABEL_COL, column=None, header=None, scope=ANY):
+        if (column is None) == (header is None):
+            raise ValueError(f"{name}: give exactly one of column and header")
+        self.name = name
+        self.label = label
+        self.label_col = label_col
+        self.column = column
+        self.header = header
+        self.scope = scope
+
+    def __repr__(self):
+        where = f"header {self.header!r}" if self.header else f"column {self.column}"
+        return f"Field({self.name!r}, {self.label!r} -> {where})"
+
+# Metrics of the monthly caixa layout shared by the day and summary blocks
+MONTH_SPEC = (
+    Field('venda_concentrador', 'Total.', header='Venda  bico R$.'),
+    Field('litros', 'Total.', column=NOZZLE_LITROS),
+    Field('cartao_total', 'Total', column=CARD_TOTAL),
+    Field('taxas_cartao', 'Total.', label_col=7, column=CARD_TAXA),
+    Field('total_liquido', 'Total.', label_col=7, header='Total Liquido', scope=(SUMMARY,)),
+    Field('venda_frentistas', 'Venda Frentistas.', header='Caixa.'),
+    Field('falta', 'Falta.', header='Caixa.'),
+    Field('salarios', 'Salario Pago', header='Caixa.', scope=(SUMMARY,)),
+    Field('diferenca', 'Concentrador x Frentista', label_col=None, column=NEXT),
+)
+
+def _number(value):
+    """Float of a text or typed cell; blank is 0.0, anything non-numeric None"""
+    if value is None:
+        return 0.0
+    if value.__class__ is float:
+        return value
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    if not text:
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+class Extraction:
+    """Metrics per block plus the fields each block was missing
+
+    days maps day number -> {metric: value}, summaries maps (first, last)
+    -> {metric: value}; missing lists (block key, field name) pairs.
+    Blocks where no field matched at all (days not filled in yet) are
+    listed in empty instead of adding every field to missing.
+    """
+
+    def __init__(self):
+        self.days = {}
+        self.summaries = {}
+        self.missing = []
+        self.empty = []
+        self.row_count = 0
+
+    def month_summary(self):
+        """Metrics of the summary covering the most days (the month), or None"""
+        if not self.summaries:
+            return None
+        return self.summaries[max(self.summaries, key=lambda k: (k[1], k[1] - k[0]))]
+
+    def missing_labels(self, fields):
+        """{field name: number of blocks without it} for reporting"""
+        counts = {}
+        for _, name in self.missing:
+            counts[name] = counts.get(name, 0) + 1
+        return {f.name: counts[f.name] for f in fields if f.name in counts}
+
+class Extractor:
+    """A spec compiled into per-column label tables"""
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        names = [f.name for f in self.fields]
+        if len(set(names)) != len(names):
+            raise ValueError("Field names must be unique")
+        # {label_col: {label: [field, ...]}}; label_col None means any column
+        self._by_col = {}
+        self._anywhere = {}
+        for field in self.fields:
+            table = self._anywhere if field.label_col is None else self._by_col.setdefault(field.label_col, {})
+            table.setdefault(field.label, []).append(field)
+        self._headers = frozenset(f.header for f in self.fields if f.header)
+
+    def extract(self, rows):
+        """Read every field of every block in one pass over rows
+
+        Cells may be text (CSV, iter_worksheet_rows) or typed values
+        (iter_typed_rows, sheet_store); labels only match text cells.
+        """
+        result = Extraction()
+        kind = key = None
+        values = headers = seen = None
+        i = -1
+
+        def close():
+            if not seen:
+                result.empty.append(key)
+                return
+            for field in self.fields:
+                if kind in field.scope and field.name not in seen:
+                    result.missing.append((key, field.name))
+
+        for i, row in enumerate(rows):
+            opened = block_key(row)
+            if opened is not None:
+                if kind is not None:
+                    close()
+                key = opened
+                if isinstance(key, tuple):
+                    kind = SUMMARY
+                    values = result.summaries[key] = {}
+                else:
+                    kind = DAY
+                    values = result.days[key] = {}
+                headers = {}
+                seen = set()
+                continue
+            if kind is None:
+                continue
+
+            matched = []
+            for col, table in self._by_col.items():
+                if col < len(row):
+                    fields = table.get(cell_text(row[col]))
+                    if fields:
+                        matched.extend((field, col) for field in fields)
+            if self._anywhere or self._headers:
+                for col, cell in enumerate(row):
+                    text = cell_text(cell)
+                    if not text:
+                        continue
+                    if text in self._headers:
+                        headers.setdefault(text, col)
+                    fields = self._anywhere.get(text)
+                    if fields:
+                        matched.extend((field, col) for field in fields)
+
+            for field, label_col in matched:
+                # First matching row of the block wins
+                if kind not in field.scope or field.name in seen:
+                    continue
+                if field.header:
+                    col = headers.get(field.header)
+                    if col is None:
+                        continue
+                    value = _number(row[col] if col < len(row) else None)
+                elif field.column == NEXT:
+                    value = next((_number(v) for v in row[label_col + 1:] if not _blank(v)), 0.0)
+                else:
+                    value = _number(row[field.column] if field.column < len(row) else None)
+                seen.add(field.name)
+                if value is not None:
+                    values[field.name] = value
+
+        if kind is not None:
+            close()
+        result.row_count = i + 1
+        instrument.count('extract.rows', result.row_count)
+        return result
+
+def compile_spec(fields=MONTH_SPEC):
+    """Compile a list of Field entries into an Extractor"""
+    return Extractor(fields)
+
+# MONTH_SPEC is compiled once; extract_month only compiles other specs
+_MONTH_EXTRACTOR = compile_spec(MONTH_SPEC)
+
+@instrument.timed('extract.month')
+def extract_month(rows, fields=MONTH_SPEC):
+    """Metrics of every block of a monthly sheet (rows may be any iterable)"""
+    extractor = _MONTH_EXTRACTOR if fields is MONTH_SPEC else compile_spec(fields)
+    return extractor.extract(rows)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python3 extract_spec.py <csv_or_xlsx> [sheet]")
+        sys.exit(1)
+
+    source = sys.argv[1]
+    if source.lower().endswith('.xlsx'):
+        from parse_cache import load_sheet_rows
+        result = extract_month(load_sheet_rows(source, sys.argv[2] if len(sys.argv) > 2 else 'Mes, 01.'))
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            result = extract_month(csv.reader(f))
+
+    names = [f.name for f in MONTH_SPEC]
+    writer = csv.writer(sys.stdout)
+    writer.writerow(['bloco'] + names)
+    blocks = [(f"{d:02d}", m) for d, m in sorted(result.days.items())]
+    blocks += [(f"{a:02d}-{b:02d}", m) for (a, b), m in sorted(result.summaries.items())]
+    for label, metrics in blocks:
+        writer.writerow([label] + [metrics.get(n, '') for n in names])
+    for name, count in result.missing_labels(MONTH_SPEC).items():
+        print(f"missing: {name} in {count} blocks", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
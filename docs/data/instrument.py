@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Lightweight run instrumentation shared by the data scripts
+
+Named spans accumulate count, total and max wall time; counters
+accumulate integers (rows, cells, queries, ...). Both live in one
+process-wide registry that is cheap enough to leave on. At the end of
+every run the registry is written as a single JSON line (to stderr
+unless --metrics-json names a file), and the whole run can optionally be
+profiled with cProfile.
+
+Usage from a script:
+
+    parser.add_argument(...)
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    with instrument.run('xlsx_to_csv', args):
+        with instrument.span('stage'):
+            ...
+        instrument.count('rows', n)
+"""
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_spans = {}
+_counters = {}
+
+@contextmanager
+def span(name):
+    """Time the enclosed block under name"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - started)
+
+def add_time(name, seconds, calls=1):
+    """Record seconds spent in span name (for time measured elsewhere)"""
+    with _lock:
+        entry = _spans.get(name)
+        if entry is None:
+            _spans[name] = [calls, seconds, seconds]
+        else:
+            entry[0] += calls
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+def count(name, n=1):
+    """Add n to counter name"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def timed(name):
+    """Decorator recording every call of a function under span name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class TimedReader:
+    """File wrapper that records the time spent in read() under a span
+
+    Wrapped around a zip member it separates inflate time from the time
+    spent by the parser consuming the bytes.
+    """
+
+    def __init__(self, fileobj, name):
+        self._fileobj = fileobj
+        self._name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.bytes = 0
+
+    def read(self, size=-1):
+        started = time.perf_counter()
+        data = self._fileobj.read(size)
+        self.seconds += time.perf_counter() - started
+        self.calls += 1
+        self.bytes += len(data)
+        return data
+
+    def close(self):
+        add_time(self._name, self.seconds, self.calls)
+        count(self._name + '.bytes', self.bytes)
+        self.calls = self.bytes = 0
+        self.seconds = 0.0
+        self._fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def merge(other):
+    """Fold a summary() from another process into this registry"""
+    for key, entry in other.get('spans', {}).items():
+        with _lock:
+            mine = _spans.setdefault(key, [0, 0.0, 0.0])
+            mine[0] += entry['calls']
+            mine[1] += entry['total_s']
+            mine[2] = max(mine[2], entry['max_s'])
+    for key, n in other.get('counters', {}).items():
+        count(key, n)
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+def summary(name=None, elapsed=None):
+    """Registry contents as a JSON-serializable dict"""
+    with _lock:
+        spans = {key: {'calls': calls, 'total_s': round(total, 6), 'max_s': round(peak, 6)}
+                 for key, (calls, total, peak) in sorted(_spans.items())}
+        counters = dict(sorted(_counters.items()))
+    result = {'script': name, 'pid': os.getpid(), 'spans': spans, 'counters': counters}
+    if elapsed is not None:
+        result['elapsed_s'] = round(elapsed, 6)
+    return result
+
+def write_summary(path, name=None, elapsed=None):
+    """Write the summary as one JSON line to path ('-' for stderr)"""
+    line = json.dumps(summary(name, elapsed), sort_keys=True)
+    if path == '-':
+        print(line, file=sys.stderr)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+def add_arguments(parser):
+    """Add --profile and --metrics-json to an argparse parser"""
+    parser.add_argument('--profile', metavar='PATH',
+                        help='Profile the run with cProfile and write pstats data to PATH')
+    parser.add_argument('--metrics-json', metavar='PATH', default='-',
+                        help="Write the spans and counters JSON to PATH instead of stderr ('-')")
+
+@contextmanager
+def run(name, args):
+    """Wrap a script run: optional cProfile plus the JSON summary at the end
+
+    The summary goes to args.metrics_json, or to stderr when the script
+    has no such option.
+    """
+    profiler = cProfile.Profile() if getattr(args, 'profile', None) else None
+    started = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        with span(name):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            stats = pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative')
+            stats.print_stats(15)
+        write_summary(getattr(args, 'metrics_json', None) or '-', name, time.perf_counter() - started)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Local read-only service for the dashboard's monthly metrics
+
+Serves the results of get_fechamento_mensal and get_encerrantes_mensal,
+plus day and month aggregates, from a store built once in memory
+instead of re-aggregating Leitura on every dashboard load. The store is
+built either from the workbook (per-day metrics recomputed like
+reconcile.py does) or by pulling both functions from the database:
+
+    GET /rpc/get_fechamento_mensal?p_posto_id=1&p_mes=1&p_ano=2026   same rows as the SQL function
+    GET /rpc/get_encerrantes_mensal?p_posto_id=1&p_mes=1&p_ano=2026
+    GET /dia/2026-01-05                                              one day of get_fechamento_mensal
+    GET /mes?ano=2026&mes=1                                          month totals
+    GET /meses                                                       months in the store
+
+Every response carries an ETag derived from its body and honours
+If-None-Match with 304 Not Modified. Serialized responses are kept in an
+LRU cache. With a workbook the file is watched like watch_workbook.py
+does and only changed month sheets are re-parsed; with --pull the
+months are re-fetched every --pull-interval seconds. Either way only the
+responses of a month whose data actually changed are dropped, so the
+ETags of everything else stay valid.
+
+Usage: python3 metrics_service.py <xlsx_file> [--port 8765]
+       python3 metrics_service.py --pull --backend postgres --year 2026 [--months 1 2 ...]
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import instrument
+from db_executor import BACKENDS, make_executor
+from encerrante_audit import source_year
+from month_model import MONTH_SHEET_RE, parse_month
+from reconcile import DAY_METRICS, encerrantes_mensal, fechamento_mensal, fetch_month
+from watch_workbook import DEFAULT_SETTLE, WorkbookWatcher, sync
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_PULL_INTERVAL = 300.0
+
+# The sheet has no Fechamento status; the SQL function reports the same when none exists
+SHEET_STATUS = 'PENDENTE'
+NOZZLE_FIELDS = ('bico_nome', 'combustivel_nome', 'leitura_inicial', 'leitura_final',
+                 'vendas_registradas', 'diferenca')
+DAY_PATH_RE = re.compile(r'^/dia/(\d{4}-\d{2}-\d{2})$')
+
+def _number(value):
+    # NUMERIC columns arrive as Decimal or str from the database; sheet sums carry float noise
+    return round(float(value or 0), 4)
+
+def day_rows(days):
+    """get_fechamento_mensal rows from {date: metrics} (sheet) or a fetched {date: row}"""
+    rows = []
+    for date, metrics in sorted(days.items()):
+        row = {'dia': date}
+        row.update((metric, _number(metrics.get(metric))) for metric in DAY_METRICS)
+        row['status'] = metrics.get('status') or SHEET_STATUS
+        rows.append(row)
+    return rows
+
+def nozzle_rows(nozzles):
+    """get_encerrantes_mensal rows from {bico number: readings}, in bico order"""
+    rows = []
+    for _, entry in sorted(nozzles.items(), key=lambda item: str(item[0]).zfill(4)):
+        row = {field: entry.get(field) for field in NOZZLE_FIELDS[:2]}
+        row.update((field, _number(entry.get(field))) for field in NOZZLE_FIELDS[2:])
+        rows.append(row)
+    return rows
+
+def month_totals(year, month, days):
+    """Sums of the day metrics of a month"""
+    totals = {'ano': year, 'mes': month, 'dias': len(days)}
+    for metric in DAY_METRICS:
+        totals[metric] = round(sum(row[metric] for row in days), 4)
+    return totals
+
+class MetricsStore:
+    """Precomputed month data plus an LRU of serialized responses
+
+    months maps (year, month) -> {'dias': rows, 'bicos': rows, 'updated':
+    time}. Responses are cached as (etag, body) under their request key,
+    together with the month they were built from, so a refresh only
+    drops the responses of that month.
+    """
+
+    def __init__(self, posto_id, cache_size=DEFAULT_CACHE_SIZE):
+        self.posto_id = posto_id
+        self.cache_size = cache_size
+        self.months = {}
+        self._responses = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def update_month(self, year, month, days, nozzles):
+        """Replace a month's rows; returns the dates whose row changed"""
+        entry = {'dias': day_rows(days), 'bicos': nozzle_rows(nozzles), 'updated': time.time()}
+        with self._lock:
+            old = self.months.get((year, month))
+            old_days = {row['dia']: row for row in old['dias']} if old else {}
+            new_days = {row['dia']: row for row in entry['dias']}
+            changed = sorted(date for date in set(old_days) | set(new_days)
+                             if old_days.get(date) != new_days.get(date))
+            if old is not None and not changed and old['bicos'] == entry['bicos']:
+                return changed
+            self.months[(year, month)] = entry
+            self._generation += 1
+            for key in [key for key, (_, _, owner) in self._responses.items() if owner in ((year, month), None)]:
+                del self._responses[key]
+        instrument.count('service.refreshed_months')
+        return changed
+
+    def month(self, year, month):
+        with self._lock:
+            return self.months.get((year, month))
+
+    def month_list(self):
+        """Sorted [((year, month), entry)], a snapshot safe to read while months refresh"""
+        with self._lock:
+            return sorted(self.months.items())
+
+    def response(self, key, owner, build):
+        """(etag, body) for a request key, from the LRU or built with build()
+
+        build returns the JSON-serializable result, or None when there is
+        nothing to serve (cached as well, until owner is refreshed).
+        owner is the (year, month) the result depends on, or None when it
+        depends on all months.
+        """
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+                instrument.count('service.cache_hits')
+                return cached[0], cached[1]
+            generation = self._generation
+        result = build()
+        if result is None:
+            etag = body = None
+        else:
+            body = json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        with self._lock:
+            if generation != self._generation:
+                # A refresh ran while building; serve the result but do not keep it
+                return etag, body
+            self._responses[key] = (etag, body, owner)
+            while len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+        return etag, body
+
+def _int_param(query, name):
+    values = query.get(name)
+    try:
+        return int(values[0]) if values else None
+    except ValueError:
+        return None
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET handler over the server's MetricsStore"""
+
+    server_version = 'PostoMetrics/1.0'
+    # Keep-alive: every response has a Content-Length (or no body, for 304).
+    # Headers and body are separate writes, so Nagle would delay each reply
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        instrument.count('service.requests')
+        store = self.server.store
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path.rstrip('/') or '/'
+
+        if path in ('/rpc/get_fechamento_mensal', '/rpc/get_encerrantes_mensal'):
+            year, month = _int_param(query, 'p_ano'), _int_param(query, 'p_mes')
+            if year is None or month is None:
+                return self._error(400, 'p_ano and p_mes are required')
+            posto_id = _int_param(query, 'p_posto_id')
+            if posto_id is not None and posto_id != store.posto_id:
+                return self._error(404, f'posto {posto_id} is not served here')
+            field = 'dias' if path.endswith('fechamento_mensal') else 'bicos'
+
+            def build():
+                entry = store.month(year, month)
+                # Like the SQL functions, a month without data is an empty set
+                return entry[field] if entry else []
+            return self._send(store.response((path, year, month), (year, month), build))
+
+        match = DAY_PATH_RE.match(path)
+        if match:
+            try:
+                date = datetime.date.fromisoformat(match.group(1))
+            except ValueError:
+                return self._error(400, f'invalid date {match.group(1)}')
+
+            def build():
+                entry = store.month(date.year, date.month)
+                return next((row for row in entry['dias'] if row['dia'] == date.isoformat()), None) \
+                    if entry else None
+            return self._send(store.response(path, (date.year, date.month), build))
+
+        if path == '/mes':
+            year, month = _int_param(query, 'ano'), _int_param(query, 'mes')
+            if year is None or month is None:
+                return self._error(400, 'ano and mes are required')
+
+            def build():
+                entry = store.month(year, month)
+                return month_totals(year, month, entry['dias']) if entry else None
+            return self._send(store.response((path, year, month), (year, month), build))
+
+        if path == '/meses':
+            def build():
+                return [{'ano': year, 'mes': month, 'dias': len(entry['dias']),
+                         'atualizado': datetime.datetime.fromtimestamp(entry['updated']).isoformat(timespec='seconds')}
+                        for (year, month), entry in store.month_list()]
+            return self._send(store.response(path, None, build))
+
+        if path == '/health':
+            return self._send_body(200, b'{"status":"ok"}')
+        self._error(404, 'not found')
+
+    def _send(self, response):
+        etag, body = response
+        if body is None:
+            return self._error(404, 'no data')
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            instrument.count('service.not_modified')
+            self.send_response(304)
+            self._common_headers(etag)
+            self.end_headers()
+            return
+        self._send_body(200, body, etag)
+
+    def _send_body(self, status, body, etag=None):
+        self.send_response(status)
+        self._common_headers(etag)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _common_headers(self, etag):
+        if etag:
+            self.send_header('ETag', etag)
+        # Browsers must revalidate, which costs a 304 when nothing changed
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', self.server.allow_origin)
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+
+    def _error(self, status, message):
+        self._send_body(status, json.dumps({'error': message}).encode('utf-8'))
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+def sheet_handler(store, year, log=print):
+    """watch_workbook handler that recomputes the metrics of each changed month sheet"""
+    def handle(name, rows):
+        match = MONTH_SHEET_RE.match(name)
+        if not match:
+            return
+        month = int(match.group(1))
+        model = parse_month(rows)
+        changed = store.update_month(year, month, fechamento_mensal(model, year, month), encerrantes_mensal(model))
+        if changed:
+            log(f"{name}: {len(changed)} days changed")
+    return handle
+
+def watch_workbook(store, watcher, year, interval, stop):
+    """Keep store in sync with the workbook of watcher until stop is set"""
+    handlers = [sheet_handler(store, year)]
+    while not stop.is_set():
+        if watcher.settled():
+            sync(watcher, handlers, log=print)
+        stop.wait(interval)
+
+def pull_months(store, execute, year, months):
+    """Fetch months from the database into store; returns {month: changed dates}"""
+    result = {}
+    for month in months:
+        days, nozzles = fetch_month(execute, store.posto_id, year, month)
+        result[month] = store.update_month(year, month, days, nozzles)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve monthly dashboard metrics from a local precomputed store')
+    parser.add_argument('xlsx_file', nargs='?', help='Workbook to build the store from (watched for changes)')
+    parser.add_argument('--pull', action='store_true', help='Build the store from the database functions instead')
+    parser.add_argument('--year', type=int, help='Year of the data (default: from the workbook name)')
+    parser.add_argument('--months', nargs='+', type=int, help='Months to pull (default: 1-12)')
+    parser.add_argument('--posto-id', type=int, default=1, help='Posto id served (default: 1)')
+    parser.add_argument('--backend', choices=BACKENDS, default='mcp', help='Database backend for --pull (default: mcp)')
+    parser.add_argument('--dsn', help='Postgres DSN (default: $DATABASE_URL) or SQLite database path')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f'Serialized responses kept in memory (default: {DEFAULT_CACHE_SIZE})')
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f'Seconds between workbook polls (default: {DEFAULT_POLL_INTERVAL})')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help=f'Seconds a saved workbook must stay unchanged before refreshing (default: {DEFAULT_SETTLE})')
+    parser.add_argument('--pull-interval', type=float, default=DEFAULT_PULL_INTERVAL,
+                        help=f'Seconds between database pulls (default: {DEFAULT_PULL_INTERVAL})')
+    parser.add_argument('--allow-origin', default='*', help='Access-Control-Allow-Origin value (default: *)')
+    parser.add_argument('--access-log', action='store_true', help='Log every request')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    if bool(args.xlsx_file) == args.pull:
+        parser.error('give either a workbook or --pull')
+    if args.pull and args.year is None:
+        parser.error('--pull needs --year')
+    if args.xlsx_file:
+        try:
+            year = source_year(args.xlsx_file, args.year)
+        except ValueError:
+            parser.error(f'no year in the name of {args.xlsx_file}; give --year')
+
+    store = MetricsStore(args.posto_id, args.cache_size)
+    stop = threading.Event()
+    executor = None
+    with instrument.run('metrics_service', args):
+        started = time.perf_counter()
+        if args.pull:
+            executor = make_executor(args.backend, args.dsn)
+            months = args.months or list(range(1, 13))
+            pull_months(store, executor.execute, args.year, months)
+
+            def refresh():
+                while not stop.wait(args.pull_interval):
+                    try:
+                        changed = pull_months(store, executor.execute, args.year, months)
+                    except Exception as e:
+                        print(f"Pull failed: {type(e).__name__}: {e}")
+                        continue
+                    for month, dates in changed.items():
+                        if dates:
+                            print(f"{args.year}-{month:02d}: {len(dates)} days changed")
+        else:
+            # The first sync builds every month; later ones wait for saves to settle
+            watcher = WorkbookWatcher(args.xlsx_file, settle=0)
+            watcher.settled()
+            sync(watcher, [sheet_handler(store, year, log=lambda line: None)])
+            watcher.settle = args.settle
+
+            def refresh():
+                watch_workbook(store, watcher, year, args.interval, stop)
+
+        print(f"Loaded {len(store.months)} months in {time.perf_counter() - started:.2f}s")
+        threading.Thread(target=refresh, name='refresh', daemon=True).start()
+
+        server = ThreadingHTTPServer((args.host, args.port), MetricsHandler)
+        server.store = store
+        server.allow_origin = args.allow_origin
+        server.access_log = args.access_log
+        print(f"Serving posto {args.posto_id} on http://{args.host}:{server.server_port} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Stopped")
+        finally:
+            stop.set()
+            server.server_close()
+            if executor is not None:
+                executor.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,25 @@
 #!/usr/bin/env python3
 """
 Script to migrate frentista closing data from Excel CSV to Supabase
+
+The source is either a monthly CSV (from xlsx_to_csv.py) or the .xlsx
+workbook itself, in which case the month's sheet is streamed straight
+into the parser.
 """
-import csv
+import argparse
+import datetime
 import re
-import subprocess
-import json
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from month_model import FIRST_FRENTISTA_COL, month_sheets
+from parse_cache import load_month_model, load_sheet_model, open_cache
+from xlsx_to_csv import list_sheets
+from db_executor import BACKENDS, McpExecutor, make_executor
+from checkpoint import CheckpointStore, payload_hash
+import instrument
 
 # Mapping of frentista names from Excel to Supabase IDs
 FRENTISTA_MAP = {
@@ -18,16 +32,8 @@ FRENTISTA_MAP = {
     'Elyon': 7
 }
 
-# Mapping of column positions (0-based)
-FRENTISTA_COLS = {
-    'Filip': 3,
-    'Paulo': 4,
-    'Barbra': 5,
-    'Rosimeire': 6,
-    'Sinho': 7,
-    'Nayla': 8,
-    'Elyon': 9
-}
+# Station migrated when no posto_id is given
+DEFAULT_POSTO_ID = 1
 
 # Map Excel row types to database fields
 ROW_TYPES = {
@@ -41,123 +47,141 @@ ROW_TYPES = {
     'Venda Frentistas.': 'encerrante'  # Total vendas frentista
 }
 
-def parse_day_from_header(line):
-    """Extract day number from header like 'Caixa Dia 01 Posto Jorro.'"""
-    match = re.search(r'Caixa Dia (\d+)', line)
-    return int(match.group(1)) if match else None
-
-def read_csv_file(filename):
-    """Read CSV file and return structured data"""
-    data = []
-    with open(filename, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            data.append(row)
-    return data
-
-def extract_frentista_data(data, start_row, end_row):
-    """Extract frentista sales data from a day's section"""
-    frentista_data = {}
-
-    for row in data[start_row:end_row]:
-        if not row or len(row) < 10:
-            continue
-
-        row_type = row[2].strip()
-
-        # Map row type to database field
-        db_field = ROW_TYPES.get(row_type)
-        if not db_field:
-            continue
+# Values closer than this (in R$) are considered unchanged
+MONEY_TOLERANCE = 0.005
 
-        # Extract values for each frentista
-        for frentista_name, col_idx in FRENTISTA_COLS.items():
-            if frentista_name not in frentista_data:
-                frentista_data[frentista_name] = {}
+# Header of the station's own column next to the frentistas ('Posto - P -
+# Jorro', also typed 'POATO P - JORRO'); it is not a frentista
+STATION_COLUMN_RE = re.compile(r'^po[as]to\b', re.IGNORECASE)
 
-            value = row[col_idx].strip() if len(row) > col_idx else ''
-            if value:
-                try:
-                    frentista_data[frentista_name][db_field] = float(value)
-                except ValueError:
-                    frentista_data[frentista_name][db_field] = 0
-            else:
-                frentista_data[frentista_name][db_field] = 0
+def frentista_columns(matrix):
+    """Sheet column of each frentista named in the matrix header row
 
-    return frentista_data
+    Blank header cells and the station's own column are never returned;
+    names missing from a station's frentista map are, so callers can
+    report them.
+    """
+    return {name: FIRST_FRENTISTA_COL + i for i, name in enumerate(matrix.names)
+            if name and not STATION_COLUMN_RE.match(name)}
 
-def find_day_sections(data):
-    """Find the start and end rows for each day"""
-    sections = {}
-    current_day = None
-    start_row = None
+def model_frentista_data(block):
+    """Extract frentista sales data from a parsed MonthModel day block
 
-    for i, row in enumerate(data):
-        if not row:
-            continue
+    Columns come from the block's matrix header, so each sheet can list
+    its frentistas in any order. Every named frentista is returned,
+    whether or not it is mapped to a database id.
+    """
+    frentista_data = {}
+    matrix = block.frentistas
+    if matrix is None:
+        return frentista_data
 
-        day = parse_day_from_header(row[1] if len(row) > 1 else '')
-        if day is not None:
-            if current_day is not None and start_row is not None:
-                sections[current_day] = (start_row, i)
-            current_day = day
-            start_row = i
-
-    # Add last section
-    if current_day is not None and start_row is not None:
-        sections[current_day] = (start_row, len(data))
-
-    return sections
-
-def execute_supabase_query(query):
-    """Execute a Supabase query using MCP server"""
-    cmd = [
-        'supabase-mcp-server',
-        'execute_sql',
-        '--project-id', 'kilndogpsffkgkealkaq',
-        '--query', query
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Error executing query: {result.stderr}")
-        return None
-
-    # Parse JSON output
-    try:
-        # Extract the JSON from the output
-        match = re.search(r'<untrusted-data-[0-9a-f-]+>(.*?)</untrusted-data-', result.stdout, re.DOTALL)
-        if match:
-            return json.loads(match.group(1))
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON: {e}")
+    labels = [(label, field) for label, field in ROW_TYPES.items() if label in matrix.rows]
+    if not labels:
+        return frentista_data
 
-    return None
+    columns = frentista_columns(matrix)
+    for frentista_name, col_idx in columns.items():
+        frentista_data[frentista_name] = {field: matrix.value(label, col_idx) for label, field in labels}
+    return frentista_data
 
-def get_fechamento_id(day, month='01', year='2026'):
+# Active database executor, replaced by main() according to --backend
+executor = McpExecutor()
+
+# Retry policy for failed statements, set by main()
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+def is_idempotent(query):
+    """True when running query twice has the same effect as running it once
+
+    A plain INSERT is not: when the server commits it but the client only
+    sees a timeout, running it again inserts a second row.
+    """
+    words = query.split(None, 1)
+    return not words or words[0].upper() != 'INSERT' or 'ON CONFLICT' in query.upper()
+
+def execute_supabase_query(query, params=None):
+    """Execute a query with %s placeholders on the active executor
+
+    Failed idempotent statements are retried with exponential backoff;
+    a plain INSERT is run once.
+    """
+    retries = RETRIES if is_idempotent(query) else 0
+    for attempt in range(retries + 1):
+        try:
+            return executor.execute(query, params)
+        except Exception:
+            if attempt == retries:
+                raise
+            instrument.count('db.retries')
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+def get_fechamento_id(day, month='01', year='2026', posto_id=DEFAULT_POSTO_ID):
     """Get the fechamento ID for a specific day"""
-    date_str = f"{year}-{month}-{day:02d}"
-    query = f'''
+    date = datetime.date(int(year), int(month), day)
+    query = '''
     SELECT "id", "data", "total_vendas"
     FROM "Fechamento"
-    WHERE "data"::date = '{date_str}'::date
-    AND "posto_id" = 1
+    WHERE "data" >= %s
+    AND "data" < %s
+    AND "posto_id" = %s
     LIMIT 1
     '''
-    result = execute_supabase_query(query)
+    result = execute_supabase_query(query, [date.isoformat(), (date + datetime.timedelta(days=1)).isoformat(),
+                                            posto_id])
     return result[0] if result else None
 
 def get_existing_fechamento_frentista(fechamento_id, frentista_id):
     """Get existing FechamentoFrentista record"""
-    query = f'''
+    query = '''
     SELECT "id", "valor_cartao_credito", "valor_cartao_debito", "valor_nota",
            "valor_pix", "valor_dinheiro", "valor_moedas", "baratao", "encerrante"
     FROM "FechamentoFrentista"
-    WHERE "fechamento_id" = {fechamento_id}
-    AND "frentista_id" = {frentista_id}
+    WHERE "fechamento_id" = %s
+    AND "frentista_id" = %s
     '''
-    result = execute_supabase_query(query)
+    result = execute_supabase_query(query, [fechamento_id, frentista_id])
     return result[0] if result else None
 
+def get_existing_for_fechamentos(fechamento_ids, execute=execute_supabase_query):
+    """Get existing FechamentoFrentista records of many fechamentos in one query
+
+    Returns a dict of (fechamento_id, frentista_id) -> record.
+    """
+    if not fechamento_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(fechamento_ids))
+    query = f'''
+    SELECT "id", "fechamento_id", "frentista_id",
+           "valor_cartao_credito", "valor_cartao_debito", "valor_nota",
+           "valor_pix", "valor_dinheiro", "valor_moedas", "baratao", "encerrante"
+    FROM "FechamentoFrentista"
+    WHERE "fechamento_id" IN ({placeholders})
+    '''
+    result = execute(query, list(fechamento_ids)) or []
+    return {(row['fechamento_id'], row['frentista_id']): row for row in result}
+
+def diff_fields(existing, values, tolerance=MONEY_TOLERANCE):
+    """Return the fields of values that differ from the existing record"""
+    changes = {}
+    for field, value in values.items():
+        if value is None:
+            continue
+        current = existing.get(field)
+        try:
+            current = float(current) if current is not None else 0.0
+        except (TypeError, ValueError):
+            changes[field] = value
+            continue
+        if abs(current - float(value)) > tolerance:
+            changes[field] = value
+    return changes
+
+def format_diff(existing, changes):
+    """Render changed fields as 'field: old -> new'"""
+    return ', '.join(f"{field}: {existing.get(field)} -> {value}" for field, value in sorted(changes.items()))
+
 def update_fechamento_frentista(record_id, fields):
     """Update an existing FechamentoFrentista record"""
     set_clauses = []
@@ -174,16 +198,17 @@ def update_fechamento_frentista(record_id, fields):
     query = f'''
     UPDATE "FechamentoFrentista"
     SET {', '.join(set_clauses)}
-    WHERE "id" = {record_id}
+    WHERE "id" = %s
     '''
+    values.append(record_id)
 
-    execute_supabase_query(query)
+    execute_supabase_query(query, values)
     return True
 
-def insert_fechamento_frentista(fechamento_id, frentista_id, fields):
+def insert_fechamento_frentista(fechamento_id, frentista_id, fields, posto_id=DEFAULT_POSTO_ID):
     """Insert a new FechamentoFrentista record"""
     columns = ['"fechamento_id"', '"frentista_id"', '"posto_id"']
-    values = [fechamento_id, frentista_id, 1]
+    values = [fechamento_id, frentista_id, posto_id]
 
     for field, value in fields.items():
         if value is not None:
@@ -199,84 +224,419 @@ def insert_fechamento_frentista(fechamento_id, frentista_id, fields):
     RETURNING "id"
     '''
 
-    result = execute_supabase_query(query)
+    result = execute_supabase_query(query, values)
     return result[0]['id'] if result else None
 
-def process_day(day, csv_data):
-    """Process a single day's data"""
-    print(f"\n--- Processing Day {day} ---")
+def get_fechamento_ids(month='01', year='2026', execute=execute_supabase_query, posto_id=DEFAULT_POSTO_ID):
+    """Get the fechamento of every day in a month with a single query
 
-    # Get fechamento ID
-    fechamento = get_fechamento_id(day)
-    if not fechamento:
-        print(f"  No fechamento found for day {day}")
-        return
+    Returns a dict of day number -> fechamento row.
+    """
+    next_month = int(month) % 12 + 1
+    next_year = int(year) + (1 if next_month == 1 else 0)
+    query = '''
+    SELECT "id", "data", "total_vendas"
+    FROM "Fechamento"
+    WHERE "data" >= %s
+    AND "data" < %s
+    AND "posto_id" = %s
+    ORDER BY "data", "id"
+    '''
+    result = execute(query, [f'{year}-{int(month):02d}-01', f'{next_year}-{next_month:02d}-01', posto_id]) or []
 
-    print(f"  Fechamento ID: {fechamento['id']}, Total: {fechamento['total_vendas']}")
+    fechamentos = {}
+    for row in result:
+        day = int(str(row['data'])[8:10])
+        # Keep the first fechamento of the day, like get_fechamento_id
+        fechamentos.setdefault(day, row)
+    return fechamentos
 
-    # Find the section for this day in the CSV
-    sections = find_day_sections(csv_data)
-    if day not in sections:
-        print(f"  No CSV section found for day {day}")
-        return
+def build_upsert_query(records, posto_id=DEFAULT_POSTO_ID):
+    """Build one multi-row upsert for (fechamento_id, frentista_id, fields) records
 
-    start_row, end_row = sections[day]
-    frentista_data = extract_frentista_data(csv_data, start_row, end_row)
+    All records must carry the same field names. Returns (query, params).
+    """
+    fields = list(records[0][2])
+    columns = ['"fechamento_id"', '"frentista_id"', '"posto_id"'] + [f'"{f}"' for f in fields]
 
-    # Process each frentista
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    values = []
+    params = []
+    for fechamento_id, frentista_id, record_fields in records:
+        values.append(placeholders)
+        params.extend([fechamento_id, frentista_id, posto_id] + [record_fields[f] for f in fields])
+
+    updates = ', '.join(f'"{f}" = EXCLUDED."{f}"' for f in fields)
+
+    query = f'''
+    INSERT INTO "FechamentoFrentista" ({', '.join(columns)})
+    VALUES {', '.join(values)}
+    ON CONFLICT ("fechamento_id", "frentista_id") DO UPDATE
+    SET {updates}
+    '''
+    return query, params
+
+def upsert_fechamento_frentistas(records, execute=execute_supabase_query, posto_id=DEFAULT_POSTO_ID):
+    """Write FechamentoFrentista records with as few statements as possible
+
+    Records are grouped by their set of fields so each group becomes one
+    multi-row INSERT ... ON CONFLICT DO UPDATE. Returns the number of
+    statements executed.
+    """
+    groups = {}
+    for fechamento_id, frentista_id, fields in records:
+        fields = {k: v for k, v in fields.items() if v is not None}
+        if fields:
+            groups.setdefault(tuple(sorted(fields)), []).append((fechamento_id, frentista_id, fields))
+
+    for group in groups.values():
+        execute(*build_upsert_query(group, posto_id))
+    return len(groups)
+
+def day_payloads(day, model, log=print, stats=None, frentista_map=None):
+    """Return (frentista_name, frentista_id, values) for each mapped frentista of a day
+
+    frentista_map (name -> id) defaults to FRENTISTA_MAP. Empty
+    frentistas are counted as 'skipped' in stats; names missing from the
+    map are logged and counted as 'unknown', so their payments are never
+    dropped silently.
+    """
+    if frentista_map is None:
+        frentista_map = FRENTISTA_MAP
+    frentista_data = model_frentista_data(model.days[day])
+
+    payloads = []
     for frentista_name, values in frentista_data.items():
         if not values:
+            if stats is not None:
+                stats['skipped'] += 1
             continue
 
-        frentista_id = FRENTISTA_MAP.get(frentista_name)
+        frentista_id = frentista_map.get(frentista_name)
         if not frentista_id:
-            print(f"  Unknown frentista: {frentista_name}")
+            log(f"  Unknown frentista: {frentista_name}")
+            if stats is not None:
+                stats['unknown'] += 1
             continue
 
+        payloads.append((frentista_name, frentista_id, values))
+    return payloads
+
+def filter_changed(day, payloads, checkpoint):
+    """Drop payloads whose hash matches the checkpoint
+
+    Returns (changed_payloads, hashes_of_changed, unchanged_count).
+    """
+    hashes = {fid: payload_hash(values) for _, fid, values in payloads}
+    if checkpoint is None:
+        return payloads, hashes, 0
+
+    changed = set(checkpoint.changed(day, hashes))
+    kept = [p for p in payloads if p[1] in changed]
+    return kept, {fid: hashes[fid] for fid in changed}, len(payloads) - len(kept)
+
+def process_month_batch(model, days, scope='day', month='01', year='2026',
+                        execute=execute_supabase_query, workers=1, checkpoint=None,
+                        dry_run=False, posto_id=DEFAULT_POSTO_ID, frentista_map=None, log=print):
+    """Migrate several days with one Fechamento lookup and batched upserts
+
+    scope='day' sends one upsert per day (days run on up to `workers`
+    threads), scope='month' one for all days. With a checkpoint, only
+    payloads that changed since the last run are considered. Existing
+    rows are read up front and only changed columns are sent; dry_run
+    reports the differences without writing. posto_id and frentista_map
+    select the station; log receives every output line. Returns a Counter.
+    """
+    fechamentos = get_fechamento_ids(month, year, execute, posto_id)
+    log(f"Resolved {len(fechamentos)} fechamentos for {year}-{month}")
+
+    # Read current rows once so unchanged records and columns are not rewritten
+    existing_records = get_existing_for_fechamentos([f['id'] for f in fechamentos.values()], execute)
+
+    pending = []
+    pending_written = Counter()
+    pending_hashes = {}
+
+    def process(day, log):
+        stats = Counter()
+        fechamento = fechamentos.get(day)
+        if not fechamento:
+            log(f"  No fechamento found for day {day}")
+            stats['skipped_days'] += 1
+            return stats
+        if day not in model.days:
+            log(f"  No CSV section found for day {day}")
+            stats['skipped_days'] += 1
+            return stats
+
+        payloads = day_payloads(day, model, log, stats, frentista_map)
+        payloads, hashes, unchanged = filter_changed(day, payloads, checkpoint)
+        stats['unchanged'] += unchanged
+        records = []
+        # The upsert does not tell inserts from updates; the existing rows do
+        written = Counter()
+        for frentista_name, fid, values in payloads:
+            existing = existing_records.get((fechamento['id'], fid))
+            if existing is None:
+                if dry_run:
+                    log(f"  + {frentista_name}: insert")
+                records.append((fechamento['id'], fid, values))
+                written['inserted'] += 1
+                continue
+            changes = diff_fields(existing, values)
+            if not changes:
+                stats['unchanged'] += 1
+                continue
+            if dry_run:
+                log(f"  ~ {frentista_name}: {format_diff(existing, changes)}")
+            records.append((fechamento['id'], fid, changes))
+            written['updated'] += 1
+
+        log(f"  Day {day}: {written['inserted']} to insert, {written['updated']} to update, "
+            f"{stats['unchanged']} unchanged (Fechamento ID: {fechamento['id']})")
+        if dry_run:
+            stats.update(written)
+            return stats
+        if not records:
+            # Rows already match the database; remember that so the next run skips the day
+            if checkpoint is not None and hashes:
+                checkpoint.commit_day(day, hashes)
+            return stats
+
+        if scope == 'day':
+            stats['statements'] += upsert_fechamento_frentistas(records, execute, posto_id)
+            stats.update(written)
+            if checkpoint is not None:
+                checkpoint.commit_day(day, hashes)
+        else:
+            pending.extend(records)
+            pending_written.update(written)
+            pending_hashes[day] = hashes
+        return stats
+
+    totals = run_days(days, process, workers if scope == 'day' else 1, log)
+
+    if pending:
+        totals['statements'] += upsert_fechamento_frentistas(pending, execute, posto_id)
+        totals.update(pending_written)
+        if checkpoint is not None:
+            for day, hashes in sorted(pending_hashes.items()):
+                checkpoint.commit_day(day, hashes)
+
+    log(f"Wrote {totals['inserted']} new and {totals['updated']} changed FechamentoFrentista rows "
+        f"in {totals['statements']} statements")
+    return totals
+
+def process_day(day, model, month='01', year='2026', log=print, checkpoint=None,
+                dry_run=False, posto_id=DEFAULT_POSTO_ID, frentista_map=None):
+    """Process a single day's data
+
+    With a checkpoint, frentistas whose payload hash did not change are
+    skipped, and a fully unchanged day costs no database round trip.
+    Existing records only get their changed columns updated; dry_run
+    logs the differences without writing. Returns a Counter of inserted,
+    updated, unchanged and skipped records.
+    """
+    stats = Counter()
+    log(f"\n--- Processing Day {day} ---")
+
+    # Find the section for this day in the CSV
+    if day not in model.days:
+        log(f"  No CSV section found for day {day}")
+        stats['skipped_days'] += 1
+        return stats
+
+    payloads, hashes, unchanged = filter_changed(day, day_payloads(day, model, log, stats, frentista_map),
+                                                 checkpoint)
+    stats['unchanged'] += unchanged
+    if not payloads:
+        if unchanged:
+            log(f"  Unchanged since last run ({unchanged} frentistas)")
+        else:
+            log(f"  No frentista data for day {day}")
+        return stats
+
+    # Get fechamento ID
+    fechamento = get_fechamento_id(day, month, year, posto_id)
+    if not fechamento:
+        log(f"  No fechamento found for day {day}")
+        stats['skipped_days'] += 1
+        return stats
+
+    log(f"  Fechamento ID: {fechamento['id']}, Total: {fechamento['total_vendas']}")
+
+    # Process each changed frentista
+    for frentista_name, frentista_id, values in payloads:
         # Check if record exists
         existing = get_existing_fechamento_frentista(fechamento['id'], frentista_id)
 
         if existing:
-            # Update existing record
-            print(f"  Updating {frentista_name} (ID: {existing['id']})")
-            update_fechamento_frentista(existing['id'], values)
+            changes = diff_fields(existing, values)
+            if not changes:
+                log(f"  Unchanged {frentista_name} (ID: {existing['id']})")
+                stats['unchanged'] += 1
+                continue
+
+            # Update only the changed columns
+            log(f"  Updating {frentista_name} (ID: {existing['id']}): {format_diff(existing, changes)}")
+            if not dry_run:
+                update_fechamento_frentista(existing['id'], changes)
+            stats['updated'] += 1
         else:
             # Insert new record
-            print(f"  Inserting {frentista_name}")
-            insert_fechamento_frentista(fechamento['id'], frentista_id, values)
+            log(f"  Inserting {frentista_name}")
+            if not dry_run:
+                insert_fechamento_frentista(fechamento['id'], frentista_id, values, posto_id)
+            stats['inserted'] += 1
+
+    if checkpoint is not None and not dry_run:
+        checkpoint.commit_day(day, hashes)
+
+    return stats
+
+def run_days(days, process, workers=1, log=print):
+    """Run process(day, log) for each day on a bounded thread pool
+
+    Each day's log lines are buffered and passed to log in day order as
+    soon as that day and all earlier ones have finished. A day that raises is
+    reported and counted as failed. Returns the combined Counter.
+    """
+    def run(day):
+        lines = []
+        try:
+            return process(day, lines.append), lines
+        except Exception as e:
+            lines.append(f"  Day {day} failed: {e}")
+            return Counter(failed_days=1), lines
+
+    totals = Counter()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = [pool.submit(run, day) for day in days]
+        for future in futures:
+            stats, lines = future.result()
+            for line in lines:
+                log(line)
+            totals.update(stats)
+    return totals
+
+def print_run_summary(totals, elapsed):
+    """Print the final counts of a migration run"""
+    print(f"\nSummary: {totals['inserted']} inserted, {totals['updated']} updated, "
+          f"{totals['unchanged']} unchanged, {totals['skipped']} skipped, "
+          f"{totals['unknown']} unknown frentistas, "
+          f"{totals['skipped_days']} days skipped, {totals['failed_days']} days failed "
+          f"in {elapsed:.2f}s")
 
 def main():
-    import sys
-
-    if len(sys.argv) < 2:
-        print("Usage: python3 migrate_frentista.py <csv_file> [day]")
-        print("  csv_file: Path to the CSV file")
-        print("  day: Optional - specific day to process (1-31)")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Migrate frentista closing data from Excel CSV to Supabase')
+    parser.add_argument('source', help='Path to the monthly CSV file or to the .xlsx workbook')
+    parser.add_argument('day', nargs='?', type=int, help='Optional - specific day to process (1-31)')
+    parser.add_argument('--batch', action='store_true',
+                        help='Resolve fechamentos once and write with multi-row upserts')
+    parser.add_argument('--batch-scope', choices=('day', 'month'), default='day',
+                        help='One upsert per day (default) or one for the whole month')
+    parser.add_argument('--month', default='01', help='Month of the CSV (default: 01)')
+    parser.add_argument('--sheet', help='Worksheet of an .xlsx source (default: the --month sheet)')
+    parser.add_argument('--year', default='2026', help='Year of the CSV (default: 2026)')
+    parser.add_argument('--posto-id', type=int, default=DEFAULT_POSTO_ID,
+                        help=f'Posto the data belongs to (default: {DEFAULT_POSTO_ID})')
+    parser.add_argument('--backend', choices=BACKENDS, default='mcp',
+                        help='Database backend: mcp subprocess (default), pooled postgres or local sqlite')
+    parser.add_argument('--dsn', help='Postgres DSN (default: $DATABASE_URL) or SQLite database path')
+    parser.add_argument('--pool-size', type=int, default=4, help='Max pooled Postgres connections')
+    parser.add_argument('--query-timing', action='store_true', help='Print the time of every query')
+    parser.add_argument('--workers', type=int, default=1, help='Days migrated concurrently (default: 1)')
+    parser.add_argument('--retries', type=int, default=3, help='Retries for a failed statement (default: 3)')
+    parser.add_argument('--retry-backoff', type=float, default=0.5,
+                        help='Initial retry delay in seconds, doubled on each attempt (default: 0.5)')
+    parser.add_argument('--checkpoint', metavar='PATH',
+                        help='Checkpoint file; days and frentistas whose data did not change are skipped')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report what would change without writing anything')
+    parser.add_argument('--cache-dir', help='Parse cache directory (default: $POSTO_CACHE_DIR, off if unset)')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrument.run('migrate_frentista', args):
+        migrate(parser, args)
+
+def migrate(parser, args):
+    """Run the migration described by the parsed command line"""
+    global executor, RETRIES, RETRY_BACKOFF
+    RETRIES = args.retries
+    RETRY_BACKOFF = args.retry_backoff
+    # Every worker thread may hold a pooled connection
+    pool_size = max(args.pool_size, args.workers)
+    executor = make_executor(args.backend, args.dsn, pool_size, args.query_timing)
+    try:
+        migrate_month(parser, args)
+    finally:
+        # Also on failure: the postgres pool holds open connections
+        executor.print_summary()
+        executor.close()
 
-    csv_file = sys.argv[1]
-    day = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    print("\n--- Migration complete ---")
 
-    print(f"Reading CSV file: {csv_file}")
-    csv_data = read_csv_file(csv_file)
-    print(f"Total rows: {len(csv_data)}")
+def migrate_month(parser, args):
+    """Load the month and write its days through the global executor"""
+    day = args.day
+    cache = open_cache(args.cache_dir)
+
+    with instrument.span('migrate.load'):
+        if args.source.lower().endswith('.xlsx'):
+            sheet_name = args.sheet
+            if not sheet_name:
+                with zipfile.ZipFile(args.source, 'r') as zip_ref:
+                    sheets = month_sheets(name for name, _ in list_sheets(zip_ref))
+                sheet_name = sheets.get(int(args.month))
+                if sheet_name is None:
+                    parser.error(f"No sheet for month {args.month} in {args.source}; use --sheet")
+            print(f"Reading sheet '{sheet_name}' of {args.source}")
+            model = load_sheet_model(args.source, sheet_name, cache)
+        else:
+            print(f"Reading CSV file: {args.source}")
+            model = load_month_model(args.source, cache)
+    print(f"Total rows: {model.row_count}")
 
-    # Find all days in the CSV
-    sections = find_day_sections(csv_data)
+    # Parse every day block once into typed values
+    sections = model.days
     print(f"Found {len(sections)} days: {sorted(sections.keys())}")
 
-    if day:
-        # Process specific day
-        if day in sections:
-            process_day(day, csv_data)
-        else:
-            print(f"Day {day} not found in CSV")
-    else:
-        # Process all days
-        for d in sorted(sections.keys()):
-            process_day(d, csv_data)
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = CheckpointStore(args.checkpoint, f"{args.posto_id}:{args.year}-{args.month}")
+        committed = checkpoint.committed_days()
+        if committed:
+            print(f"Checkpoint: {len(committed)} days committed; only changed payloads are sent")
 
-    print("\n--- Migration complete ---")
+    started = time.perf_counter()
+
+    if day and day not in sections:
+        print(f"Day {day} not found in CSV")
+        days = []
+    else:
+        # Process a specific day or all days
+        days = [day] if day else sorted(sections.keys())
+
+    with instrument.span('migrate.days'):
+        if args.batch:
+            totals = process_month_batch(model, days, args.batch_scope,
+                                         args.month, args.year, workers=args.workers,
+                                         checkpoint=checkpoint, dry_run=args.dry_run,
+                                         posto_id=args.posto_id)
+        else:
+            totals = run_days(
+                days,
+                lambda d, log: process_day(d, model, args.month, args.year, log, checkpoint,
+                                           args.dry_run, args.posto_id),
+                args.workers,
+            )
+    for key, n in totals.items():
+        instrument.count('migrate.' + key, n)
+
+    print_run_summary(totals, time.perf_counter() - started)
+    if args.dry_run:
+        print("Dry run: nothing was written")
 
 if __name__ == '__main__':
     main()
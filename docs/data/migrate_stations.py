@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Migrate frentista closing data of several stations (postos) at once
+
+Stations are described in a JSON config file, each with its posto_id,
+its source (an .xlsx workbook or one monthly CSV), the year, the months
+to migrate and its own frentista name -> id map:
+
+    {"stations": [
+        {"posto_id": 1, "name": "Jorro", "source": "Posto,Jorro, 2026.xlsx",
+         "year": 2026, "months": [1, 2], "frentistas": {"Filip": 1, "Paulo": 2}}
+    ]}
+
+Relative sources are resolved against the config file's directory. A
+station may be listed once per year, e.g. with one workbook per year.
+months defaults to every monthly sheet of the workbook and frentistas to
+FRENTISTA_MAP. Frentista columns are found from each sheet's header row.
+
+Every (station, month) pair is migrated with process_month_batch on a
+shared thread pool. Stations are isolated from each other: each month
+has its own checkpoint file and log, and a failure is reported for that
+station and month without stopping the others.
+
+Usage: python3 migrate_stations.py <config.json> [--backend ...] [--workers N] [--dry-run]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+import migrate_frentista
+from db_executor import BACKENDS, make_executor
+from migrate_frentista import DEFAULT_POSTO_ID, FRENTISTA_MAP, process_month_batch
+from checkpoint import CheckpointStore
+from month_model import month_sheets
+from parse_cache import load_month_model, load_sheet_model, open_cache
+from xlsx_to_csv import list_sheets
+
+# Counters that count written (or, on a dry run, would-be written) records
+WRITTEN = ('inserted', 'updated')
+
+def load_config(path):
+    """Validated list of station dicts from a JSON config file
+
+    Raises ValueError describing the first invalid station.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+
+    stations = config.get('stations') if isinstance(config, dict) else None
+    if not stations:
+        raise ValueError(f"{path}: no 'stations' list")
+
+    seen = set()
+    result = []
+    for i, entry in enumerate(stations):
+        label = f"{path}: station {i + 1}"
+        if not entry.get('source'):
+            raise ValueError(f"{label}: missing 'source'")
+        posto_id = int(entry.get('posto_id', DEFAULT_POSTO_ID))
+        year = str(entry.get('year', 2026))
+        # Checkpoints and logs are keyed by posto_id and year
+        if (posto_id, year) in seen:
+            raise ValueError(f"{label}: posto_id {posto_id} listed twice for {year}")
+        seen.add((posto_id, year))
+
+        frentistas = entry.get('frentistas', FRENTISTA_MAP)
+        if not isinstance(frentistas, dict) or not all(isinstance(v, int) for v in frentistas.values()):
+            raise ValueError(f"{label}: 'frentistas' must map names to integer ids")
+
+        source = os.path.join(base, entry['source'])
+        months = [int(m) for m in entry.get('months', [])]
+        if not source.lower().endswith('.xlsx') and len(months) != 1:
+            raise ValueError(f"{label}: a CSV source needs exactly one month")
+
+        result.append({
+            'posto_id': posto_id,
+            'name': entry.get('name') or f"posto {posto_id}",
+            'source': source,
+            'year': year,
+            'months': months,
+            'frentistas': frentistas,
+        })
+    return result
+
+def station_months(station, cache=None):
+    """(month, load) for every month of a station, load() returning its MonthModel"""
+    source = station['source']
+    if not source.lower().endswith('.xlsx'):
+        return [(station['months'][0], lambda: load_month_model(source, cache))]
+
+    with zipfile.ZipFile(source, 'r') as zip_ref:
+        sheets = month_sheets(name for name, _ in list_sheets(zip_ref))
+    months = station['months'] or sorted(sheets)
+    missing = [m for m in months if m not in sheets]
+    if missing:
+        raise ValueError(f"{station['name']}: no sheet for months {missing} in {source}")
+    return [(month, lambda sheet=sheets[month]: load_sheet_model(source, sheet, cache)) for month in months]
+
+def checkpoint_path(directory, station, month):
+    return os.path.join(directory, f"posto_{station['posto_id']}_{station['year']}-{month:02d}.json")
+
+def migrate_station_month(station, month, load, execute, scope='day', day_workers=1,
+                          checkpoint_dir=None, dry_run=False):
+    """Migrate one month of one station
+
+    Returns a dict with the log lines, the Counter of the run, its
+    start/end times and the error message if it failed.
+    """
+    lines = []
+    result = {'station': station, 'month': month, 'lines': lines, 'totals': Counter(), 'error': None}
+    result['started'] = time.perf_counter()
+    try:
+        with instrument.span('stations.load'):
+            model = load()
+        checkpoint = None
+        if checkpoint_dir:
+            checkpoint = CheckpointStore(checkpoint_path(checkpoint_dir, station, month),
+                                         f"{station['posto_id']}:{station['year']}-{month:02d}")
+        with instrument.span('stations.migrate'):
+            result['totals'] = process_month_batch(
+                model, sorted(model.days), scope, f'{month:02d}', station['year'], execute,
+                day_workers, checkpoint, dry_run, station['posto_id'], station['frentistas'], lines.append)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        instrument.count('stations.failed_months')
+    result['finished'] = time.perf_counter()
+    return result
+
+def station_throughput(results):
+    """{posto_id: (station, Counter, wall seconds, failed months)} from migrate_station_month results"""
+    grouped = {}
+    for result in results:
+        posto_id = result['station']['posto_id']
+        station, totals, started, finished, failed = grouped.get(
+            posto_id, (result['station'], Counter(), result['started'], result['finished'], 0))
+        totals.update(result['totals'])
+        grouped[posto_id] = (station, totals, min(started, result['started']),
+                             max(finished, result['finished']), failed + bool(result['error']))
+    return {posto_id: (station, totals, finished - started, failed)
+            for posto_id, (station, totals, started, finished, failed) in grouped.items()}
+
+def print_results(results, elapsed):
+    """Print every month's log followed by the per-station throughput table"""
+    for result in results:
+        station = result['station']
+        print(f"\n[{station['name']} #{station['posto_id']}] {station['year']}-{result['month']:02d}")
+        for line in result['lines']:
+            print(f"  {line}")
+        if result['error']:
+            print(f"  FAILED: {result['error']}")
+
+    print(f"\n{'Posto':<24}{'Months':>7}{'Failed':>7}{'Records':>9}{'Unchanged':>10}{'Seconds':>9}{'Rec/s':>9}")
+    overall = Counter()
+    for posto_id, (station, totals, seconds, failed) in sorted(station_throughput(results).items()):
+        records = sum(totals[key] for key in WRITTEN)
+        months = sum(1 for r in results if r['station']['posto_id'] == posto_id)
+        rate = records / seconds if seconds else 0.0
+        print(f"{station['name'][:22] + ' #' + str(posto_id):<24}{months:>7}{failed:>7}{records:>9}"
+              f"{totals['unchanged']:>10}{seconds:>9.2f}{rate:>9.1f}")
+        overall.update(totals)
+    records = sum(overall[key] for key in WRITTEN)
+    print(f"\nTotal: {records} records from {len(results)} station-months in {elapsed:.2f}s "
+          f"({records / elapsed if elapsed else 0.0:.1f} records/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate frentista closing data of several stations')
+    parser.add_argument('config', help='JSON file describing the stations')
+    parser.add_argument('--backend', choices=BACKENDS, default='mcp',
+                        help='Database backend: mcp subprocess (default), pooled postgres or local sqlite')
+    parser.add_argument('--dsn', help='Postgres DSN (default: $DATABASE_URL) or SQLite database path')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Station-months migrated concurrently (default: 4)')
+    parser.add_argument('--day-workers', type=int, default=1,
+                        help='Days of one month upserted concurrently with --batch-scope day (default: 1)')
+    parser.add_argument('--batch-scope', choices=('day', 'month'), default='day',
+                        help='One upsert per day (default) or one per station-month')
+    parser.add_argument('--query-timing', action='store_true', help='Print the time of every query')
+    parser.add_argument('--retries', type=int, default=3, help='Retries for a failed statement (default: 3)')
+    parser.add_argument('--retry-backoff', type=float, default=0.5,
+                        help='Initial retry delay in seconds, doubled on each attempt (default: 0.5)')
+    parser.add_argument('--checkpoint-dir', metavar='DIR',
+                        help='Directory of per-station, per-month checkpoint files')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report what would change without writing anything')
+    parser.add_argument('--cache-dir', help='Parse cache directory (default: $POSTO_CACHE_DIR, off if unset)')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        stations = load_config(args.config)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    with instrument.run('migrate_stations', args):
+        failed = migrate_stations(stations, args)
+    sys.exit(1 if failed else 0)
+
+def migrate_stations(stations, args):
+    """Run the configured migration; returns the number of failed stations and station-months"""
+    migrate_frentista.RETRIES = args.retries
+    migrate_frentista.RETRY_BACKOFF = args.retry_backoff
+    pool_size = args.workers * max(args.day_workers, 1)
+    executor = migrate_frentista.executor = make_executor(args.backend, args.dsn, pool_size, args.query_timing)
+    if args.checkpoint_dir:
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+
+    cache = open_cache(args.cache_dir)
+    tasks = []
+    unreadable = 0
+    for station in stations:
+        try:
+            tasks.extend((station, month, load) for month, load in station_months(station, cache))
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            # Skip only this station; the others still run
+            print(f"[{station['name']} #{station['posto_id']}] FAILED: {e}")
+            unreadable += 1
+    postos = len({station['posto_id'] for station in stations})
+    print(f"Migrating {len(tasks)} station-months of {postos} stations with {args.workers} workers")
+
+    started = time.perf_counter()
+
+    def run(task):
+        station, month, load = task
+        return migrate_station_month(station, month, load, migrate_frentista.execute_supabase_query,
+                                     args.batch_scope, args.day_workers, args.checkpoint_dir, args.dry_run)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(run, tasks))
+
+    print_results(results, time.perf_counter() - started)
+    if args.dry_run:
+        print("Dry run: nothing was written")
+    executor.print_summary()
+    executor.close()
+    return unreadable + sum(1 for result in results if result['error'])
+
+if __name__ == '__main__':
+    main()
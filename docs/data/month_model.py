@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Typed, columnar model of a monthly caixa sheet
+
+Every day block is parsed once: numbers are converted to floats a single
+time and stored in array('d') columns (nozzle readings, card fees) or
+compact per-block matrices (frentista payments). Consumers read typed
+values instead of re-running float() on CSV strings.
+
+Usage: python3 month_model.py <csv_file> [csv_file ...]
+"""
+import csv
+import re
+import sys
+import time
+import tracemalloc
+from array import array
+
+import instrument
+
+HEADER_RE = re.compile(r'Caixa Dia (\d+)(?:\s+a\s+(\d+))?')
+
+# Monthly worksheet names: "Mes, 01.", "MES, 05", ...
+MONTH_SHEET_RE = re.compile(r'^m[eê]s\W*(\d{1,2})', re.IGNORECASE)
+
+# Column positions of the day block layout (0-based)
+HEADER_COL = 1
+LABEL_COL = 2
+FIRST_FRENTISTA_COL = 3
+
+# Nozzle table: Produtos, Inicial, Fechamento, Litros, Valor LT $, Venda bico R$.
+NOZZLE_INICIAL = 3
+NOZZLE_FECHAMENTO = 4
+NOZZLE_LITROS = 5
+NOZZLE_PRECO = 6
+NOZZLE_VENDA = 7
+
+# Card table: name, two acquirers, Total, %, taxa %, taxa R$
+CARD_TOTAL = 5
+CARD_TAXA_PCT = 7
+CARD_TAXA = 8
+
+DIFFERENCE_LABEL = 'Concentrador x Frentista'
+
+def to_float(value):
+    """Convert a sheet cell to float; empty and invalid cells become 0.0
+
+    Typed cells (xlsx_to_csv.iter_typed_rows) are already floats and are
+    returned as they are.
+    """
+    if not value:
+        return 0.0
+    if value.__class__ is float:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def cell_text(value):
+    """Stripped text of a cell; '' for empty and non-text (typed) cells"""
+    return value.strip() if isinstance(value, str) else ''
+
+def block_key(row):
+    """Key of the 'Caixa Dia' block a row opens, or None
+
+    Day blocks ('Caixa Dia 05 ...') give the day number, period summaries
+    ('Caixa Dia 01 a 31 ...') a (first, last) tuple. parse_month and
+    extract_spec both split a sheet into blocks with it.
+    """
+    header = cell_text(row[HEADER_COL]) if len(row) > HEADER_COL else ''
+    match = HEADER_RE.search(header) if header else None
+    if match is None:
+        return None
+    first = int(match.group(1))
+    return (first, int(match.group(2))) if match.group(2) else first
+
+def _cell(row, col):
+    if len(row) <= col:
+        return ''
+    value = row[col]
+    if value.__class__ is str:
+        return value.strip()
+    return '' if value is None else value
+
+class NozzleColumns:
+    """Nozzle readings of every block as parallel columns"""
+
+    __slots__ = ('block', 'nozzle', 'inicial', 'fechamento', 'litros', 'preco', 'venda', 'names')
+
+    def __init__(self):
+        self.block = array('i')
+        self.nozzle = array('i')
+        self.inicial = array('d')
+        self.fechamento = array('d')
+        self.litros = array('d')
+        self.preco = array('d')
+        self.venda = array('d')
+        self.names = []
+
+    def append(self, block, name, row):
+        try:
+            nozzle = self.names.index(name)
+        except ValueError:
+            nozzle = len(self.names)
+            self.names.append(name)
+        self.block.append(block)
+        self.nozzle.append(nozzle)
+        self.inicial.append(to_float(_cell(row, NOZZLE_INICIAL)))
+        self.fechamento.append(to_float(_cell(row, NOZZLE_FECHAMENTO)))
+        self.litros.append(to_float(_cell(row, NOZZLE_LITROS)))
+        self.preco.append(to_float(_cell(row, NOZZLE_PRECO)))
+        self.venda.append(to_float(_cell(row, NOZZLE_VENDA)))
+
+    def __len__(self):
+        return len(self.block)
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.block, self.nozzle, self.inicial, self.fechamento,
+                                                 self.litros, self.preco, self.venda))
+
+class CardColumns:
+    """Card sales and fees of every block as parallel columns"""
+
+    __slots__ = ('block', 'card', 'bruto', 'taxa_pct', 'taxa', 'names')
+
+    def __init__(self):
+        self.block = array('i')
+        self.card = array('i')
+        self.bruto = array('d')
+        self.taxa_pct = array('d')
+        self.taxa = array('d')
+        self.names = []
+
+    def append(self, block, name, row):
+        try:
+            card = self.names.index(name)
+        except ValueError:
+            card = len(self.names)
+            self.names.append(name)
+        self.block.append(block)
+        self.card.append(card)
+        self.bruto.append(to_float(_cell(row, CARD_TOTAL)))
+        self.taxa_pct.append(to_float(_cell(row, CARD_TAXA_PCT)))
+        self.taxa.append(to_float(_cell(row, CARD_TAXA)))
+
+    def __len__(self):
+        return len(self.block)
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.block, self.card, self.bruto, self.taxa_pct, self.taxa))
+
+class FrentistaMatrix:
+    """Frentista payment lines of one block
+
+    names are the header cells from FIRST_FRENTISTA_COL up to the
+    ' Caixa.' column (blank cells kept as ''). rows maps each line label
+    (Pix, Dinheiro, Venda Frentistas., Salario Pago, ...) to one float per
+    column and caixa maps it to the value of the ' Caixa.' column.
+    """
+
+    __slots__ = ('names', 'caixa_col', 'rows', 'caixa')
+
+    def __init__(self, header):
+        # Names span from the first frentista column up to ' Caixa.';
+        # blank header cells keep their position as ''
+        caixa_col = next((c for c in range(FIRST_FRENTISTA_COL, len(header)) if 'Caixa' in cell_text(header[c])),
+                         None)
+        end = caixa_col if caixa_col is not None else len(header)
+        names = [cell_text(cell) for cell in header[FIRST_FRENTISTA_COL:end]]
+        while names and not names[-1]:
+            names.pop()
+        self.names = tuple(names)
+        self.caixa_col = caixa_col
+        self.rows = {}
+        self.caixa = {}
+
+    def add(self, label, row):
+        width = len(self.names)
+        self.rows[label] = array('d', (to_float(_cell(row, FIRST_FRENTISTA_COL + i)) for i in range(width)))
+        if self.caixa_col is not None:
+            self.caixa[label] = to_float(_cell(row, self.caixa_col))
+
+    def value(self, label, col):
+        """Value of a line for the frentista at sheet column col (0.0 if absent)"""
+        values = self.rows.get(label)
+        i = col - FIRST_FRENTISTA_COL
+        if values is None or not 0 <= i < len(values):
+            return 0.0
+        return values[i]
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in self.rows.values())
+
+class DayBlock:
+    """Totals and column ranges of one 'Caixa Dia' block"""
+
+    __slots__ = ('key', 'start', 'end', 'litros', 'venda', 'preco_medio', 'cartao_total', 'taxas',
+                 'diferenca', 'nozzles', 'cards', 'frentistas')
+
+    def __init__(self, key, start):
+        self.key = key
+        self.start = start
+        self.end = start
+        self.litros = 0.0
+        self.venda = 0.0
+        self.preco_medio = 0.0
+        self.cartao_total = 0.0
+        self.taxas = 0.0
+        self.diferenca = 0.0
+        self.nozzles = (0, 0)
+        self.cards = (0, 0)
+        self.frentistas = None
+
+class MonthModel:
+    """Parsed month: day blocks, period summaries and typed columns"""
+
+    def __init__(self):
+        self.blocks = []
+        self.days = {}
+        self.summaries = {}
+        self.nozzles = NozzleColumns()
+        self.cards = CardColumns()
+        self.row_count = 0
+
+    def block(self, key):
+        """DayBlock for a day number or (first, last) summary key"""
+        if isinstance(key, tuple):
+            return self.summaries[key]
+        return self.days[key]
+
+    def nozzle_rows(self, key):
+        """Indexes into self.nozzles for a block"""
+        return range(*self.block(key).nozzles)
+
+    def card_rows(self, key):
+        """Indexes into self.cards for a block"""
+        return range(*self.block(key).cards)
+
+    def nbytes(self):
+        """Approximate size of the numeric storage"""
+        return (self.nozzles.nbytes() + self.cards.nbytes()
+                + sum(b.frentistas.nbytes() for b in self.blocks if b.frentistas is not None))
+
+@instrument.timed('month.parse')
+def parse_month(rows):
+    """Build a MonthModel from an iterable of sheet rows in one pass
+
+    Rows may hold text (CSV, iter_worksheet_rows) or typed values
+    (iter_typed_rows, sheet_store), in which case no number is parsed.
+    When rows are streamed from a worksheet the 'month.parse' span also
+    includes the 'xlsx.rows' time spent producing them.
+    """
+    model = MonthModel()
+    block = None
+    state = None
+    i = -1
+
+    def close(block, end):
+        block.end = end
+        block.nozzles = (block.nozzles[0], len(model.nozzles))
+        block.cards = (block.cards[0], len(model.cards))
+
+    for i, row in enumerate(rows):
+        key = block_key(row)
+        if key is not None:
+            if block is not None:
+                close(block, i)
+            block = DayBlock(key, i)
+            block.nozzles = (len(model.nozzles), len(model.nozzles))
+            block.cards = (len(model.cards), len(model.cards))
+            model.blocks.append(block)
+            if isinstance(key, tuple):
+                model.summaries[key] = block
+            else:
+                model.days[key] = block
+            state = None
+            continue
+
+        if block is None:
+            continue
+
+        slot = len(model.blocks) - 1
+        label = cell_text(row[LABEL_COL]) if len(row) > LABEL_COL else ''
+
+        if DIFFERENCE_LABEL in row:
+            col = row.index(DIFFERENCE_LABEL)
+            block.diferenca = next((to_float(v) for v in row[col + 1:]
+                                    if v is not None and (not isinstance(v, str) or v.strip())), 0.0)
+
+        if state == 'matrix_header':
+            block.frentistas = FrentistaMatrix(row)
+            state = 'matrix'
+            continue
+
+        if label == 'Produtos':
+            state = 'nozzles'
+        elif state == 'nozzles':
+            if label == 'Total.':
+                block.litros = to_float(_cell(row, NOZZLE_LITROS))
+                block.preco_medio = to_float(_cell(row, NOZZLE_PRECO))
+                block.venda = to_float(_cell(row, NOZZLE_VENDA))
+                state = 'after_nozzles'
+            elif label:
+                model.nozzles.append(slot, label, row)
+        elif state == 'after_nozzles' and not label and _cell(row, CARD_TOTAL) == 'Total':
+            state = 'cards'
+        elif state == 'cards':
+            if label == 'Total':
+                block.cartao_total = to_float(_cell(row, CARD_TOTAL))
+                block.taxas = to_float(_cell(row, CARD_TAXA))
+                state = None
+            elif label:
+                model.cards.append(slot, label, row)
+        elif label == 'Venda Frentista':
+            state = 'matrix_header'
+        elif state == 'matrix' and label:
+            block.frentistas.add(label, row)
+
+    if block is not None:
+        close(block, i + 1)
+    model.row_count = i + 1
+    instrument.count('month.rows', model.row_count)
+    return model
+
+def month_sheets(sheet_names):
+    """{month number: sheet name} of the monthly worksheets, first match wins"""
+    months = {}
+    for name in sheet_names:
+        match = MONTH_SHEET_RE.match(name)
+        if match:
+            months.setdefault(int(match.group(1)), name)
+    return months
+
+def load_csv_model(filename):
+    """Parse a monthly CSV straight into a MonthModel"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        return parse_month(csv.reader(f))
+
+def _deep_size(rows):
+    return sys.getsizeof(rows) + sum(sys.getsizeof(r) + sum(sys.getsizeof(c) for c in r) for r in rows)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python3 month_model.py <csv_file> [csv_file ...]")
+        sys.exit(1)
+
+    total_time = 0.0
+    for filename in sys.argv[1:]:
+        with open(filename, 'r', encoding='utf-8') as f:
+            raw_rows = list(csv.reader(f))
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        model = load_csv_model(filename)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        total_time += elapsed
+
+        print(f"{filename}: {len(model.days)} days, {len(model.summaries)} summaries, "
+              f"{len(model.nozzles)} nozzle readings, {len(model.cards)} card lines")
+        print(f"  parse {elapsed * 1000:.1f} ms, peak {peak / 1024:.0f} KiB, "
+              f"numeric columns {model.nbytes() / 1024:.1f} KiB "
+              f"(list-of-lists CSV: {_deep_size(raw_rows) / 1024:.0f} KiB)")
+
+    print(f"Total parse time: {total_time * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
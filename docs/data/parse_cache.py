@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of parsed sheets and months
+
+Parsed results (sheet rows, MonthModel objects) are pickled (protocol 5)
+into a cache directory, keyed by the content hash of the source file plus
+what was parsed from it. The content hash is itself memoized per path,
+size and mtime, so an unchanged file is not even re-read. The directory
+is bounded in size; the least recently used entries are evicted first.
+
+The cache is enabled with --cache-dir on the command line tools or the
+POSTO_CACHE_DIR environment variable.
+
+Usage: python3 parse_cache.py <cache_dir> [--clear]
+"""
+import csv
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+import zipfile
+
+import instrument
+
+# Bump when a cached structure changes shape
+CACHE_VERSION = 1
+CACHE_ENV = 'POSTO_CACHE_DIR'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+FINGERPRINTS_FILE = 'fingerprints.json'
+
+def file_hash(path):
+    """sha256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ParseCache:
+    """Size-bounded LRU directory of pickled parse results"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._fingerprints_path = os.path.join(directory, FINGERPRINTS_FILE)
+        self._fingerprints = {}
+        if os.path.exists(self._fingerprints_path):
+            try:
+                with open(self._fingerprints_path, 'r', encoding='utf-8') as f:
+                    self._fingerprints = json.load(f)
+            except ValueError:
+                self._fingerprints = {}
+
+    def fingerprint(self, path):
+        """Content hash of path, recomputed only when its size or mtime changed"""
+        st = os.stat(path)
+        real = os.path.realpath(path)
+        with self._lock:
+            known = self._fingerprints.get(real)
+            if known and known['size'] == st.st_size and known['mtime_ns'] == st.st_mtime_ns:
+                return known['sha256']
+        digest = file_hash(path)
+        with self._lock:
+            self._fingerprints[real] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+            self._write_json(self._fingerprints_path, self._fingerprints)
+        return digest
+
+    def key(self, path, kind, *parts):
+        """Cache key for what kind of result was parsed from path"""
+        raw = json.dumps([CACHE_VERSION, self.fingerprint(path), kind] + [str(p) for p in parts])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get_or_build(self, path, kind, build, *parts):
+        """Return the cached result for (path, kind, parts) or build and store it"""
+        entry = os.path.join(self.directory, self.key(path, kind, *parts) + '.pkl')
+        try:
+            with open(entry, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(entry)  # mark as recently used
+            self.hits += 1
+            instrument.count('cache.hits')
+            return value
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+        self.misses += 1
+        instrument.count('cache.misses')
+        value = build()
+        tmp_path = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=5)
+        os.replace(tmp_path, entry)
+        self.evict()
+        return value
+
+    def entries(self):
+        """(path, size, last_used) of every cached entry, least recently used first"""
+        result = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                result.append((path, st.st_size, st.st_mtime))
+        result.sort(key=lambda e: e[2])
+        return result
+
+    def evict(self):
+        """Delete least recently used entries until the directory fits max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, sort_keys=True)
+        os.replace(tmp_path, path)
+
+def open_cache(directory=None, max_bytes=DEFAULT_MAX_BYTES):
+    """ParseCache for directory (default: $POSTO_CACHE_DIR), or None when caching is off"""
+    directory = directory or os.environ.get(CACHE_ENV)
+    return ParseCache(directory, max_bytes) if directory else None
+
+def load_csv_rows(filename, cache=None):
+    """All rows of a CSV file as lists of strings"""
+    def build():
+        with open(filename, 'r', encoding='utf-8') as f:
+            return list(csv.reader(f))
+    return cache.get_or_build(filename, 'csv_rows', build) if cache else build()
+
+def load_month_model(filename, cache=None):
+    """MonthModel of a monthly CSV"""
+    from month_model import load_csv_model
+    if cache is None:
+        return load_csv_model(filename)
+    return cache.get_or_build(filename, 'csv_model', lambda: load_csv_model(filename))
+
+def load_sheet_rows(xlsx_file, sheet_name, cache=None, sparse=False, use_dimension=False):
+    """All rows of one worksheet of an xlsx file"""
+    from xlsx_to_csv import get_shared_strings, iter_worksheet_rows
+
+    def build():
+        with zipfile.ZipFile(xlsx_file, 'r') as zip_ref:
+            shared_strings = get_shared_strings(zip_ref)
+            return list(iter_worksheet_rows(zip_ref, sheet_name, shared_strings,
+                                            sparse=sparse, use_dimension=use_dimension))
+    if cache is None:
+        return build()
+    return cache.get_or_build(xlsx_file, 'sheet_rows', build, sheet_name, sparse, use_dimension)
+
+def load_sheet_model(xlsx_file, sheet_name, cache=None):
+    """MonthModel of one monthly worksheet of an xlsx file"""
+    from month_model import parse_month
+    from xlsx_to_csv import get_shared_strings, iter_worksheet_rows
+
+    def build():
+        with zipfile.ZipFile(xlsx_file, 'r') as zip_ref:
+            shared_strings = get_shared_strings(zip_ref)
+            return parse_month(iter_worksheet_rows(zip_ref, sheet_name, shared_strings))
+    if cache is None:
+        return build()
+    return cache.get_or_build(xlsx_file, 'sheet_model', build, sheet_name)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python3 parse_cache.py <cache_dir> [--clear]")
+        sys.exit(1)
+
+    cache = ParseCache(sys.argv[1])
+    if '--clear' in sys.argv[2:]:
+        cache.clear()
+    stats = cache.stats()
+    print(f"{cache.directory}: {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KiB "
+          f"(limit {cache.max_bytes / 1024 / 1024:.0f} MiB)")
+
+if __name__ == '__main__':
+    main()
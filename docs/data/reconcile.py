@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Reconcile the spreadsheet against get_fechamento_mensal / get_encerrantes_mensal
+
+Recomputes from the sheet the same per-day metrics (volume, gross,
+margin-based gross profit, card fees, net profit, volume per fuel) and
+per-nozzle month readings that the two SQL functions return. Each month
+is then diffed against a single result set per function, so a whole
+year is checked with two queries per month.
+
+Margins and card fees follow the CASE tables of
+supabase_migrations/update_get_fechamento_mensal.sql.
+
+Usage: python3 reconcile.py <xlsx_or_csv> --year 2026 [--months 1 2 ...] [--backend ...]
+"""
+import argparse
+import datetime
+import re
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from aggregate import fuel_of
+from db_executor import BACKENDS, make_executor
+from month_model import month_sheets
+from parse_cache import load_month_model, load_sheet_model, open_cache
+from xlsx_to_csv import list_sheets
+
+# CASE c.nome ILIKE ... in get_fechamento_mensal, first match wins
+FUEL_MARGINS = (
+    ('GASOLINA ADITIVADA', 0.1153),
+    ('GASOLINA', 0.1179),
+    ('ETANOL', 0.0902),
+    ('DIESEL', 0.0273),
+)
+DEFAULT_MARGIN = 0.10
+
+# CASE fp.nome ILIKE ... for card fees
+CARD_FEES = (
+    ('DEBITO', 0.012),
+    ('CREDITO', 0.035),
+)
+
+# Sheet fuel prefixes and the Combustivel names they stand for
+SHEET_FUELS = (
+    ('G,A', 'GASOLINA ADITIVADA'),
+    ('G,C', 'GASOLINA COMUM'),
+    ('ETANOL', 'ETANOL'),
+    ('DS', 'DIESEL S10'),
+)
+
+DAY_METRICS = ('volume_total', 'faturamento_bruto', 'lucro_bruto', 'custo_taxas', 'lucro_liquido',
+               'vol_gasolina', 'vol_aditivada', 'vol_etanol', 'vol_diesel')
+NOZZLE_METRICS = ('leitura_inicial', 'leitura_final', 'vendas_registradas', 'diferenca')
+
+FRENTISTA_CONCENTRADOR = 'Venda Concentrador'
+DEFAULT_TOLERANCE = 0.01
+
+def _fold(text):
+    """Upper-case without accents, so 'Crédito' and 'CREDITO' compare equal like ILIKE would intend"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).upper()
+
+def combustivel_name(nozzle_name):
+    """Combustivel-style fuel name of a sheet nozzle ('G,A.Bico 02' -> 'GASOLINA ADITIVADA')"""
+    fuel = _fold(fuel_of(nozzle_name))
+    for prefix, name in SHEET_FUELS:
+        if fuel.startswith(prefix):
+            return name
+    return fuel
+
+def fuel_margin(fuel_name):
+    folded = _fold(fuel_name)
+    return next((margin for key, margin in FUEL_MARGINS if key in folded), DEFAULT_MARGIN)
+
+def fuel_volume_column(fuel_name):
+    """Breakdown column of get_fechamento_mensal the fuel's volume goes to"""
+    folded = _fold(fuel_name)
+    if 'ADITIVADA' in folded:
+        return 'vol_aditivada'
+    if 'GASOLINA' in folded:
+        return 'vol_gasolina'
+    if 'ETANOL' in folded:
+        return 'vol_etanol'
+    if 'DIESEL' in folded:
+        return 'vol_diesel'
+    return None
+
+def card_fee_rate(line):
+    folded = _fold(line)
+    return next((rate for key, rate in CARD_FEES if key in folded), 0.0)
+
+def nozzle_number(name):
+    """Bico number from a sheet or database nozzle name ('G,C. Bico 01', 'Bico 1')"""
+    match = re.search(r'(\d+)\s*$', name or '')
+    return int(match.group(1)) if match else name
+
+def _recorded(model, i):
+    # A blank day still carries the previous inicial with fechamento 0
+    return model.nozzles.fechamento[i] > 0
+
+def fechamento_mensal(model, year, month):
+    """{date: metrics} for every day of the sheet with nozzle readings"""
+    result = {}
+    nozzles = model.nozzles
+    for day, block in sorted(model.days.items()):
+        rows = [i for i in model.nozzle_rows(day) if _recorded(model, i)]
+        if not rows:
+            continue
+        metrics = dict.fromkeys(DAY_METRICS, 0.0)
+        for i in rows:
+            fuel = combustivel_name(nozzles.names[nozzles.nozzle[i]])
+            metrics['volume_total'] += nozzles.litros[i]
+            metrics['faturamento_bruto'] += nozzles.venda[i]
+            metrics['lucro_bruto'] += nozzles.venda[i] * fuel_margin(fuel)
+            column = fuel_volume_column(fuel)
+            if column:
+                metrics[column] += nozzles.litros[i]
+        if block.frentistas is not None:
+            metrics['custo_taxas'] = sum(value * card_fee_rate(line)
+                                         for line, value in block.frentistas.caixa.items())
+        metrics['lucro_liquido'] = metrics['lucro_bruto'] - metrics['custo_taxas']
+        result[datetime.date(int(year), int(month), day).isoformat()] = metrics
+    return result
+
+def encerrantes_mensal(model):
+    """{bico number: readings} over the month, like get_encerrantes_mensal"""
+    result = {}
+    nozzles = model.nozzles
+    for day in sorted(model.days):
+        for i in model.nozzle_rows(day):
+            if not _recorded(model, i):
+                continue
+            name = nozzles.names[nozzles.nozzle[i]]
+            entry = result.setdefault(nozzle_number(name), {
+                'bico_nome': name,
+                'combustivel_nome': combustivel_name(name),
+                'leitura_inicial': nozzles.inicial[i],
+                'leitura_final': nozzles.fechamento[i],
+                'vendas_registradas': 0.0,
+            })
+            entry['leitura_inicial'] = min(entry['leitura_inicial'], nozzles.inicial[i])
+            entry['leitura_final'] = max(entry['leitura_final'], nozzles.fechamento[i])
+            entry['vendas_registradas'] += nozzles.litros[i]
+    for entry in result.values():
+        entry['diferenca'] = entry['leitura_final'] - entry['leitura_inicial'] - entry['vendas_registradas']
+    return result
+
+def concentrador_mismatches(model, tolerance=DEFAULT_TOLERANCE):
+    """Days whose 'Concentrador x Frentista' cell disagrees with nozzle venda minus Venda Concentrador"""
+    result = []
+    for day, block in sorted(model.days.items()):
+        if block.frentistas is None or not block.frentistas.caixa.get(FRENTISTA_CONCENTRADOR):
+            continue
+        expected = block.venda - block.frentistas.caixa[FRENTISTA_CONCENTRADOR]
+        if abs(expected - block.diferenca) > tolerance:
+            result.append((day, block.diferenca, expected))
+    return result
+
+def fetch_month(execute, posto_id, year, month):
+    """One result set per SQL function, keyed like the local metrics"""
+    days = execute("SELECT * FROM get_fechamento_mensal(%s, %s, %s)", [posto_id, int(month), int(year)]) or []
+    nozzles = execute("SELECT * FROM get_encerrantes_mensal(%s, %s, %s)", [posto_id, int(month), int(year)]) or []
+    return ({str(row['dia'])[:10]: row for row in days},
+            {nozzle_number(row['bico_nome']): row for row in nozzles})
+
+def diff_sets(local, remote, metrics, tolerance=DEFAULT_TOLERANCE):
+    """(key, metric, sheet value, database value) for every disagreement
+
+    A key found on one side only is reported once with metric '*'.
+    """
+    mismatches = []
+    for key in sorted(set(local) | set(remote), key=str):
+        ours, theirs = local.get(key), remote.get(key)
+        if ours is None or theirs is None:
+            mismatches.append((key, '*', 'missing' if ours is None else 'present',
+                               'missing' if theirs is None else 'present'))
+            continue
+        for metric in metrics:
+            if metric not in theirs:
+                continue
+            a = float(ours[metric] or 0)
+            b = float(theirs[metric] or 0)
+            if abs(a - b) > tolerance:
+                mismatches.append((key, metric, a, b))
+    return mismatches
+
+def reconcile_month(model, year, month, execute=None, posto_id=1, tolerance=DEFAULT_TOLERANCE):
+    """Mismatches of one month: {'dias': [...], 'bicos': [...], 'concentrador': [...]}"""
+    report = {'concentrador': concentrador_mismatches(model, tolerance)}
+    if execute is not None:
+        remote_days, remote_nozzles = fetch_month(execute, posto_id, year, month)
+        report['dias'] = diff_sets(fechamento_mensal(model, year, month), remote_days, DAY_METRICS, tolerance)
+        report['bicos'] = diff_sets(encerrantes_mensal(model), remote_nozzles, NOZZLE_METRICS, tolerance)
+    return report
+
+def _format_value(value):
+    return value if isinstance(value, str) else f"{value:,.3f}"
+
+def print_report(month, report):
+    total = sum(len(items) for items in report.values())
+    print(f"Month {int(month):02d}: {total} mismatches")
+    for day, reported, expected in report['concentrador']:
+        print(f"  day {day:02d} Concentrador x Frentista: sheet {reported:,.2f}, recomputed {expected:,.2f}")
+    for kind in ('dias', 'bicos'):
+        for key, metric, ours, theirs in report.get(kind, []):
+            print(f"  {kind[:-1]} {key} {metric}: sheet {_format_value(ours)}, db {_format_value(theirs)}")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile the sheet against get_fechamento_mensal '
+                                                 'and get_encerrantes_mensal')
+    parser.add_argument('source', help='.xlsx workbook or a monthly CSV (with --months)')
+    parser.add_argument('--year', default='2026', help='Year of the workbook (default: 2026)')
+    parser.add_argument('--months', nargs='+', type=int,
+                        help='Months to check (default: every monthly sheet; required for a CSV)')
+    parser.add_argument('--posto-id', type=int, default=1, help='Posto id (default: 1)')
+    parser.add_argument('--backend', choices=BACKENDS, default='mcp', help='Query backend (default: mcp)')
+    parser.add_argument('--dsn', help='Postgres DSN (default: $DATABASE_URL)')
+    parser.add_argument('--local-only', action='store_true',
+                        help='Only run the sheet self-checks, without querying the database')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Absolute difference ignored per metric (default: 0.01)')
+    parser.add_argument('--workers', type=int, default=4, help='Months reconciled concurrently (default: 4)')
+    parser.add_argument('--cache-dir', help='Parse cache directory (default: $POSTO_CACHE_DIR, off if unset)')
+    args = parser.parse_args()
+
+    cache = open_cache(args.cache_dir)
+    if args.source.lower().endswith('.xlsx'):
+        with zipfile.ZipFile(args.source, 'r') as zip_ref:
+            sheets = month_sheets(name for name, _ in list_sheets(zip_ref))
+        months = args.months or sorted(sheets)
+        missing = [m for m in months if m not in sheets]
+        if missing:
+            parser.error(f"No sheet for months {missing} in {args.source}")
+        load = lambda month: load_sheet_model(args.source, sheets[month], cache)
+    else:
+        if not args.months or len(args.months) != 1:
+            parser.error('A CSV source needs exactly one --months value')
+        months = args.months
+        load = lambda month: load_month_model(args.source, cache)
+
+    executor = None
+    if not args.local_only:
+        executor = make_executor(args.backend, args.dsn, pool_size=args.workers)
+
+    started = time.perf_counter()
+
+    def run(month):
+        execute = executor.execute if executor is not None else None
+        return reconcile_month(load(month), args.year, month, execute, args.posto_id, args.tolerance)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        reports = list(pool.map(run, months))
+
+    total = sum(print_report(month, report) for month, report in zip(months, reports))
+    print(f"\n{total} mismatches in {len(months)} months ({time.perf_counter() - started:.2f}s)")
+    if executor is not None:
+        executor.print_summary()
+        executor.close()
+
+if __name__ == '__main__':
+    main()
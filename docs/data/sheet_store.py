@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Typed binary export of workbook sheets into a SQLite file
+
+Each sheet is decoded with xlsx_to_csv.iter_typed_rows and stored in a
+table of its own, one SQLite row per non-blank cell in an untyped value
+column, so floats stay REAL and text stays TEXT: loading a sheet back
+needs no float() parsing and returns bit-identical numbers. Storing
+cells rather than one column per sheet column keeps a stray far-right
+cell from exceeding SQLite's column limit. Booleans, error cells and
+dates are stored as INTEGER/TEXT and keep their Python type through the
+kinds table. Each row's length is kept in widths, so load_rows returns
+exactly the rows iter_typed_rows produced (blank cells are None).
+
+    sheets(name, position, table_name, rows, width, source, source_sha256)
+    sheet_<position>(_row, _col, value)
+    widths(sheet, row, width)
+    kinds(sheet, row, col, kind)
+
+Usage: python3 sheet_store.py <xlsx_file> <output.sqlite> [--sheets NAME ...]
+       python3 sheet_store.py <store.sqlite> --list
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+
+import instrument
+from month_model import parse_month
+from parse_cache import file_hash
+from xlsx_to_csv import CellError, get_cell_formats, get_shared_strings, iter_typed_rows, list_sheets
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sheets (
+    name TEXT PRIMARY KEY, position INTEGER, table_name TEXT, rows INTEGER, width INTEGER,
+    source TEXT, source_sha256 TEXT
+);
+CREATE TABLE IF NOT EXISTS widths (
+    sheet TEXT, row INTEGER, width INTEGER, PRIMARY KEY (sheet, row)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS kinds (
+    sheet TEXT, row INTEGER, col INTEGER, kind TEXT, PRIMARY KEY (sheet, row, col)
+) WITHOUT ROWID;
+'''
+
+# kinds.kind: how to rebuild a value that is not a float or str
+KIND_BOOL = 'b'
+KIND_ERROR = 'e'
+KIND_DATE = 'd'
+KIND_DATETIME = 't'
+
+def encode(value):
+    """(stored value, kind) of a typed cell"""
+    cls = value.__class__
+    if cls is float or cls is str:
+        return value, None
+    if cls is bool:
+        return int(value), KIND_BOOL
+    if cls is CellError:
+        return str(value), KIND_ERROR
+    if cls is datetime.datetime:
+        return value.isoformat(), KIND_DATETIME
+    if cls is datetime.date:
+        return value.isoformat(), KIND_DATE
+    if cls is int:
+        return float(value), None
+    return str(value), None
+
+def decode(value, kind):
+    if kind is None:
+        return value
+    if kind == KIND_BOOL:
+        return bool(value)
+    if kind == KIND_ERROR:
+        return CellError(value)
+    if kind == KIND_DATETIME:
+        return datetime.datetime.fromisoformat(value)
+    if kind == KIND_DATE:
+        return datetime.date.fromisoformat(value)
+    raise ValueError(f"Unknown cell kind {kind!r}")
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+def store_sheet(conn, name, rows, position=0, source=None, source_sha256=None):
+    """Replace sheet name in the store with rows; returns the row count"""
+    rows = rows if isinstance(rows, list) else list(rows)
+    width = max((len(row) for row in rows), default=0)
+    table = f'sheet_{position}'
+    # The sheet's own entry and whichever sheet held this position before
+    replaced = conn.execute('SELECT name, table_name FROM sheets WHERE name = ? OR table_name = ?',
+                            (name, table)).fetchall()
+    for old in {table} | {table_name for _, table_name in replaced}:
+        conn.execute(f'DROP TABLE IF EXISTS "{old}"')
+    for sheet in {name} | {sheet for sheet, _ in replaced}:
+        conn.execute('DELETE FROM widths WHERE sheet = ?', (sheet,))
+        conn.execute('DELETE FROM kinds WHERE sheet = ?', (sheet,))
+        conn.execute('DELETE FROM sheets WHERE name = ?', (sheet,))
+
+    conn.execute(f'CREATE TABLE "{table}" (_row INTEGER, _col INTEGER, value, PRIMARY KEY (_row, _col)) '
+                 'WITHOUT ROWID')
+    kinds = []
+    records = []
+    for r, row in enumerate(rows):
+        for c, value in enumerate(row):
+            if value is None:
+                continue
+            cls = value.__class__
+            if cls is not float and cls is not str:
+                value, kind = encode(value)
+                if kind is not None:
+                    kinds.append((name, r, c, kind))
+            records.append((r, c, value))
+    conn.executemany(f'INSERT INTO "{table}" VALUES (?, ?, ?)', records)
+    conn.executemany('INSERT INTO widths (sheet, row, width) VALUES (?, ?, ?)',
+                     [(name, r, len(row)) for r, row in enumerate(rows)])
+    conn.executemany('INSERT INTO kinds (sheet, row, col, kind) VALUES (?, ?, ?, ?)', kinds)
+    conn.execute('INSERT INTO sheets (name, position, table_name, rows, width, source, source_sha256) '
+                 'VALUES (?, ?, ?, ?, ?, ?, ?)', (name, position, table, len(rows), width, source, source_sha256))
+    instrument.count('store.cells', len(records))
+    return len(rows)
+
+@instrument.timed('store.export')
+def export_workbook(xlsx_file, db_path, sheet_names=None):
+    """Store every sheet (or sheet_names) of a workbook; returns [(sheet, rows)]"""
+    digest = file_hash(xlsx_file)
+    results = []
+    conn = connect(db_path)
+    try:
+        with zipfile.ZipFile(xlsx_file, 'r') as zip_ref:
+            shared_strings = get_shared_strings(zip_ref)
+            formats = get_cell_formats(zip_ref)
+            sheets = list_sheets(zip_ref)
+            known = {name for name, _ in sheets}
+            missing = [name for name in sheet_names or () if name not in known]
+            if missing:
+                raise ValueError(f"Sheets not found in {xlsx_file}: {', '.join(missing)}")
+            for position, (name, sheet_file) in enumerate(sheets):
+                if sheet_names and name not in sheet_names:
+                    continue
+                rows = iter_typed_rows(zip_ref, name, shared_strings, formats, sheet_file)
+                count = store_sheet(conn, name, rows, position, os.path.abspath(xlsx_file), digest)
+                results.append((name, count))
+        conn.commit()
+    finally:
+        conn.close()
+    return results
+
+def list_stored(db_path):
+    """(name, rows, source, source_sha256) of every stored sheet, in workbook order"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT name, rows, source, source_sha256 FROM sheets ORDER BY position').fetchall()
+    finally:
+        conn.close()
+
+@instrument.timed('store.load')
+def load_rows(db_path, sheet_name):
+    """Typed rows of a stored sheet, exactly as iter_typed_rows produced them"""
+    conn = sqlite3.connect(db_path)
+    try:
+        entry = conn.execute('SELECT table_name FROM sheets WHERE name = ?', (sheet_name,)).fetchone()
+        if entry is None:
+            raise ValueError(f"Sheet '{sheet_name}' not in {db_path}")
+        rows = [[None] * width for width, in
+                conn.execute('SELECT width FROM widths WHERE sheet = ? ORDER BY row', (sheet_name,))]
+        for r, c, value in conn.execute(f'SELECT _row, _col, value FROM "{entry[0]}"'):
+            rows[r][c] = value
+        for r, c, kind in conn.execute('SELECT row, col, kind FROM kinds WHERE sheet = ?', (sheet_name,)):
+            rows[r][c] = decode(rows[r][c], kind)
+    finally:
+        conn.close()
+    return rows
+
+def load_model(db_path, sheet_name):
+    """MonthModel of a stored monthly sheet, without parsing any number"""
+    return parse_month(load_rows(db_path, sheet_name))
+
+def main():
+    parser = argparse.ArgumentParser(description='Export workbook sheets as typed cells into SQLite')
+    parser.add_argument('source', help='.xlsx workbook to export, or a store with --list')
+    parser.add_argument('output', nargs='?', help='SQLite file to write (created or updated)')
+    parser.add_argument('--sheets', nargs='+', help='Only these sheets (default: all)')
+    parser.add_argument('--list', action='store_true', help='List the sheets of a store')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.list:
+        for name, rows, source, digest in list_stored(args.source):
+            print(f"{name}: {rows} rows from {source} ({digest[:12]})")
+        return
+    if not args.output:
+        parser.error('output is required unless --list is given')
+
+    with instrument.run('sheet_store', args):
+        started = time.perf_counter()
+        try:
+            results = export_workbook(args.source, args.output, args.sheets)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        for name, rows in results:
+            print(f"{name}: {rows} rows")
+        print(f"Stored {len(results)} sheets in {args.output} ({time.perf_counter() - started:.3f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic caixa workbooks in the layout of the real sheets
+
+Each workbook holds one year of one station: twelve 'Mes, NN.' sheets
+with a 'Caixa Dia NN Posto Jorro.' block per calendar day (nozzle
+readings, card table, frentista matrix, Concentrador x Frentista) and a
+'Caixa Dia 01 a NN' summary block with Salario Pago. Text cells go
+through the shared strings table like Excel writes them. Nozzle readings
+continue from day to day and across years, and every total is
+consistent with its parts, so the whole pipeline runs on the output.
+
+Usage: python3 synthetic_workbook.py <output_dir> [--stations N] [--years N] [--start-year YYYY]
+"""
+import argparse
+import calendar
+import os
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+from xlsx_to_csv import SHEET_NS
+
+NOZZLES = (
+    ('G,C. Bico 01', 6.28),
+    ('G,A.Bico 02', 6.28),
+    ('Etanol,Bico 03', 4.58),
+    ('DS:.10,Bico 04', 6.28),
+    ('G,C, Bico 05', 6.28),
+    ('G,C. Bico 06', 6.28),
+)
+CARDS = (
+    ('Cartao,C.', 0.007),
+    ('Cartao,B.', 0.025),
+    ('Pix', None),
+    ('APP, Baratao', 0.019),
+    ('APP, Providencia', None),
+)
+FRENTISTAS = ('Filip', 'Paulo', 'Barbra', 'Rosimeire', 'Sinho', 'Nayla', 'Elyon')
+PAYMENT_LINES = ('Pix', 'Cartao Credito', 'Cartao Debito', 'Moeda', 'Notas', 'Baratao', 'Dinheiro')
+WIDTH = 15
+CAIXA_COL = 12
+BLOCK_ROWS = 36
+
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+def column_letter(index):
+    """0 -> A, 25 -> Z, 26 -> AA"""
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+class SheetBuilder:
+    """Row list of one month sheet (None for empty cells)"""
+
+    def __init__(self):
+        self.rows = [[]]
+
+    def row(self, *cells, at=None):
+        row = [None] * WIDTH
+        for col, value in (at or {}).items():
+            row[col] = value
+        for col, value in enumerate(cells):
+            if value is not None:
+                row[col] = value
+        self.rows.append(row)
+
+    def blank(self, n=1):
+        for _ in range(n):
+            self.rows.append([])
+
+def _day_block(sheet, title, rng, readings, salario=None):
+    """Append one caixa block and return (venda, taxas, salary total)"""
+    start = len(sheet.rows)
+    sheet.row(None, title)
+    sheet.row(None, None, 'Venda Concentrador')
+    sheet.row(None, None, 'Produtos', 'Inicial', 'Fechamento', 'Litros', 'Valor LT $', 'Venda  bico R$.',
+              'Litros', '%')
+
+    litros_total = venda_total = 0.0
+    for i, (name, price) in enumerate(NOZZLES):
+        litros = round(rng.uniform(20, 900) if salario is None else readings[i][1] - readings[i][0], 3)
+        inicial = readings[i][0] if salario is not None else readings[i]
+        fechamento = round(inicial + litros, 3)
+        if salario is None:
+            readings[i] = fechamento
+        venda = litros * price
+        litros_total += litros
+        venda_total += venda
+        sheet.row(None, None, name, inicial, fechamento, litros, price, venda)
+    sheet.row(None, None, 'Total.', None, None, litros_total, venda_total / litros_total, venda_total)
+    sheet.blank()
+
+    sheet.row(None, None, None, 'Inter pog', 'Bin', 'Total', '%', 'Despeza com das taxas do Cartao.')
+    card_values = [round(venda_total * rng.uniform(0.05, 0.2), 2) for _ in CARDS]
+    card_total = sum(card_values)
+    taxas = 0.0
+    for (name, rate), value in zip(CARDS, card_values):
+        fee = value * rate if rate else None
+        taxas += fee or 0.0
+        sheet.row(None, None, name, None, value, value, value / card_total if card_total else 0, rate, fee)
+    sheet.row(None, None, 'Total', 0, card_total, card_total, 1, 'Total.', taxas)
+    sheet.blank()
+
+    # Frentista payments add up to the concentrador sales minus a small shortfall
+    sheet.row(None, None, 'Venda Frentista')
+    header = {3 + i: name for i, name in enumerate(FRENTISTAS)}
+    header.update({11: 'Posto - P - Jorro', CAIXA_COL: ' Caixa.', 13: '%'})
+    sheet.row(at=header)
+    shares = [rng.random() for _ in FRENTISTAS]
+    concentrador = [round(venda_total * 0.98 * s / sum(shares), 2) for s in shares]
+    lines = {label: [0.0] * len(FRENTISTAS) for label in PAYMENT_LINES}
+    vendas = []
+    for f, total in enumerate(concentrador):
+        falta = round(rng.uniform(0, 15), 2)
+        paid = total - falta
+        weights = [rng.random() for _ in PAYMENT_LINES]
+        parts = [round(paid * w / sum(weights), 2) for w in weights]
+        for label, value in zip(PAYMENT_LINES, parts):
+            lines[label][f] = value
+        vendas.append(sum(parts))
+    sums = {}
+    for label in PAYMENT_LINES:
+        sums[label] = sum(lines[label])
+        sheet.row(None, None, label, *lines[label], at={CAIXA_COL: sums[label]})
+    vendas_total = sum(vendas)
+    concentrador_total = sum(concentrador)
+    sheet.row(None, None, 'Venda Frentistas.', *vendas, at={CAIXA_COL: vendas_total})
+    sheet.row(None, None, 'Venda Concentrador', *concentrador, at={CAIXA_COL: concentrador_total})
+    sheet.row(None, None, 'Falta.', *[c - v for c, v in zip(concentrador, vendas)],
+              at={CAIXA_COL: concentrador_total - vendas_total})
+    sheet.row(None, None, '%', *[v / vendas_total for v in vendas], at={CAIXA_COL: 1})
+    salary_total = 0.0
+    if salario is not None:
+        salary = [round(salario * rng.uniform(0.8, 1.2), 2) for _ in FRENTISTAS]
+        salary_total = sum(salary)
+        sheet.row(None, None, 'Salario Pago', *salary, at={CAIXA_COL: salary_total})
+    sheet.row(at={11: 'Concentrador x Frentista', 13: venda_total - concentrador_total})
+    sheet.blank(BLOCK_ROWS - (len(sheet.rows) - start))
+    return venda_total, taxas, salary_total
+
+def month_rows(year, month, rng, readings):
+    """Rows of one month sheet; readings (one per nozzle) are advanced in place"""
+    sheet = SheetBuilder()
+    days = calendar.monthrange(year, month)[1]
+    month_start = list(readings)
+    for day in range(1, days + 1):
+        _day_block(sheet, f'Caixa Dia {day:02d} Posto Jorro.', rng, readings)
+    summary_readings = list(zip(month_start, readings))
+    _day_block(sheet, f'Caixa Dia 01 a {days:02d} Posto Jorro.', rng, summary_readings, salario=1300)
+    return sheet.rows
+
+def _cell_xml(ref, value, strings):
+    if isinstance(value, str):
+        index = strings.setdefault(value, len(strings))
+        return f'<c r="{ref}" t="s"><v>{index}</v></c>'
+    return f'<c r="{ref}"><v>{value!r}</v></c>'
+
+def sheet_xml(rows, strings):
+    """Worksheet XML for rows; text cells are added to strings {text: index}"""
+    letters = [column_letter(i) for i in range(WIDTH)]
+    parts = [f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+             f'<worksheet xmlns="{SHEET_NS[1:-1]}" xmlns:r="{REL_NS}">'
+             f'<dimension ref="A1:{letters[-1]}{len(rows)}"/><sheetData>']
+    for r, row in enumerate(rows, start=1):
+        cells = ''.join(_cell_xml(f'{letters[c]}{r}', value, strings)
+                        for c, value in enumerate(row) if value is not None)
+        if cells:
+            parts.append(f'<row r="{r}">{cells}</row>')
+    parts.append('</sheetData></worksheet>')
+    return ''.join(parts)
+
+def write_workbook(path, sheets):
+    """Write an .xlsx from [(sheet_name, rows)]"""
+    strings = {}
+    sheet_files = [sheet_xml(rows, strings) for _, rows in sheets]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        overrides = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(sheets) + 1))
+        z.writestr('[Content_Types].xml',
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   '<Default Extension="xml" ContentType="application/xml"/>'
+                   '<Override PartName="/xl/workbook.xml" '
+                   'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                   '<Override PartName="/xl/sharedStrings.xml" '
+                   'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+                   f'{overrides}</Types>')
+        z.writestr('_rels/.rels',
+                   f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{PKG_REL_NS}">'
+                   f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+                   '</Relationships>')
+        entries = ''.join(f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+                          for i, (name, _) in enumerate(sheets, start=1))
+        z.writestr('xl/workbook.xml',
+                   f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   f'<workbook xmlns="{SHEET_NS[1:-1]}" xmlns:r="{REL_NS}"><sheets>{entries}</sheets></workbook>')
+        rels = ''.join(f'<Relationship Id="rId{i}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                       for i in range(1, len(sheets) + 1))
+        rels += (f'<Relationship Id="rId{len(sheets) + 1}" Type="{REL_NS}/sharedStrings" '
+                 f'Target="sharedStrings.xml"/>')
+        z.writestr('xl/_rels/workbook.xml.rels',
+                   f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   f'<Relationships xmlns="{PKG_REL_NS}">{rels}</Relationships>')
+        for i, xml in enumerate(sheet_files, start=1):
+            z.writestr(f'xl/worksheets/sheet{i}.xml', xml)
+        items = ''.join(f'<si><t xml:space="preserve">{escape(text)}</t></si>' for text in strings)
+        z.writestr('xl/sharedStrings.xml',
+                   f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   f'<sst xmlns="{SHEET_NS[1:-1]}" count="{len(strings)}" uniqueCount="{len(strings)}">'
+                   f'{items}</sst>')
+
+def generate(output_dir, stations=1, years=1, start_year=2026, seed=1):
+    """Write one workbook per station and year; returns [(station, year, path)]"""
+    os.makedirs(output_dir, exist_ok=True)
+    result = []
+    for station in range(1, stations + 1):
+        rng = random.Random(seed * 1000 + station)
+        readings = [round(rng.uniform(1000, 1_000_000), 3) for _ in NOZZLES]
+        for year in range(start_year, start_year + years):
+            sheets = [(f'Mes, {month:02d}.', month_rows(year, month, rng, readings)) for month in range(1, 13)]
+            path = os.path.join(output_dir, f'posto_{station:02d}_{year}.xlsx')
+            write_workbook(path, sheets)
+            result.append((station, year, path))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic caixa workbooks')
+    parser.add_argument('output_dir')
+    parser.add_argument('--stations', type=int, default=1, help='Number of stations (default: 1)')
+    parser.add_argument('--years', type=int, default=1, help='Years per station (default: 1)')
+    parser.add_argument('--start-year', type=int, default=2026, help='First year (default: 2026)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+    args = parser.parse_args()
+
+    for station, year, path in generate(args.output_dir, args.stations, args.years, args.start_year, args.seed):
+        print(f"Station {station}, {year}: {path} ({os.path.getsize(path) / 1024:.0f} KiB)")
+
+if __name__ == '__main__':
+    main()
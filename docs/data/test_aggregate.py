@@ -0,0 +1,74 @@
+"""Tests for aggregate.py: NumPy and pure-Python paths must agree"""
+import os
+
+import pytest
+
+import aggregate
+from month_model import load_csv_model, parse_month
+
+MES_01 = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mes_01.csv')
+
+BACKENDS = [False] + ([True] if aggregate.HAVE_NUMPY else [])
+
+@pytest.fixture(params=BACKENDS, ids=lambda numpy: 'numpy' if numpy else 'python')
+def backend(request, monkeypatch):
+    monkeypatch.setattr(aggregate, 'HAVE_NUMPY', request.param)
+    return request.param
+
+def _list(values):
+    return [float(v) for v in values]
+
+def test_empty_month(backend):
+    model = parse_month([])
+    for table in (aggregate.day_nozzle_table(model), aggregate.day_frentista_table(model)):
+        assert table.days == []
+        assert _list(table.row_totals()) == []
+        assert _list(table.column_totals()) == [0.0] * len(table.names)
+
+def test_month_without_valid_days(backend):
+    # Headers and nozzle rows, but no day has venda and litros filled in yet
+    rows = [
+        ['', 'Caixa Dia 01 Posto Jorro.'],
+        ['', '', 'Produtos', 'Inicial', 'Fechamento', 'Litros', 'Valor LT $', 'Venda  bico R$.'],
+        ['', '', 'G,C. Bico 01', '100', '', '', '6.28', ''],
+        ['', '', 'Total.', '', '', '', '', ''],
+    ]
+    table = aggregate.day_nozzle_table(parse_month(rows))
+    assert table.names == ['G,C. Bico 01']
+    assert table.days == []
+    assert _list(table.column_totals()) == [0.0]
+    assert table.group_columns(aggregate.fuel_of).names == ['G,C']
+
+def test_backends_agree_on_a_month():
+    if not aggregate.HAVE_NUMPY:
+        pytest.skip('NumPy is not installed')
+    model = load_csv_model(MES_01)
+    results = {}
+    for numpy in (True, False):
+        aggregate.HAVE_NUMPY = numpy
+        try:
+            venda = aggregate.day_nozzle_table(model)
+            daily = _list(venda.row_totals())
+            results[numpy] = (
+                venda.days,
+                _list(venda.group_columns(aggregate.fuel_of).column_totals()),
+                _list(aggregate.rolling_mean(daily, 7)),
+                aggregate.top_k(venda.days, daily, 3),
+                _list(aggregate.day_frentista_table(model).column_totals()),
+            )
+        finally:
+            aggregate.HAVE_NUMPY = True
+    assert results[True][0] == results[False][0]
+    for ours, theirs in zip(results[True][1:], results[False][1:]):
+        assert ours == pytest.approx(theirs)
+
+def test_group_sum(backend):
+    totals = aggregate.group_sum([(2026, 1), (2026, 2), (2026, 1)], [1.0, 2.0, 3.5])
+    assert list(totals.items()) == [((2026, 1), 4.5), ((2026, 2), 2.0)]
+
+def test_rolling_mean_and_top_k(backend):
+    assert _list(aggregate.rolling_mean([2.0, 4.0, 6.0, 8.0], 2)) == [2.0, 3.0, 5.0, 7.0]
+    with pytest.raises(ValueError):
+        aggregate.rolling_mean([1.0], 0)
+    # Ties keep the order of the labels
+    assert aggregate.top_k([1, 2, 3, 4], [5.0, 9.0, 5.0, 1.0], 3) == [(2, 9.0), (1, 5.0), (3, 5.0)]
@@ -0,0 +1,42 @@
+"""Tests for checkpoint.py: hash-based resume, reload and atomic saves"""
+import pytest
+
+import checkpoint
+from checkpoint import CheckpointStore, payload_hash
+
+def test_payload_hash_ignores_key_order():
+    assert payload_hash({'valor_pix': 1.0, 'encerrante': 2.0}) == payload_hash({'encerrante': 2.0, 'valor_pix': 1.0})
+    assert payload_hash({'valor_pix': 1.0}) != payload_hash({'valor_pix': 1.5})
+
+def test_commit_and_reload(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    store = CheckpointStore(path, '1:2026-01')
+    assert store.changed(3, {1: 'a', 2: 'b'}) == [1, 2]
+    store.commit_day(3, {1: 'a', 2: 'b'})
+    store.commit_day(1, {1: 'c'})
+
+    reloaded = CheckpointStore(path, '1:2026-01')
+    assert reloaded.committed_days() == [1, 3]
+    assert reloaded.changed(3, {1: 'a', 2: 'x', 5: 'y'}) == [2, 5]
+    # Other months and stations start empty in the same file
+    assert CheckpointStore(path, '2:2026-01').changed(3, {1: 'a'}) == [1]
+
+def test_save_is_atomic(tmp_path, monkeypatch):
+    path = str(tmp_path / 'checkpoint.json')
+    store = CheckpointStore(path, '1:2026-01')
+    store.commit_day(1, {1: 'a'})
+    with open(path, 'rb') as f:
+        saved = f.read()
+
+    def broken_dump(data, f, **kwargs):
+        f.write('{"1:2026-01": {"days"')
+        raise OSError('disk full')
+
+    monkeypatch.setattr(checkpoint.json, 'dump', broken_dump)
+    with pytest.raises(OSError):
+        store.commit_day(2, {1: 'b'})
+    # The interrupted write never replaced the committed file
+    with open(path, 'rb') as f:
+        assert f.read() == saved
+    monkeypatch.undo()
+    assert CheckpointStore(path, '1:2026-01').committed_days() == [1]
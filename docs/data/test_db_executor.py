@@ -0,0 +1,90 @@
+"""Tests for db_executor.py: SQL literals and how params reach the drivers"""
+import pytest
+
+from db_executor import PostgresExecutor, QueryExecutor, SqliteExecutor, inline_params, sql_literal
+
+class FakeCursor:
+    description = None
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params):
+        self.calls.append((query, params))
+
+class FakeConnection:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self.calls)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+class FakePool:
+    def __init__(self):
+        self.calls = []
+
+    def getconn(self):
+        return FakeConnection(self.calls)
+
+    def putconn(self, conn):
+        pass
+
+def postgres_executor():
+    # Skips psycopg2: only the parameter handling around the cursor is tested
+    executor = PostgresExecutor.__new__(PostgresExecutor)
+    QueryExecutor.__init__(executor)
+    executor._pool = FakePool()
+    executor._cursor_factory = None
+    return executor
+
+@pytest.mark.parametrize('value, literal', [
+    (None, 'NULL'),
+    (True, 'TRUE'),
+    (3, '3'),
+    (0.1, '0.1'),
+    ("O'Brien", "'O''Brien'"),
+    (float('nan'), "'NaN'::float8"),
+    (float('inf'), "'Infinity'::float8"),
+    (float('-inf'), "'-Infinity'::float8"),
+])
+def test_sql_literal(value, literal):
+    assert sql_literal(value) == literal
+
+def test_inline_params():
+    assert inline_params("SELECT %s, %s", [1, 'a']) == "SELECT 1, 'a'"
+    assert inline_params("SELECT 'x%'", None) == "SELECT 'x%'"
+
+def test_postgres_query_without_params_is_not_formatted():
+    executor = postgres_executor()
+    executor.execute("SELECT 1 WHERE 'abc' LIKE 'a%'")
+    executor.execute("SELECT %s", [1])
+    assert executor._pool.calls == [("SELECT 1 WHERE 'abc' LIKE 'a%'", None), ("SELECT %s", [1])]
+
+def test_sqlite_literal_percent():
+    executor = SqliteExecutor(':memory:')
+    try:
+        assert executor.execute("SELECT 'abc' LIKE 'a%' AS hit") == [{'hit': 1}]
+        assert executor.execute("SELECT %s + %s AS total", [1, 2]) == [{'total': 3}]
+    finally:
+        executor.close()
+
+def test_sqlite_script_and_many():
+    executor = SqliteExecutor(':memory:')
+    try:
+        executor.executescript('CREATE TABLE t (a INTEGER); CREATE INDEX t_a ON t (a);')
+        executor.executemany('INSERT INTO t (a) VALUES (%s)', [(1,), (2,), (3,)])
+        assert executor.execute('SELECT SUM(a) AS total FROM t') == [{'total': 6}]
+    finally:
+        executor.close()
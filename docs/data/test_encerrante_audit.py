@@ -0,0 +1,88 @@
+"""Tests for encerrante_audit.py: every check, on the NumPy and pure-Python paths"""
+import datetime
+import os
+
+import pytest
+
+import encerrante_audit
+from encerrante_audit import Readings, audit, load_readings
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Posto,Jorro, 2026.xlsx')
+
+BACKENDS = [False] + ([True] if encerrante_audit.HAVE_NUMPY else [])
+
+@pytest.fixture(params=BACKENDS, ids=lambda numpy: 'numpy' if numpy else 'python')
+def backend(request, monkeypatch):
+    monkeypatch.setattr(encerrante_audit, 'HAVE_NUMPY', request.param)
+    return request.param
+
+def day(n):
+    return datetime.date(2026, 1, n).toordinal()
+
+def readings(*rows, days=()):
+    """Readings from (day, nozzle, inicial, fechamento, litros, preco) rows and (day, diferenca) days"""
+    r = Readings()
+    for d, nozzle, inicial, fechamento, litros, preco in rows:
+        if nozzle not in r.names:
+            r.names.append(nozzle)
+        r.date.append(day(d))
+        r.nozzle.append(r.names.index(nozzle))
+        r.inicial.append(inicial)
+        r.fechamento.append(fechamento)
+        r.litros.append(litros)
+        r.preco.append(preco)
+    for d, diferenca in days:
+        r.day_date.append(day(d))
+        r.diferenca.append(diferenca)
+    return r
+
+def test_clean_readings(backend):
+    r = readings(
+        (1, 'Bico 01', 100.0, 150.0, 50.0, 6.0),
+        (2, 'Bico 01', 150.0, 170.0, 20.0, 6.2),
+        (1, 'Bico 02', 10.0, 12.0, 2.0, 5.0),
+        days=[(1, 0.5), (2, -20.0)],
+    )
+    assert audit(r) == []
+
+def test_each_anomaly_kind(backend):
+    r = readings(
+        # Readings out of date order: the checks sort them per nozzle
+        (3, 'Bico 01', 171.0, 180.0, 9.0, 7.5),
+        (1, 'Bico 01', 100.0, 150.0, 50.0, 6.0),
+        (2, 'Bico 01', 150.0, 170.0, 25.0, 6.1),
+        (2, 'Bico 02', 10.0, 8.0, -2.0, 5.0),
+        days=[(1, 150.0), (2, -100.0)],
+    )
+    assert audit(r) == [
+        ('continuity', day(3), 'Bico 01', 171.0, 170.0, day(2)),
+        ('arithmetic', day(2), 'Bico 01', 25.0, 20.0, None),
+        ('rollback', day(2), 'Bico 02', 8.0, 10.0, None),
+        ('price_jump', day(3), 'Bico 01', 7.5, 6.1, day(2)),
+        ('concentrador_gap', day(1), None, 150.0, 0.0, None),
+    ]
+
+def test_thresholds(backend):
+    r = readings(
+        (1, 'Bico 01', 100.0, 150.0, 50.0, 6.0),
+        (2, 'Bico 01', 150.005, 170.0, 19.995, 6.6),
+        days=[(1, 90.0)],
+    )
+    assert audit(r) == []
+    kinds = [a[0] for a in audit(r, tolerance=0.001, price_jump=0.05, max_gap=89.0)]
+    assert kinds == ['continuity', 'price_jump', 'concentrador_gap']
+
+def test_backends_agree_on_the_workbook(monkeypatch):
+    if not encerrante_audit.HAVE_NUMPY:
+        pytest.skip('NumPy is not installed')
+    r = load_readings([WORKBOOK])
+    assert len(r) > 0
+    results = {}
+    for numpy in (True, False):
+        monkeypatch.setattr(encerrante_audit, 'HAVE_NUMPY', numpy)
+        results[numpy] = audit(r)
+    assert results[True]
+    assert len(results[True]) == len(results[False])
+    for ours, theirs in zip(results[True], results[False]):
+        assert ours[:3] == theirs[:3] and ours[5] == theirs[5]
+        assert ours[3:5] == pytest.approx(theirs[3:5])
@@ -0,0 +1,105 @@
+"""Tests for extract_spec.py: the one-pass spec agrees with parse_month"""
+import os
+import zipfile
+
+import pytest
+
+import extract_spec
+from extract_spec import DAY, SUMMARY, Field, MONTH_SPEC, extract_month
+from month_model import MONTH_SHEET_RE, parse_month
+from xlsx_to_csv import get_cell_formats, get_shared_strings, iter_typed_rows, iter_worksheet_rows, list_sheets
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Posto,Jorro, 2026.xlsx')
+
+def _caixa(label):
+    return lambda block: block.frentistas.caixa.get(label, 0.0) if block.frentistas is not None else 0.0
+
+# MONTH_SPEC field -> the same value in a parsed DayBlock (total_liquido has no counterpart)
+MODEL_VALUES = {
+    'venda_concentrador': lambda block: block.venda,
+    'litros': lambda block: block.litros,
+    'cartao_total': lambda block: block.cartao_total,
+    'taxas_cartao': lambda block: block.taxas,
+    'venda_frentistas': _caixa('Venda Frentistas.'),
+    'falta': _caixa('Falta.'),
+    'salarios': _caixa('Salario Pago'),
+    'diferenca': lambda block: block.diferenca,
+}
+
+def month_sheet_rows():
+    with zipfile.ZipFile(WORKBOOK, 'r') as zf:
+        shared_strings = get_shared_strings(zf)
+        return [(name, list(iter_worksheet_rows(zf, name, shared_strings, sheet_file)))
+                for name, sheet_file in list_sheets(zf) if MONTH_SHEET_RE.match(name)]
+
+@pytest.mark.parametrize('name, rows', month_sheet_rows(), ids=lambda value: value if isinstance(value, str) else '')
+def test_extract_month_matches_parse_month(name, rows):
+    model = parse_month(rows)
+    extraction = extract_month(rows)
+    assert sorted(extraction.days) == sorted(model.days)
+    assert sorted(extraction.summaries) == sorted(model.summaries)
+    assert extraction.row_count == model.row_count
+    fields = {field.name: field for field in MONTH_SPEC}
+    for kind, extracted, blocks in ((DAY, extraction.days, model.days),
+                                    (SUMMARY, extraction.summaries, model.summaries)):
+        for key, values in extracted.items():
+            for metric, model_value in MODEL_VALUES.items():
+                if kind not in fields[metric].scope:
+                    assert metric not in values
+                    continue
+                # A field missing from the block reads as 0.0 in the model
+                assert values.get(metric, 0.0) == pytest.approx(model_value(blocks[key])), (key, metric)
+
+def test_typed_rows_give_the_same_metrics():
+    with zipfile.ZipFile(WORKBOOK, 'r') as zf:
+        shared_strings = get_shared_strings(zf)
+        formats = get_cell_formats(zf)
+        for name, sheet_file in list_sheets(zf):
+            if not MONTH_SHEET_RE.match(name):
+                continue
+            text = extract_month(iter_worksheet_rows(zf, name, shared_strings, sheet_file))
+            typed = extract_month(iter_typed_rows(zf, name, shared_strings, formats, sheet_file))
+            assert typed.days == text.days, name
+            assert typed.summaries == text.summaries, name
+            assert typed.missing == text.missing, name
+
+def test_typed_cells():
+    rows = [
+        [None, 'Caixa Dia 01 Posto Jorro.', None],
+        [None, None, ' Total. ', None, None, 12.5, True],
+        [None, None, 'Total', None, None, None],
+        [None, None, None, 'Concentrador x Frentista', None, '', -3.0],
+    ]
+    spec = (Field('litros', 'Total.', column=5), Field('flag', 'Total.', column=6),
+            Field('cartao', 'Total', column=5), Field('diferenca', 'Concentrador x Frentista', label_col=None,
+                                                      column=extract_spec.NEXT))
+    extraction = extract_month(rows, spec)
+    # A boolean is not a number; a None cell reads as blank
+    assert extraction.days == {1: {'litros': 12.5, 'cartao': 0.0, 'diferenca': -3.0}}
+
+def test_month_spec_is_compiled_once(monkeypatch):
+    def fail(fields):
+        raise AssertionError('MONTH_SPEC compiled again')
+
+    monkeypatch.setattr(extract_spec, 'compile_spec', fail)
+    extract_month([['', 'Caixa Dia 01 Posto Jorro.']])
+    with pytest.raises(AssertionError):
+        extract_month([], (Field('total', 'Total.', column=5),))
+
+def test_custom_spec():
+    rows = [
+        ['', 'Caixa Dia 01 Posto Jorro.'],
+        ['', '', 'Total.', '', '', '12.5', '', '99'],
+        ['', 'Caixa Dia 02 Posto Jorro.'],
+        ['', '', 'Outro'],
+        ['', 'Caixa Dia 03 Posto Jorro.'],
+        ['', '', 'Total.', '', '', 'x'],
+    ]
+    spec = (Field('litros', 'Total.', column=5), Field('nota', 'Nota', column=5))
+    extraction = extract_month(rows, spec)
+    assert extraction.days == {1: {'litros': 12.5}, 2: {}, 3: {}}
+    assert extraction.empty == [2]
+    # Day 3 matched 'Total.' but its value is not a number
+    assert extraction.missing_labels(spec) == {'nota': 2}
+    with pytest.raises(ValueError):
+        extract_spec.compile_spec((Field('a', 'x', column=3), Field('a', 'y', column=4)))
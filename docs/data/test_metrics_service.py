@@ -0,0 +1,128 @@
+"""Tests for metrics_service.py: responses, ETags and refreshes over HTTP"""
+import http.client
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from metrics_service import MetricsHandler, MetricsStore, day_rows
+from month_model import load_csv_model
+from reconcile import encerrantes_mensal, fechamento_mensal
+
+MES_01 = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mes_01.csv')
+
+@pytest.fixture(scope='module')
+def model():
+    return load_csv_model(MES_01)
+
+@pytest.fixture
+def store(model):
+    store = MetricsStore(1)
+    store.update_month(2026, 1, fechamento_mensal(model, 2026, 1), encerrantes_mensal(model))
+    store.update_month(2026, 2, {'2026-02-01': {'faturamento_bruto': 10.0}}, {})
+    return store
+
+@pytest.fixture
+def get(store):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MetricsHandler)
+    server.store = store
+    server.allow_origin = '*'
+    server.access_log = False
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=5)
+
+    def get(path, etag=None):
+        connection.request('GET', path, headers={'If-None-Match': etag} if etag else {})
+        response = connection.getresponse()
+        body = response.read()
+        return response.status, response.getheader('ETag'), json.loads(body) if body else None
+
+    yield get
+    connection.close()
+    server.shutdown()
+    server.server_close()
+
+def test_fechamento_mensal(get, model):
+    status, etag, rows = get('/rpc/get_fechamento_mensal?p_posto_id=1&p_mes=1&p_ano=2026')
+    assert status == 200 and etag
+    assert rows == day_rows(fechamento_mensal(model, 2026, 1))
+    assert all(row['status'] == 'PENDENTE' for row in rows)
+    assert get('/rpc/get_fechamento_mensal?p_mes=1&p_ano=2026') == (200, etag, rows)
+
+def test_encerrantes_mensal(get):
+    status, _, rows = get('/rpc/get_encerrantes_mensal?p_posto_id=1&p_mes=1&p_ano=2026')
+    assert status == 200 and rows
+    assert list(rows[0]) == ['bico_nome', 'combustivel_nome', 'leitura_inicial', 'leitura_final',
+                             'vendas_registradas', 'diferenca']
+    # Like the SQL function, a month without data is an empty set
+    assert get('/rpc/get_encerrantes_mensal?p_mes=3&p_ano=2026')[::2] == (200, [])
+
+@pytest.mark.parametrize('path, status', [
+    ('/rpc/get_fechamento_mensal?p_ano=2026', 400),
+    ('/rpc/get_fechamento_mensal?p_mes=x&p_ano=2026', 400),
+    ('/rpc/get_fechamento_mensal?p_posto_id=2&p_mes=1&p_ano=2026', 404),
+    ('/dia/2026-02-30', 400),
+    ('/dia/2026-03-01', 404),
+    ('/mes?ano=2026', 400),
+    ('/mes?ano=2026&mes=3', 404),
+    ('/nada', 404),
+])
+def test_errors(get, path, status):
+    assert get(path)[0] == status
+    assert 'error' in get(path)[2]
+
+def test_day_month_and_months(get, model):
+    status, _, row = get('/dia/2026-01-05')
+    assert status == 200
+    assert row == next(row for row in day_rows(fechamento_mensal(model, 2026, 1)) if row['dia'] == '2026-01-05')
+
+    status, _, totals = get('/mes?ano=2026&mes=2')
+    assert status == 200
+    assert totals['faturamento_bruto'] == 10.0 and (totals['ano'], totals['mes'], totals['dias']) == (2026, 2, 1)
+
+    status, _, months = get('/meses')
+    assert [(entry['ano'], entry['mes']) for entry in months] == [(2026, 1), (2026, 2)]
+    assert months[1]['dias'] == 1
+    assert get('/health')[::2] == (200, {'status': 'ok'})
+
+def test_if_none_match(get):
+    path = '/mes?ano=2026&mes=1'
+    _, etag, _ = get(path)
+    assert get(path, etag) == (304, etag, None)
+    assert get(path, '"other", ' + etag)[0] == 304
+    assert get(path, '"other"')[0] == 200
+
+def test_refresh_only_drops_its_month(get, store, model):
+    january, february = '/mes?ano=2026&mes=1', '/mes?ano=2026&mes=2'
+    _, january_etag, _ = get(january)
+    _, february_etag, _ = get(february)
+    get('/meses')
+
+    # The same data again changes nothing
+    assert store.update_month(2026, 1, fechamento_mensal(model, 2026, 1), encerrantes_mensal(model)) == []
+    days = fechamento_mensal(model, 2026, 1)
+    days['2026-01-05'] = dict(days['2026-01-05'], faturamento_bruto=days['2026-01-05']['faturamento_bruto'] + 1)
+    assert store.update_month(2026, 1, days, encerrantes_mensal(model)) == ['2026-01-05']
+
+    status, etag, _ = get(january, january_etag)
+    assert status == 200 and etag != january_etag
+    assert get(february, february_etag)[0] == 304
+    # /meses depends on every month; its body may not change within the same second
+    assert '/meses' not in store._responses
+
+def test_responses_are_cached(store):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {'a': 1}
+
+    assert store.response('k', (2026, 2), build) == store.response('k', (2026, 2), build)
+    assert len(calls) == 1
+    store.cache_size = 1
+    store.response('other', (2026, 2), build)
+    store.response('k', (2026, 2), build)
+    assert len(calls) == 3
@@ -0,0 +1,241 @@
+"""Tests for migrate_frentista.py: frentista extraction and the batched upsert"""
+import argparse
+import datetime
+import os
+from collections import Counter
+
+import pytest
+
+import migrate_frentista
+from db_executor import SqliteExecutor
+from month_model import load_csv_model, parse_month
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MES_01 = os.path.join(HERE, 'mes_01.csv')
+UNIQUE_MIGRATION = os.path.join(HERE, '..', '..', 'supabase', 'migrations',
+                                '20260203_add_fechamento_frentista_unique.sql')
+
+# The columns the migration touches; the unique index comes from UNIQUE_MIGRATION
+SCHEMA = '''
+CREATE TABLE "Fechamento" (id INTEGER PRIMARY KEY, data TEXT, total_vendas REAL, posto_id INT);
+CREATE TABLE "FechamentoFrentista" (
+    id INTEGER PRIMARY KEY, fechamento_id INT, frentista_id INT, posto_id INT,
+    valor_cartao_credito REAL DEFAULT 0, valor_cartao_debito REAL DEFAULT 0, valor_nota REAL DEFAULT 0,
+    valor_pix REAL DEFAULT 0, valor_dinheiro REAL DEFAULT 0, valor_moedas REAL DEFAULT 0,
+    baratao REAL DEFAULT 0, encerrante REAL DEFAULT 0
+);
+'''
+
+def _month(header, *lines):
+    """One-day month whose frentista block has the given header and lines"""
+    return parse_month([
+        ['', 'Caixa Dia 03 Posto Jorro.'],
+        ['', '', 'Venda Frentista'],
+        ['', '', ''] + header + [' Caixa.', '%'],
+    ] + [['', '', label] + values for label, values in lines])
+
+def test_model_frentista_data_from_csv():
+    data = migrate_frentista.model_frentista_data(load_csv_model(MES_01).days[1])
+    # The station column ('Posto - P - Jorro') is not a frentista
+    assert list(data) == ['Filip', 'Paulo', 'Barbra', 'Rosimeire', 'Sinho', 'Nayla', 'Elyon']
+    assert data['Filip']['valor_pix'] == 107.0
+    assert data['Filip']['valor_nota'] == 1075.7
+    assert data['Barbra']['encerrante'] == pytest.approx(2705.53)
+    assert data['Paulo']['valor_dinheiro'] == 0.0
+
+def test_model_frentista_data_follows_the_header():
+    model = _month(['Paulo', '', 'Leandro', 'Filip'],
+                   ('Pix', ['10', '', '30', '40']),
+                   ('Dinheiro', ['1.5', '', '', '4']))
+    data = migrate_frentista.model_frentista_data(model.days[3])
+    # Blank header cells are skipped, unmapped names are kept
+    assert data == {
+        'Paulo': {'valor_pix': 10.0, 'valor_dinheiro': 1.5},
+        'Leandro': {'valor_pix': 30.0, 'valor_dinheiro': 0.0},
+        'Filip': {'valor_pix': 40.0, 'valor_dinheiro': 4.0},
+    }
+
+def test_model_frentista_data_without_payment_lines():
+    model = _month(['Filip'], ('Salario Pago', ['100']))
+    assert migrate_frentista.model_frentista_data(model.days[3]) == {}
+
+def test_day_payloads_reports_unknown_frentistas():
+    model = _month(['Mery', 'Filip', 'gabi'], ('Pix', ['5', '6', '7']))
+    lines = []
+    stats = Counter()
+    payloads = migrate_frentista.day_payloads(3, model, lines.append, stats)
+    assert payloads == [('Filip', 1, {'valor_pix': 6.0})]
+    assert stats == Counter(unknown=2)
+    assert lines == ['  Unknown frentista: Mery', '  Unknown frentista: gabi']
+
+def test_station_column_is_not_a_frentista():
+    model = _month(['Filip', 'Paulo', 'POATO P - JORRO'], ('Pix', ['1', '2', '3']))
+    lines = []
+    stats = Counter()
+    payloads = migrate_frentista.day_payloads(3, model, lines.append, stats)
+    assert [p[0] for p in payloads] == ['Filip', 'Paulo']
+    assert lines == [] and stats == Counter()
+
+def test_day_payloads_uses_the_station_map():
+    model = _month(['Mery', 'Filip'], ('Pix', ['5', '6']))
+    stats = Counter()
+    payloads = migrate_frentista.day_payloads(3, model, lambda line: None, stats, {'Mery': 9})
+    assert payloads == [('Mery', 9, {'valor_pix': 5.0})]
+    assert stats == Counter(unknown=1)
+
+@pytest.fixture
+def database():
+    """SQLite executor with the unique index migration and a Fechamento per day of January 2026"""
+    executor = SqliteExecutor(':memory:')
+    with open(UNIQUE_MIGRATION, 'r', encoding='utf-8') as f:
+        executor.executescript(SCHEMA + f.read())
+    executor.executemany('INSERT INTO "Fechamento" (data, total_vendas, posto_id) VALUES (%s, 0, 1)',
+                         [(datetime.date(2026, 1, day).isoformat(),) for day in range(1, 32)])
+    yield executor
+    executor.close()
+
+def frentista_rows(executor):
+    return executor.execute('SELECT fechamento_id, frentista_id, valor_pix, encerrante '
+                            'FROM "FechamentoFrentista" ORDER BY fechamento_id, frentista_id')
+
+def test_upsert_updates_instead_of_duplicating(database):
+    records = [(1, 1, {'valor_pix': 10.0, 'encerrante': 50.0}), (1, 2, {'valor_pix': 20.0, 'encerrante': 60.0})]
+    assert migrate_frentista.upsert_fechamento_frentistas(records, database) == 1
+    changed = [(1, 2, {'valor_pix': 25.0}), (2, 1, {'valor_pix': 5.0})]
+    assert migrate_frentista.upsert_fechamento_frentistas(changed, database) == 1
+    assert frentista_rows(database) == [
+        {'fechamento_id': 1, 'frentista_id': 1, 'valor_pix': 10.0, 'encerrante': 50.0},
+        {'fechamento_id': 1, 'frentista_id': 2, 'valor_pix': 25.0, 'encerrante': 60.0},
+        {'fechamento_id': 2, 'frentista_id': 1, 'valor_pix': 5.0, 'encerrante': 0.0},
+    ]
+
+def test_upsert_needs_the_unique_index():
+    executor = SqliteExecutor(':memory:')
+    executor.executescript(SCHEMA)
+    with pytest.raises(Exception, match='ON CONFLICT'):
+        migrate_frentista.upsert_fechamento_frentistas([(1, 1, {'valor_pix': 1.0})], executor)
+    executor.close()
+
+@pytest.mark.parametrize('scope', ['day', 'month'])
+def test_process_month_batch_is_rerunnable(database, scope):
+    model = load_csv_model(MES_01)
+    days = sorted(model.days)
+
+    def run():
+        return migrate_frentista.process_month_batch(model, days, scope, '01', '2026', database,
+                                                     log=lambda line: None)
+
+    first = run()
+    rows = frentista_rows(database)
+    assert first['inserted'] == len(rows) > 0
+    assert first['updated'] == 0
+
+    # Filip's Pix of 2 January changes in the sheet
+    model.days[2].frentistas.rows['Pix'][0] += 10.0
+    second = run()
+    assert (second['inserted'], second['updated'], second['statements']) == (0, 1, 1)
+    assert second['unchanged'] == len(rows) - 1
+    after = frentista_rows(database)
+    assert len(after) == len(rows)
+    changed = [(old, new) for old, new in zip(rows, after) if old != new]
+    assert len(changed) == 1
+    old, new = changed[0]
+    assert (new['fechamento_id'], new['frentista_id']) == (2, 1)
+    assert new['valor_pix'] == pytest.approx(old['valor_pix'] + 10.0)
+
+    third = run()
+    assert (third['inserted'], third['updated'], third['statements']) == (0, 0, 0)
+    assert third['unchanged'] == len(rows)
+
+class FlakyExecutor:
+    """Fails the first `failures` calls, then returns [{'ok': 1}]"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def execute(self, query, params=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError('connection reset')
+        return [{'ok': 1}]
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(migrate_frentista.time, 'sleep', slept.append)
+    return slept
+
+@pytest.mark.parametrize('query, idempotent', [
+    ('SELECT 1', True),
+    ('  update "FechamentoFrentista" SET "valor_pix" = %s', True),
+    ('INSERT INTO "FechamentoFrentista" ("id") VALUES (%s) ON CONFLICT ("id") DO UPDATE SET "id" = 1', True),
+    ('\n    INSERT INTO "FechamentoFrentista" ("id") VALUES (%s)', False),
+])
+def test_is_idempotent(query, idempotent):
+    assert migrate_frentista.is_idempotent(query) is idempotent
+
+def test_transient_error_is_retried_with_backoff(monkeypatch, sleeps):
+    flaky = FlakyExecutor(2)
+    monkeypatch.setattr(migrate_frentista, 'executor', flaky)
+    assert migrate_frentista.execute_supabase_query('SELECT 1') == [{'ok': 1}]
+    assert flaky.calls == 3
+    backoff = migrate_frentista.RETRY_BACKOFF
+    assert sleeps == [backoff, backoff * 2]
+
+def test_plain_insert_is_not_retried(monkeypatch, sleeps):
+    flaky = FlakyExecutor(1)
+    monkeypatch.setattr(migrate_frentista, 'executor', flaky)
+    with pytest.raises(ConnectionError):
+        migrate_frentista.execute_supabase_query('INSERT INTO "FechamentoFrentista" ("id") VALUES (%s)', [1])
+    assert flaky.calls == 1
+    assert sleeps == []
+
+def test_gives_up_after_the_last_retry(monkeypatch, sleeps):
+    flaky = FlakyExecutor(10)
+    monkeypatch.setattr(migrate_frentista, 'executor', flaky)
+    monkeypatch.setattr(migrate_frentista, 'RETRIES', 2)
+    with pytest.raises(ConnectionError):
+        migrate_frentista.execute_supabase_query('SELECT 1')
+    assert flaky.calls == 3
+    assert len(sleeps) == 2
+
+def test_executor_is_closed_when_the_run_fails(monkeypatch, tmp_path):
+    class ClosingExecutor(FlakyExecutor):
+        closed = False
+
+        def print_summary(self):
+            pass
+
+        def close(self):
+            self.closed = True
+
+    opened = ClosingExecutor(0)
+    monkeypatch.setattr(migrate_frentista, 'make_executor', lambda *a: opened)
+    args = argparse.Namespace(retries=0, retry_backoff=0.0, pool_size=1, workers=1, backend='sqlite',
+                              dsn=':memory:', query_timing=False, day=None, cache_dir=None,
+                              source=str(tmp_path / 'missing.csv'))
+    with pytest.raises(FileNotFoundError):
+        migrate_frentista.migrate(argparse.ArgumentParser(), args)
+    assert opened.closed
+
+@pytest.mark.parametrize('current, value, changed', [
+    (10.0, 10.0, False),
+    (0.0, migrate_frentista.MONEY_TOLERANCE, False),  # exactly at the tolerance
+    (0.0, 0.006, True),
+    (100.0, 100.0 - migrate_frentista.MONEY_TOLERANCE / 2, False),
+    (100.0, 99.99, True),
+    ('1562.01', 1562.01, False),  # numeric columns may come back as text
+    (None, 0.0, False),  # a NULL column counts as 0.0
+    (None, 5.0, True),
+    ('n/a', 5.0, True),
+])
+def test_diff_fields_tolerance(current, value, changed):
+    changes = migrate_frentista.diff_fields({'valor_pix': current}, {'valor_pix': value})
+    assert changes == ({'valor_pix': value} if changed else {})
+
+def test_diff_fields_returns_only_changed_fields():
+    existing = {'valor_pix': 10.0, 'valor_nota': 5.0, 'encerrante': 15.0}
+    values = {'valor_pix': 10.001, 'valor_nota': 7.0, 'encerrante': None, 'baratao': 1.0}
+    assert migrate_frentista.diff_fields(existing, values) == {'valor_nota': 7.0, 'baratao': 1.0}
+    assert migrate_frentista.diff_fields(existing, values, tolerance=5.0) == {}
@@ -0,0 +1,72 @@
+"""Tests for month_model.parse_month: CSV, text and typed rows parse alike"""
+import os
+import zipfile
+
+import pytest
+
+from month_model import block_key, load_csv_model, parse_month
+from xlsx_to_csv import get_cell_formats, get_shared_strings, iter_typed_rows, iter_worksheet_rows, write_csv
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WORKBOOK = os.path.join(HERE, 'Posto,Jorro, 2026.xlsx')
+MES_01 = os.path.join(HERE, 'mes_01.csv')
+
+BLOCK_FIELDS = ('start', 'end', 'litros', 'venda', 'preco_medio', 'cartao_total', 'taxas', 'diferenca',
+                'nozzles', 'cards')
+
+def snapshot(model):
+    """Everything parse_month extracted, as comparable plain values"""
+    blocks = []
+    for block in model.blocks:
+        matrix = block.frentistas
+        blocks.append((block.key, [getattr(block, f) for f in BLOCK_FIELDS],
+                       None if matrix is None else
+                       (matrix.names, {label: list(v) for label, v in matrix.rows.items()}, matrix.caixa)))
+    nozzles = model.nozzles
+    cards = model.cards
+    return {
+        'days': sorted(model.days),
+        'summaries': sorted(model.summaries),
+        'blocks': blocks,
+        'nozzles': (nozzles.names, [list(getattr(nozzles, f)) for f in
+                                    ('block', 'nozzle', 'inicial', 'fechamento', 'litros', 'preco', 'venda')]),
+        'cards': (cards.names, [list(getattr(cards, f)) for f in ('block', 'card', 'bruto', 'taxa_pct', 'taxa')]),
+        'row_count': model.row_count,
+    }
+
+def sheet_rows(sheet_name, typed=False):
+    with zipfile.ZipFile(WORKBOOK, 'r') as zf:
+        shared_strings = get_shared_strings(zf)
+        if typed:
+            return list(iter_typed_rows(zf, sheet_name, shared_strings, get_cell_formats(zf)))
+        return list(iter_worksheet_rows(zf, sheet_name, shared_strings))
+
+def test_csv_model():
+    model = load_csv_model(MES_01)
+    assert sorted(model.days)[:3] == [1, 2, 3]
+    assert model.summaries
+    block = model.days[1]
+    assert block.venda > 0 and block.litros > 0
+    assert block.frentistas.names[0] == 'Filip'
+    assert len(model.nozzles) > 0 and len(model.cards) > 0
+
+@pytest.mark.parametrize('sheet_name', ['Mes, 01.', 'Mes, 06.'])
+def test_sheet_csv_round_trip(tmp_path, sheet_name):
+    rows = sheet_rows(sheet_name)
+    output_csv = str(tmp_path / 'mes.csv')
+    write_csv(rows, output_csv)
+    expected = snapshot(parse_month(rows))
+    assert snapshot(load_csv_model(output_csv)) == expected
+    # Typed cells skip float() parsing but must give the same numbers
+    assert snapshot(parse_month(sheet_rows(sheet_name, typed=True))) == expected
+
+def test_committed_csv_matches_the_workbook():
+    assert snapshot(load_csv_model(MES_01)) == snapshot(parse_month(sheet_rows('Mes, 01.', typed=True)))
+
+def test_block_key():
+    assert block_key(['', ' Caixa Dia 05 Posto Jorro. ']) == 5
+    assert block_key([None, 'Caixa Dia 01 a 31 Posto Jorro.']) == (1, 31)
+    # Only the header column opens a block; typed and short rows do not
+    assert block_key(['Caixa Dia 05', '']) is None
+    assert block_key([None, 5.0]) is None
+    assert block_key(['']) is None
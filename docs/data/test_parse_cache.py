@@ -0,0 +1,94 @@
+"""Tests for parse_cache.py: invalidation and LRU eviction"""
+import os
+
+import pytest
+
+import parse_cache
+from parse_cache import ParseCache, load_csv_rows
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'mes_01.csv'
+    path.write_text('a,b\n1,2\n', encoding='utf-8')
+    return str(path)
+
+def counting(value):
+    calls = []
+
+    def build():
+        calls.append(value)
+        return value
+    return build, calls
+
+def test_hit_after_miss(tmp_path, source):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    build, calls = counting(['rows'])
+    assert cache.get_or_build(source, 'csv_rows', build) == ['rows']
+    assert cache.get_or_build(source, 'csv_rows', build) == ['rows']
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Another kind or other parts are other entries
+    cache.get_or_build(source, 'csv_model', build)
+    cache.get_or_build(source, 'csv_rows', build, 'Mes, 01.')
+    assert len(calls) == 3
+
+def test_changed_source_is_rebuilt(tmp_path, source):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    assert load_csv_rows(source, cache) == [['a', 'b'], ['1', '2']]
+    with open(source, 'a', encoding='utf-8') as f:
+        f.write('3,4\n')
+    assert load_csv_rows(source, cache) == [['a', 'b'], ['1', '2'], ['3', '4']]
+    assert cache.misses == 2
+
+def test_touched_source_keeps_its_entry(tmp_path, source):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    load_csv_rows(source, cache)
+    st = os.stat(source)
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    # New mtime: the content is hashed again, finds the same digest and hits
+    load_csv_rows(source, cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_fingerprints_survive_a_restart(tmp_path, source, monkeypatch):
+    directory = str(tmp_path / 'cache')
+    ParseCache(directory).fingerprint(source)
+    hashed = []
+    monkeypatch.setattr(parse_cache, 'file_hash', hashed.append)
+    ParseCache(directory).fingerprint(source)
+    assert hashed == []
+
+def test_cache_version_change_misses(tmp_path, source, monkeypatch):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    build, calls = counting('model')
+    cache.get_or_build(source, 'csv_model', build)
+    monkeypatch.setattr(parse_cache, 'CACHE_VERSION', parse_cache.CACHE_VERSION + 1)
+    cache.get_or_build(source, 'csv_model', build)
+    assert len(calls) == 2
+
+def test_corrupt_entry_is_rebuilt(tmp_path, source):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    build, calls = counting('model')
+    cache.get_or_build(source, 'csv_model', build)
+    (entry, _, _), = cache.entries()
+    with open(entry, 'wb') as f:
+        f.write(b'not a pickle')
+    assert cache.get_or_build(source, 'csv_model', build) == 'model'
+    assert len(calls) == 2
+
+def test_least_recently_used_is_evicted(tmp_path, source):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    value = 'x' * 1000
+    for name in ('a', 'b'):
+        cache.get_or_build(source, name, lambda: value)
+    paths = {name: os.path.join(cache.directory, cache.key(source, name) + '.pkl') for name in ('a', 'b', 'c')}
+    os.utime(paths['a'], (1000, 1000))
+    os.utime(paths['b'], (2000, 2000))
+    # Reading 'a' makes it the most recently used entry
+    cache.get_or_build(source, 'a', lambda: value)
+
+    size = os.path.getsize(paths['a'])
+    cache.max_bytes = 2 * size
+    cache.get_or_build(source, 'c', lambda: value)
+    assert os.path.exists(paths['a']) and os.path.exists(paths['c'])
+    assert not os.path.exists(paths['b'])
+    assert cache.stats()['bytes'] <= cache.max_bytes
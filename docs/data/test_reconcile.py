@@ -0,0 +1,88 @@
+"""Tests for reconcile.py: sheet metrics diffed against the SQL functions"""
+import os
+
+import pytest
+
+import reconcile
+from month_model import load_csv_model
+
+MES_01 = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mes_01.csv')
+
+@pytest.fixture
+def model():
+    return load_csv_model(MES_01)
+
+def database_rows(model):
+    """get_fechamento_mensal / get_encerrantes_mensal rows that agree with the sheet"""
+    days = [dict(metrics, dia=f'{date}T00:00:00') for date, metrics in
+            reconcile.fechamento_mensal(model, 2026, 1).items()]
+    nozzles = [dict(entry, bico_nome=f"Bico {number}") for number, entry in
+               reconcile.encerrantes_mensal(model).items()]
+    return days, nozzles
+
+def fake_execute(days, nozzles):
+    queries = []
+
+    def execute(query, params=None):
+        queries.append((query, params))
+        return days if 'get_fechamento_mensal' in query else nozzles
+    return execute, queries
+
+@pytest.mark.parametrize('name, fuel', [
+    ('G,A.Bico 02', 'GASOLINA ADITIVADA'),
+    ('G,C. Bico 01', 'GASOLINA COMUM'),
+    ('Etanol Bico 05', 'ETANOL'),
+    ('DS 10 Bico 07', 'DIESEL S10'),
+])
+def test_combustivel_name(name, fuel):
+    assert reconcile.combustivel_name(name) == fuel
+
+def test_fee_and_nozzle_helpers():
+    assert reconcile.card_fee_rate('Cartão Crédito') == 0.035
+    assert reconcile.card_fee_rate('Debito') == 0.012
+    assert reconcile.card_fee_rate('Pix') == 0.0
+    assert reconcile.fuel_margin('Gasolina Aditivada') == 0.1153
+    assert reconcile.nozzle_number('G,C. Bico 01') == reconcile.nozzle_number('Bico 1') == 1
+
+def test_matching_database_has_no_mismatches(model):
+    execute, queries = fake_execute(*database_rows(model))
+    report = reconcile.reconcile_month(model, 2026, 1, execute)
+    assert report == {'concentrador': [], 'dias': [], 'bicos': []}
+    assert [params for _, params in queries] == [[1, 1, 2026], [1, 1, 2026]]
+
+def test_mismatches_are_reported(model):
+    days, nozzles = database_rows(model)
+    days[0]['faturamento_bruto'] += 1.0
+    missing_day = days.pop()['dia'][:10]
+    nozzles[0]['leitura_final'] -= 0.5
+    nozzles.append({'bico_nome': 'Bico 99', 'leitura_inicial': 0.0, 'leitura_final': 0.0,
+                    'vendas_registradas': 0.0, 'diferenca': 0.0})
+    execute, _ = fake_execute(days, nozzles)
+
+    report = reconcile.reconcile_month(model, 2026, 1, execute)
+    first_day = days[0]['dia'][:10]
+    sheet_value = reconcile.fechamento_mensal(model, 2026, 1)[first_day]['faturamento_bruto']
+    assert report['dias'] == [
+        (first_day, 'faturamento_bruto', pytest.approx(sheet_value), pytest.approx(sheet_value + 1.0)),
+        (missing_day, '*', 'present', 'missing'),
+    ]
+    first_nozzle = reconcile.nozzle_number(nozzles[0]['bico_nome'])
+    assert [(key, metric) for key, metric, _, _ in report['bicos']] == [
+        (first_nozzle, 'leitura_final'), (99, '*')]
+    assert report['bicos'][1][2:] == ('missing', 'present')
+    assert reconcile.print_report(1, report) == 4
+
+def test_tolerance(model):
+    days, nozzles = database_rows(model)
+    days[0]['volume_total'] += reconcile.DEFAULT_TOLERANCE / 2
+    execute, _ = fake_execute(days, nozzles)
+    assert reconcile.reconcile_month(model, 2026, 1, execute)['dias'] == []
+    assert len(reconcile.reconcile_month(model, 2026, 1, execute, tolerance=0.0)['dias']) == 1
+
+def test_concentrador_mismatch(model):
+    # Without a database only the sheet's own cross-check runs
+    assert reconcile.reconcile_month(model, 2026, 1) == {'concentrador': []}
+    block = model.days[5]
+    expected = block.venda - block.frentistas.caixa[reconcile.FRENTISTA_CONCENTRADOR]
+    block.diferenca = expected + 12.5
+    assert reconcile.concentrador_mismatches(model) == [(5, expected + 12.5, expected)]
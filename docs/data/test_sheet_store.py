@@ -0,0 +1,54 @@
+"""Tests for sheet_store.py: stored sheets load back exactly"""
+import datetime
+
+import sheet_store
+from xlsx_to_csv import CellError
+
+def _round_trip(tmp_path, rows, name='Mes, 01.'):
+    path = str(tmp_path / 'store.sqlite')
+    conn = sheet_store.connect(path)
+    try:
+        assert sheet_store.store_sheet(conn, name, rows) == len(rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return sheet_store.load_rows(path, name)
+
+def test_typed_values_round_trip(tmp_path):
+    rows = [
+        [None, 'Caixa Dia 01', None],
+        [],
+        [0.1 + 0.2, True, CellError('#DIV/0!'), datetime.date(2026, 1, 2),
+         datetime.datetime(2026, 1, 2, 7, 30), 0.0, ''],
+    ]
+    loaded = _round_trip(tmp_path, rows)
+    assert loaded == rows
+    assert [[type(v) for v in row] for row in loaded] == [[type(v) for v in row] for row in rows]
+
+def test_far_right_cell(tmp_path):
+    # More columns than SQLite allows in one table
+    stray = [None] * 5000 + ['stray']
+    rows = [['Produtos', 1.5], stray, stray[:3]]
+    assert _round_trip(tmp_path, rows) == rows
+
+def test_restore_replaces_the_sheet(tmp_path):
+    _round_trip(tmp_path, [['old', 1.0, 2.0], [True]])
+    assert _round_trip(tmp_path, [['new']]) == [['new']]
+
+def test_moved_sheets_leave_no_orphans(tmp_path):
+    path = str(tmp_path / 'store.sqlite')
+    conn = sheet_store.connect(path)
+    try:
+        sheet_store.store_sheet(conn, 'Mes, 01.', [[True, 1.0]], position=0)
+        sheet_store.store_sheet(conn, 'Mes, 02.', [[datetime.date(2026, 2, 1)], []], position=1)
+        # Mes, 01. moves to position 1, replacing Mes, 02.; position 0 is dropped
+        sheet_store.store_sheet(conn, 'Mes, 01.', [['moved']], position=1)
+        conn.commit()
+        assert conn.execute('SELECT DISTINCT sheet FROM widths').fetchall() == [('Mes, 01.',)]
+        assert conn.execute('SELECT * FROM kinds').fetchall() == []
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'sheet\\_%' ESCAPE '\\'").fetchall()
+        assert tables == [('sheet_1',)]
+    finally:
+        conn.close()
+    assert sheet_store.list_stored(path) == [('Mes, 01.', 1, None, None)]
+    assert sheet_store.load_rows(path, 'Mes, 01.') == [['moved']]
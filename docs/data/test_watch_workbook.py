@@ -0,0 +1,81 @@
+"""Tests for watch_workbook.sync: failed sheets are retried on the next tick"""
+import pytest
+
+from watch_workbook import WorkbookWatcher, sync
+from xlsx_fixtures import write_raw_workbook
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+SHEET = (f'<worksheet xmlns="{MAIN_NS}"><sheetData>'
+         '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1"><v>1.5</v></c></row>'
+         '</sheetData></worksheet>')
+STRINGS = f'<sst xmlns="{MAIN_NS}"><si><t>Caixa</t></si></sst>'
+
+def write_workbook(path, sheet=SHEET, strings=STRINGS):
+    write_raw_workbook(path, sheet, strings)
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'planilha.xlsx')
+    write_workbook(path)
+    return path
+
+def recorder(calls):
+    def handle(name, rows):
+        calls.append((name, rows))
+    return handle
+
+def test_sync_and_skip_unchanged(workbook):
+    watcher = WorkbookWatcher(workbook, settle=0)
+    calls = []
+    assert sync(watcher, [recorder(calls)], log=lambda line: None) == ['Mes, 01.']
+    assert calls == [('Mes, 01.', [['Caixa', '1.5']])]
+    assert sync(watcher, [recorder(calls)], log=lambda line: None) == []
+    assert len(calls) == 1
+
+def test_failed_handler_is_retried(workbook):
+    watcher = WorkbookWatcher(workbook, settle=0)
+    lines = []
+
+    def fail_once(name, rows):
+        if not lines:
+            raise RuntimeError('database down')
+
+    assert sync(watcher, [fail_once], log=lines.append) == []
+    assert lines == ['Mes, 01.: sync failed: RuntimeError: database down']
+    assert watcher.state == {}
+    assert watcher.settled()
+    assert sync(watcher, [fail_once], log=lines.append) == ['Mes, 01.']
+    assert not watcher.settled()
+
+def test_unparsable_sheet_is_retried(workbook):
+    write_workbook(workbook, SHEET[:-20])
+    watcher = WorkbookWatcher(workbook, settle=0)
+    lines = []
+    calls = []
+    assert sync(watcher, [recorder(calls)], log=lines.append) == []
+    assert len(lines) == 1 and lines[0].startswith('Mes, 01.: read failed:')
+    assert calls == [] and watcher.state == {}
+
+    write_workbook(workbook)
+    assert sync(watcher, [recorder(calls)], log=lines.append) == ['Mes, 01.']
+    assert calls == [('Mes, 01.', [['Caixa', '1.5']])]
+
+@pytest.mark.parametrize('original, corrupt, message', [
+    (b'<v>1.5</v>', b'<v>9.5</v>', 'Mes, 01.: read failed: BadZipFile'),
+    (b'<t>Caixa</t>', b'<t>Caixo</t>', 'Workbook not readable (BadZipFile'),
+], ids=['sheet', 'shared_strings'])
+def test_corrupt_member_is_retried(workbook, original, corrupt, message):
+    # Same length, so only the CRC check catches it
+    with open(workbook, 'rb') as f:
+        data = f.read()
+    with open(workbook, 'wb') as f:
+        f.write(data.replace(original, corrupt))
+    watcher = WorkbookWatcher(workbook, settle=0)
+    lines = []
+    assert sync(watcher, [recorder([])], log=lines.append) == []
+    assert lines[0].startswith(message)
+    assert watcher.state == {}
+
+    write_workbook(workbook)
+    assert sync(watcher, [recorder([])], log=lines.append) == ['Mes, 01.']
@@ -0,0 +1,118 @@
+"""Round-trip tests for xlsx_to_csv.py: worksheet rows -> CSV -> rows"""
+import csv
+import io
+import os
+import zipfile
+
+import pytest
+
+from xlsx_fixtures import write_raw_workbook
+from xlsx_to_csv import XML_BACKENDS, get_shared_strings, iter_worksheet_rows, list_sheets, sheet_width, write_csv
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WORKBOOK = os.path.join(HERE, 'Posto,Jorro, 2026.xlsx')
+MES_01 = os.path.join(HERE, 'mes_01.csv')
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+# Plain and rich text shared strings, text that needs CSV quoting, a
+# boolean (kept as its raw '1') and a gap row
+SHEET = f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="{MAIN_NS}"><dimension ref="A1:D4"/><sheetData>
+<row r="1"><c r="B1" t="s"><v>0</v></c><c r="C1" t="s"><v>1</v></c></row>
+<row r="2"><c r="A2"><v>6.28</v></c><c r="B2" t="s"><v>3</v></c>
+<c r="D2" t="b"><v>1</v></c></row>
+<row r="4"><c r="C4" t="s"><v>2</v></c><c r="D4"><v>-0.5</v></c></row>
+</sheetData></worksheet>'''
+STRINGS = (f'<sst xmlns="{MAIN_NS}"><si><t>Caixa Dia 01</t></si>'
+           '<si><r><t>G,C. </t></r><r><t>Bico 01</t></r><rPh><t>x</t></rPh></si>'
+           '<si><t xml:space="preserve">linha\nnova </t></si><si><t>Venda, "bico"</t></si></sst>')
+SHEET_ROWS = [
+    ['', 'Caixa Dia 01', 'G,C. Bico 01', ''],
+    ['6.28', 'Venda, "bico"', '', '1'],
+    ['', '', '', ''],
+    ['', '', 'linha\nnova ', '-0.5'],
+]
+
+def workbook(sheet=SHEET):
+    buffer = io.BytesIO()
+    write_raw_workbook(buffer, sheet, STRINGS)
+    buffer.seek(0)
+    return zipfile.ZipFile(buffer, 'r')
+
+def read_csv(path):
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+@pytest.mark.parametrize('backend', XML_BACKENDS)
+def test_rows_round_trip_through_csv(tmp_path, backend):
+    with workbook() as zf:
+        rows = list(iter_worksheet_rows(zf, 'Mes, 01.', get_shared_strings(zf), backend=backend))
+    assert rows == SHEET_ROWS
+
+    output_csv = str(tmp_path / 'mes_01.csv')
+    assert write_csv(rows, output_csv) == len(rows)
+    assert read_csv(output_csv) == rows
+
+@pytest.mark.parametrize('backend', XML_BACKENDS)
+def test_sheet_without_dimension_is_padded_to_its_widest_row(backend):
+    # The widest row comes last, after a gap row
+    sheet = (f'<worksheet xmlns="{MAIN_NS}"><sheetData>'
+             '<row r="1"><c r="A1" t="s"><v>0</v></c></row>'
+             '<row r="2"><c r="B2"><v>1.5</v></c></row>'
+             '<row r="4"><c r="A4"><v>2</v></c><c r="E4" t="s"><v>3</v></c></row>'
+             '</sheetData></worksheet>')
+    with workbook(sheet) as zf:
+        rows = list(iter_worksheet_rows(zf, 'Mes, 01.', get_shared_strings(zf), backend=backend))
+    assert rows == [['Caixa Dia 01', '', '', '', ''], ['', '1.5', '', '', ''], [''] * 5,
+                    ['2', '', '', '', 'Venda, "bico"']]
+
+@pytest.mark.parametrize('backend', XML_BACKENDS)
+@pytest.mark.parametrize('ref', ['A1:H9', 'A1'])
+def test_stale_dimension_does_not_change_the_rows(backend, ref):
+    # A wider dimension must not add columns, a narrower one must not
+    # give rows whose width changes mid-sheet
+    sheet = SHEET.replace('ref="A1:D4"', f'ref="{ref}"')
+    with workbook(sheet) as zf:
+        rows = list(iter_worksheet_rows(zf, 'Mes, 01.', get_shared_strings(zf), backend=backend))
+    assert rows == SHEET_ROWS
+
+def test_sheet_width_follows_implicit_cells():
+    # Row 2's cells have no r attribute and run on to column F
+    sheet = (f'<worksheet xmlns="{MAIN_NS}"><dimension ref="A1:B2"/><sheetData>'
+             '<row r="1"><c r="B1"><v>1</v></c></row>'
+             '<row r="2"><c r="D2"><v>2</v></c><c/><c><v>3</v></c></row>'
+             '</sheetData></worksheet>')
+    with workbook(sheet) as zf:
+        assert sheet_width(zf, 'xl/worksheets/sheet1.xml') == 6
+        rows = list(iter_worksheet_rows(zf, 'Mes, 01.', get_shared_strings(zf)))
+    assert rows == [['', '1', '', '', '', ''], ['', '', '', '2', '', '3']]
+
+@pytest.mark.parametrize('backend', XML_BACKENDS)
+def test_use_dimension_trusts_a_stale_dimension(backend):
+    sheet = SHEET.replace('ref="A1:D4"', 'ref="A1:F2"')
+    with workbook(sheet) as zf:
+        rows = list(iter_worksheet_rows(zf, 'Mes, 01.', get_shared_strings(zf), use_dimension=True,
+                                        backend=backend))
+    assert rows == [['', 'Caixa Dia 01', 'G,C. Bico 01', '', '', ''],
+                    ['6.28', 'Venda, "bico"', '', '1', '', '']]
+
+@pytest.mark.parametrize('backend', XML_BACKENDS)
+def test_sparse_rows_round_trip_through_csv(tmp_path, backend):
+    with workbook() as zf:
+        rows = list(iter_worksheet_rows(zf, 'Mes, 01.', get_shared_strings(zf), sparse=True, backend=backend))
+    assert rows[0] == ['', 'Caixa Dia 01', 'G,C. Bico 01']
+    assert rows[2] == []
+
+    output_csv = str(tmp_path / 'sparse.csv')
+    write_csv(rows, output_csv)
+    assert read_csv(output_csv) == rows
+
+@pytest.mark.parametrize('backend', XML_BACKENDS)
+def test_workbook_matches_the_committed_csv(tmp_path, backend):
+    with zipfile.ZipFile(WORKBOOK, 'r') as zf:
+        assert ('Mes, 01.', 'xl/worksheets/sheet1.xml') in list_sheets(zf)
+        rows = list(iter_worksheet_rows(zf, 'Mes, 01.', get_shared_strings(zf), backend=backend))
+    output_csv = str(tmp_path / 'mes_01.csv')
+    write_csv(rows, output_csv)
+    assert read_csv(output_csv) == read_csv(MES_01)
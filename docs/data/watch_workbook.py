@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Watch the live workbook and re-sync only the sheets that changed
+
+Polls the workbook with os.stat(); a tick where size and mtime did not
+change costs that one call. When they change, the file must stay
+unchanged for --settle seconds and open as a valid zip before anything
+is read, so partial saves are ignored. Changed sheets are then found
+from the CRC32 of their xl/worksheets/sheetN.xml entries in the zip
+directory, without inflating anything. When only sharedStrings.xml
+changed, a sheet whose XML is the same is re-read and kept only if its
+rows actually differ.
+
+Every changed sheet is streamed once and re-exported to CSV
+(--output-dir); with --migrate its frentista data also goes through
+migrate_frentista.process_month_batch. Sheet CRCs and row digests are
+kept in a JSON state file, so a restart does not re-sync unchanged
+sheets.
+
+Usage: python3 watch_workbook.py <xlsx_file> [--output-dir DIR] [--migrate --backend ...] [--once]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+import instrument
+import migrate_frentista
+from checkpoint import CheckpointStore
+from db_executor import BACKENDS, make_executor
+from month_model import MONTH_SHEET_RE, parse_month
+from xlsx_to_csv import get_shared_strings, iter_worksheet_rows, list_sheets, write_csv
+
+SHARED_STRINGS = 'xl/sharedStrings.xml'
+WORKBOOK_PARTS = ('xl/workbook.xml', 'xl/_rels/workbook.xml.rels')
+DEFAULT_INTERVAL = 2.0
+DEFAULT_SETTLE = 3.0
+
+def rows_digest(rows):
+    """sha256 of sheet rows, independent of how they were decoded"""
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(json.dumps(row, ensure_ascii=False).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+class WorkbookWatcher:
+    """Detects which sheets of a workbook changed between polls
+
+    state maps sheet name -> {"crc": sheet XML CRC32, "strings": shared
+    strings CRC32, "digest": rows digest} of the last synced version.
+    """
+
+    def __init__(self, path, state_path=None, settle=DEFAULT_SETTLE):
+        self.path = path
+        self.state_path = state_path
+        self.settle = settle
+        self.state = {}
+        self._signature = None
+        self._pending = None
+        self._pending_since = 0.0
+        self._sheets_key = None
+        self._sheets = []
+        if state_path and os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # Some editors replace the file on save
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def settled(self):
+        """True once a changed file has stayed the same for settle seconds"""
+        signature = self._stat_signature()
+        instrument.count('watch.ticks')
+        if signature is None or signature == self._signature:
+            return False
+        now = time.monotonic()
+        if signature != self._pending:
+            self._pending = signature
+            self._pending_since = now
+            return self.settle <= 0
+        return now - self._pending_since >= self.settle
+
+    def changed_sheets(self, zip_file):
+        """[(name, sheet_file, crc, strings_crc)] whose sheet or string CRC differs from the state"""
+        crcs = {info.filename: info.CRC for info in zip_file.infolist()}
+        key = tuple(crcs.get(part) for part in WORKBOOK_PARTS)
+        if key != self._sheets_key:
+            # Sheet names only need re-reading when the workbook parts change
+            self._sheets = list_sheets(zip_file)
+            self._sheets_key = key
+        strings_crc = crcs.get(SHARED_STRINGS)
+        changed = []
+        for name, sheet_file in self._sheets:
+            known = self.state.get(name, {})
+            crc = crcs.get(sheet_file)
+            if known.get('crc') != crc or known.get('strings') != strings_crc:
+                changed.append((name, sheet_file, crc, strings_crc))
+        return changed
+
+    def mark_synced(self, name, crc, strings_crc, digest):
+        self.state[name] = {'crc': crc, 'strings': strings_crc, 'digest': digest}
+
+    def mark_seen(self):
+        """Remember the file version just synced; later ticks on it are no-ops"""
+        self._signature = self._pending
+        self.save()
+
+    def save(self):
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+def sync(watcher, handlers, log=print):
+    """Run handlers(name, rows) for every changed sheet; returns the names synced
+
+    Sheets that could not be read or parsed, or whose handler failed,
+    keep their old state and the file version is not marked as seen, so
+    they are retried on the next tick.
+    """
+    try:
+        zip_file = zipfile.ZipFile(watcher.path, 'r')
+    except (OSError, zipfile.BadZipFile) as e:
+        log(f"Workbook not readable yet ({e}); waiting")
+        return []
+
+    synced = []
+    failed = False
+    with zip_file:
+        try:
+            changed = watcher.changed_sheets(zip_file)
+            shared_strings = get_shared_strings(zip_file) if changed else None
+        except Exception as e:
+            # A corrupt member or unparsable XML; the next save may fix it
+            log(f"Workbook not readable ({type(e).__name__}: {e}); retrying")
+            instrument.count('watch.failed')
+            return []
+        for name, sheet_file, crc, strings_crc in changed:
+            try:
+                with instrument.span('watch.read'):
+                    rows = list(iter_worksheet_rows(zip_file, name, shared_strings, sheet_file))
+                digest = rows_digest(rows)
+            except Exception as e:
+                log(f"{name}: read failed: {type(e).__name__}: {e}")
+                instrument.count('watch.failed')
+                failed = True
+                continue
+            if digest == watcher.state.get(name, {}).get('digest'):
+                # Only the shared strings table moved; this sheet reads the same
+                watcher.mark_synced(name, crc, strings_crc, digest)
+                continue
+            try:
+                for handler in handlers:
+                    handler(name, rows)
+            except Exception as e:
+                log(f"{name}: sync failed: {type(e).__name__}: {e}")
+                instrument.count('watch.failed')
+                failed = True
+                continue
+            watcher.mark_synced(name, crc, strings_crc, digest)
+            synced.append(name)
+            instrument.count('watch.synced')
+
+    if failed:
+        watcher.save()
+    else:
+        watcher.mark_seen()
+    return synced
+
+def csv_handler(output_dir, log=print):
+    """Handler writing each changed sheet to <output_dir>/<sheet>.csv"""
+    os.makedirs(output_dir, exist_ok=True)
+
+    def handle(name, rows):
+        output_csv = os.path.join(output_dir, f'{name}.csv')
+        total = write_csv(rows, output_csv)
+        log(f"{name}: {total} rows -> {output_csv}")
+    return handle
+
+def migrate_handler(execute, year, posto_id, checkpoint_path=None, dry_run=False, log=print):
+    """Handler migrating the frentista data of each changed monthly sheet"""
+    def handle(name, rows):
+        match = MONTH_SHEET_RE.match(name)
+        if not match:
+            return
+        month = int(match.group(1))
+        model = parse_month(rows)
+        checkpoint = None
+        if checkpoint_path:
+            checkpoint = CheckpointStore(checkpoint_path, f"{posto_id}:{year}-{month:02d}")
+        totals = migrate_frentista.process_month_batch(
+            model, sorted(model.days), 'day', f'{month:02d}', year, execute,
+            checkpoint=checkpoint, dry_run=dry_run, posto_id=posto_id,
+            log=lambda line: log(f"{name}: {line.strip()}"))
+        log(f"{name}: {totals['inserted']} inserted, {totals['updated']} updated, "
+            f"{totals['unchanged']} unchanged")
+    return handle
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-sync the sheets of a workbook whenever they change')
+    parser.add_argument('xlsx_file')
+    parser.add_argument('--output-dir', help='Re-export changed sheets as CSV into this directory')
+    parser.add_argument('--state', help='State file (default: <xlsx_file>.watch.json, none on --dry-run)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'Seconds between polls (default: {DEFAULT_INTERVAL})')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help=f'Seconds the file must stay unchanged before syncing (default: {DEFAULT_SETTLE})')
+    parser.add_argument('--once', action='store_true', help='Sync once and exit instead of watching')
+    parser.add_argument('--migrate', action='store_true', help='Migrate frentista data of changed month sheets')
+    parser.add_argument('--year', default='2026', help='Year of the workbook (default: 2026)')
+    parser.add_argument('--posto-id', type=int, default=migrate_frentista.DEFAULT_POSTO_ID,
+                        help=f'Posto the workbook belongs to (default: {migrate_frentista.DEFAULT_POSTO_ID})')
+    parser.add_argument('--backend', choices=BACKENDS, default='mcp', help='Database backend (default: mcp)')
+    parser.add_argument('--dsn', help='Postgres DSN (default: $DATABASE_URL) or SQLite database path')
+    parser.add_argument('--checkpoint', metavar='PATH', help='Migration checkpoint file')
+    parser.add_argument('--dry-run', action='store_true', help='Report what the migration would change')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.output_dir and not args.migrate:
+        parser.error('nothing to do: give --output-dir and/or --migrate')
+
+    handlers = []
+    if args.output_dir:
+        handlers.append(csv_handler(args.output_dir))
+    executor = None
+    if args.migrate:
+        executor = migrate_frentista.executor = make_executor(args.backend, args.dsn)
+        handlers.append(migrate_handler(migrate_frentista.execute_supabase_query, args.year, args.posto_id,
+                                        args.checkpoint, args.dry_run))
+
+    # A dry run must not mark sheets as synced for the next real run
+    state_path = None if args.dry_run else args.state or args.xlsx_file + '.watch.json'
+    watcher = WorkbookWatcher(args.xlsx_file, state_path, 0 if args.once else args.settle)
+    with instrument.run('watch_workbook', args):
+        try:
+            if args.once:
+                watcher.settled()
+                synced = sync(watcher, handlers)
+                print(f"Synced {len(synced)} sheets")
+                return
+            print(f"Watching {args.xlsx_file} every {args.interval}s (Ctrl+C to stop)")
+            while True:
+                if watcher.settled():
+                    started = time.perf_counter()
+                    synced = sync(watcher, handlers)
+                    if synced:
+                        print(f"{time.strftime('%H:%M:%S')} synced {len(synced)} sheets: {', '.join(synced)} "
+                              f"({time.perf_counter() - started:.2f}s)")
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            print("Stopped")
+        finally:
+            if executor is not None:
+                executor.close()
+
+if __name__ == '__main__':
+    main()
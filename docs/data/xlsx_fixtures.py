@@ -0,0 +1,24 @@
+"""Hand-written .xlsx files for the xlsx_to_csv tests and benchmarks"""
+import zipfile
+from xml.sax.saxutils import escape
+
+from synthetic_workbook import PKG_REL_NS, REL_NS
+from xlsx_to_csv import SHEET_NS
+
+def write_raw_workbook(target, sheet, strings, sheet_name='Mes, 01.'):
+    """Write a one-sheet .xlsx from raw worksheet and sharedStrings XML
+
+    target is a path or a binary file object. Only the parts the readers
+    in xlsx_to_csv need are written, and members are stored, not
+    deflated, so tests can corrupt their bytes in place.
+    """
+    with zipfile.ZipFile(target, 'w', zipfile.ZIP_STORED) as z:
+        z.writestr('xl/workbook.xml',
+                   f'<workbook xmlns="{SHEET_NS[1:-1]}" xmlns:r="{REL_NS}"><sheets>'
+                   f'<sheet name="{escape(sheet_name, {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/>'
+                   '</sheets></workbook>')
+        z.writestr('xl/_rels/workbook.xml.rels',
+                   f'<Relationships xmlns="{PKG_REL_NS}">'
+                   '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>')
+        z.writestr('xl/sharedStrings.xml', strings)
+        z.writestr('xl/worksheets/sheet1.xml', sheet)
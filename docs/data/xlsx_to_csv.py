@@ -4,26 +4,104 @@ Script to convert Excel xlsx to CSV without pandas
 """
 import zipfile
 import xml.etree.ElementTree as ET
-import sys
+from xml.parsers import expat
+import os
 import csv
+import datetime
 import re
+import time
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import instrument
+from parse_cache import ParseCache, open_cache
+
+class SharedStrings:
+    """Lazily decoded shared strings table.
+
+    Keeps the raw sharedStrings.xml bytes plus an array of <si> offsets,
+    and only decodes an entry the first time a cell references it.
+    Rich text entries join all of their <r> runs; phonetic hints (<rPh>)
+    are skipped. hits/misses count cached versus freshly decoded lookups.
+    """
+
+    _SI_START = re.compile(rb'<(?:\w+:)?si[\s>/]')
+
+    def __init__(self, data=b''):
+        self._data = data
+        self._offsets = array('L')
+        self._decoded = {}
+        self.hits = 0
+        self.misses = 0
+
+        # The root start tag carries the namespace declarations, so each
+        # <si> fragment is wrapped in it before parsing
+        root_start = re.search(rb'<(?:\w+:)?sst[\s>]', data)
+        if root_start is None:
+            self._wrap_open = self._wrap_close = b''
+            return
+        open_end = data.index(b'>', root_start.start())
+        self._wrap_open = data[root_start.start():open_end + 1]
+        root_tag = data[root_start.start() + 1:root_start.end() - 1]
+        self._wrap_close = b'</' + root_tag + b'>'
+
+        for match in self._SI_START.finditer(data, open_end):
+            self._offsets.append(match.start())
+        if self._offsets:
+            self._offsets.append(data.rindex(b'</'))
+
+    def __len__(self):
+        return max(len(self._offsets) - 1, 0)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('shared string index out of range')
+
+        value = self._decoded.get(index)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        fragment = self._data[self._offsets[index]:self._offsets[index + 1]]
+        root = ET.fromstring(self._wrap_open + fragment + self._wrap_close)
+        value = ''.join(_si_text(si) for si in root)
+        self._decoded[index] = value
+        return value
+
+    def stats(self):
+        """Return a summary of how much of the table was touched"""
+        return {
+            'total': len(self),
+            'decoded': len(self._decoded),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+def _si_text(si):
+    """Join the text runs of an <si> element, skipping phonetic runs"""
+    parts = []
+    for child in si:
+        local = child.tag.rsplit('}', 1)[-1]
+        if local == 't':
+            parts.append(child.text or '')
+        elif local == 'r':
+            for t in child:
+                if t.tag.rsplit('}', 1)[-1] == 't':
+                    parts.append(t.text or '')
+    return ''.join(parts)
 
 def get_shared_strings(zip_file):
-    """Extract shared strings from the Excel file"""
-    try:
-        with zip_file.open('xl/sharedStrings.xml') as f:
-            tree = ET.parse(f)
-            root = tree.getroot()
-            strings = []
-            for si in root.findall('.//{http://schemas.openxmlformats.org/spreadsheetml/2006/main}si'):
-                t = si.find('.//{http://schemas.openxmlformats.org/spreadsheetml/2006/main}t')
-                if t is not None:
-                    strings.append(t.text or '')
-                else:
-                    strings.append('')
-            return strings
-    except:
-        return []
+    """Load the shared strings table of the Excel file"""
+    with instrument.span('xlsx.shared_strings'):
+        try:
+            return SharedStrings(zip_file.read('xl/sharedStrings.xml'))
+        except KeyError:
+            return SharedStrings()
 
 def parse_cell_reference(cell_ref):
     """Parse cell reference like 'A1' to get column and row"""
@@ -41,8 +119,8 @@ def column_letter_to_index(col):
         index = index * 26 + (ord(char) - ord('A') + 1)
     return index - 1
 
-def read_worksheet(zip_file, sheet_name, shared_strings):
-    """Read worksheet XML and return rows as lists"""
+def find_sheet_file(zip_file, sheet_name):
+    """Resolve a sheet name to its worksheet XML path inside the zip"""
     # First, find the sheet file that corresponds to the sheet name
     r_id = None
     with zip_file.open('xl/workbook.xml') as f:
@@ -73,87 +151,771 @@ def read_worksheet(zip_file, sheet_name, shared_strings):
     if sheet_file is None:
         raise ValueError(f"Could not find worksheet file for sheet '{sheet_name}'")
 
-    # Read the worksheet
-    with zip_file.open(sheet_file) as f:
-        tree = ET.parse(f)
-        root = tree.getroot()
+    return sheet_file
+
+def list_sheets(zip_file):
+    """Return (sheet_name, sheet_file) pairs for every worksheet, in workbook order"""
+    with zip_file.open('xl/_rels/workbook.xml.rels') as f:
+        root = ET.parse(f).getroot()
+        ns = {'ns': 'http://schemas.openxmlformats.org/package/2006/relationships'}
+        targets = {rel.get('Id'): rel.get('Target') for rel in root.findall('.//ns:Relationship', ns)}
+
+    sheets = []
+    with zip_file.open('xl/workbook.xml') as f:
+        root = ET.parse(f).getroot()
         ns = {'ns': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        for sheet in root.findall('.//ns:sheet', ns):
+            r_id = sheet.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id')
+            target = targets.get(r_id)
+            if target is not None:
+                sheets.append((sheet.get('name'), 'xl/' + target))
+    return sheets
+
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+# Worksheet XML decoders for iter_worksheet_rows; both give identical rows
+XML_BACKENDS = ('expat', 'etree')
+DEFAULT_XML_BACKEND = 'expat'
+
+# Bytes handed to the expat parser per call
+EXPAT_CHUNK = 64 * 1024
+
+def _column_table():
+    """Column letters -> 0-based index for 'A' through 'ZZZ' (covers XFD)"""
+    letters = [chr(ord('A') + i) for i in range(26)]
+    names = list(letters)
+    for _ in range(2):
+        names += [a + b for a in names[-26 ** (len(names[-1])):] for b in letters]
+    return {name: i for i, name in enumerate(names)}
+
+COLUMN_INDEX = _column_table()
+
+def split_cell_reference(cell_ref):
+    """'AB12' -> (27, 12) using COLUMN_INDEX; row is None for a bare column"""
+    letters = cell_ref.rstrip('0123456789')
+    col = COLUMN_INDEX.get(letters)
+    if col is None:
+        col = column_letter_to_index(letters)
+    digits = cell_ref[len(letters):]
+    return col, int(digits) if digits else None
+
+def iter_worksheet_rows(zip_file, sheet_name, shared_strings, sheet_file=None,
+                        sparse=False, use_dimension=False, backend=None):
+    """Stream worksheet rows one at a time.
+
+    Rows are handed out as soon as they are decoded, so memory depends
+    on row width instead of sheet size. By default every row is padded
+    to the sheet's widest row, found by a quick pre-scan of the cell
+    positions (sheet_width): the <dimension> element can be stale. With
+    use_dimension=True the dimension is trusted instead and no pre-scan
+    is made.
 
-        # Get all cells
-        cells = root.findall('.//ns:c', ns)
-
-        # Organize cells by row and column
-        rows = {}
-        for cell in cells:
-            cell_ref = cell.get('r')
-            col, row = parse_cell_reference(cell_ref)
-            col_idx = column_letter_to_index(col)
-
-            # Get cell value
-            v = cell.find('ns:v', ns)
-            cell_type = cell.get('t', 'n')
-
-            if v is not None:
-                value = v.text
-                if cell_type == 's' and shared_strings:
-                    # It's a shared string
-                    try:
-                        if value is not None:
-                            value = shared_strings[int(value)]
-                        else:
-                            value = ''
-                    except:
-                        pass
+    With sparse=True each row stops at its last non-empty cell and every
+    run of empty rows collapses into a single empty row, so formatted but
+    blank cells do not inflate the output. With use_dimension=True cells
+    outside the sheet's <dimension> range are also dropped and parsing
+    stops at its last row. Column positions are never shifted.
+
+    Cells and rows without an r attribute take the position after the
+    previous one. backend picks the XML decoder from XML_BACKENDS
+    (default DEFAULT_XML_BACKEND): 'expat' drives pyexpat callbacks
+    directly, 'etree' uses ElementTree.iterparse.
+
+    Pass sheet_file (from list_sheets) to skip the workbook lookup.
+
+    Time spent producing rows is recorded in the 'xlsx.rows' span and the
+    part of it spent inflating the zip member in 'xlsx.inflate'.
+    """
+    rows = _iter_worksheet_rows(zip_file, sheet_name, shared_strings, sheet_file, sparse, use_dimension,
+                                backend or DEFAULT_XML_BACKEND)
+    seconds = 0.0
+    count = 0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                row = next(rows)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.perf_counter() - started
+            count += 1
+            yield row
+    finally:
+        rows.close()
+        instrument.add_time('xlsx.rows', seconds)
+        instrument.count('xlsx.rows', count)
+
+def _cell_value(text, cell_type, shared_strings):
+    """Value of a cell given the text of its <v> (None when <v> is empty)"""
+    if cell_type == 's' and shared_strings:
+        try:
+            if text is not None:
+                return shared_strings[int(text)]
+            return ''
+        except (ValueError, IndexError):
+            pass
+    return text
+
+def _etree_cells(f, shared_strings):
+    """Yield (None, dimension ref) and (row number, {col: value}) with ElementTree"""
+    row_tag = SHEET_NS + 'row'
+    cell_tag = SHEET_NS + 'c'
+    value_tag = SHEET_NS + 'v'
+    dimension_tag = SHEET_NS + 'dimension'
+    sheet_data_tag = SHEET_NS + 'sheetData'
+
+    sheet_data = None
+    row_num = 0
+    for event, elem in ET.iterparse(f, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == sheet_data_tag:
+                sheet_data = elem
+            continue
+
+        if elem.tag == dimension_tag:
+            yield None, elem.get('ref', '')
+            continue
+
+        if elem.tag != row_tag:
+            continue
+
+        values = {}
+        col = -1
+        cell_row = None
+        for cell in elem.iter(cell_tag):
+            ref = cell.get('r')
+            if ref:
+                col, explicit_row = split_cell_reference(ref)
+                cell_row = explicit_row or cell_row
             else:
-                value = ''
-
-            if row not in rows:
-                rows[row] = {}
-            rows[row][col_idx] = value
-
-        # Convert to list of lists
-        max_row = max(rows.keys()) if rows else 0
-
-        # Find max columns across all rows
-        max_col = 0
-        for row_num in rows:
-            if rows[row_num]:
-                row_cols = list(rows[row_num].keys())
-                if row_cols:
-                    current_max = max(row_cols)
-                    if current_max > max_col:
-                        max_col = current_max
-
-        data = []
-        for row_num in range(1, max_row + 1):
-            row_data = []
-            if row_num in rows:
-                for col_idx in range(max_col + 1):
-                    row_data.append(rows[row_num].get(col_idx, ''))
+                col += 1
+            v = cell.find(value_tag)
+            values[col] = _cell_value(v.text, cell.get('t', 'n'), shared_strings) if v is not None else ''
+
+        ref = elem.get('r')
+        row_num = cell_row or (int(ref) if ref else row_num + 1)
+
+        # Done with this row, drop it from the tree
+        elem.clear()
+        if sheet_data is not None:
+            sheet_data.clear()
+        yield row_num, values
+
+def _expat_cells(f, shared_strings):
+    """Same items as _etree_cells, decoded with pyexpat callbacks"""
+    ns = SHEET_NS[1:-1] + '}'
+    row_tag = ns + 'row'
+    cell_tag = ns + 'c'
+    value_tag = ns + 'v'
+    dimension_tag = ns + 'dimension'
+    column_index = COLUMN_INDEX
+
+    out = []
+    values = None
+    row_ref = None
+    row_num = 0
+    last_ref = None
+    col = -1
+    cell_type = None
+    value = ''
+    text = None
+    seen_value = False
+    # Elements open inside the current cell; -1 outside any cell
+    nested = -1
+
+    def start(name, attrs):
+        nonlocal row_ref, last_ref, col, cell_type, value, text, seen_value, nested, values
+        if nested >= 0:
+            nested += 1
+            # Only the first <v> directly inside the cell, like cell.find('v')
+            if nested == 1 and name == value_tag and not seen_value:
+                text = ''
+        elif name == cell_tag:
+            if values is None:
+                return
+            ref = attrs.get('r')
+            if ref:
+                letters = ref.rstrip('0123456789')
+                col = column_index.get(letters)
+                if col is None:
+                    col = column_letter_to_index(letters)
+                if len(letters) < len(ref):
+                    last_ref = ref
             else:
-                for col_idx in range(max_col + 1):
-                    row_data.append('')
-            data.append(row_data)
+                col += 1
+            cell_type = attrs.get('t')
+            value = ''
+            seen_value = False
+            nested = 0
+        elif name == row_tag:
+            values = {}
+            row_ref = attrs.get('r')
+            last_ref = None
+            col = -1
+        elif name == dimension_tag:
+            out.append((None, attrs.get('ref', '')))
 
-        return data
+    def end(name):
+        nonlocal row_num, value, text, seen_value, nested, values
+        if nested > 0:
+            nested -= 1
+            if text is not None and nested == 0:
+                if cell_type == 's':
+                    value = _cell_value(text or None, cell_type, shared_strings)
+                else:
+                    value = text or None
+                seen_value = True
+                text = None
+        elif nested == 0:
+            values[col] = value
+            nested = -1
+        elif name == row_tag and values is not None:
+            if last_ref:
+                row_num = int(last_ref[len(last_ref.rstrip('0123456789')):])
+            else:
+                row_num = int(row_ref) if row_ref else row_num + 1
+            out.append((row_num, values))
+            values = None
 
-if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: python3 xlsx_to_csv.py <xlsx_file> <sheet_name> [output_csv]")
-        sys.exit(1)
+    def characters(data):
+        nonlocal text
+        if text is not None:
+            text += data
+
+    parser = expat.ParserCreate(namespace_separator='}')
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = characters
+
+    while True:
+        chunk = f.read(EXPAT_CHUNK)
+        parser.Parse(chunk, not chunk)
+        if out:
+            yield from out
+            del out[:]
+        if not chunk:
+            break
+
+_CELL_READERS = {'etree': _etree_cells, 'expat': _expat_cells}
+
+def sheet_width(zip_file, sheet_file):
+    """Width of the widest row of a worksheet, from its cell positions
+
+    Only <row> and <c> start tags are looked at (no values, no shared
+    strings), so this pass costs a fraction of decoding the sheet. Cells
+    without an r attribute take the position after the previous one.
+    """
+    ns = SHEET_NS[1:-1] + '}'
+    row_tag = ns + 'row'
+    cell_tag = ns + 'c'
+    column_index = COLUMN_INDEX
+    col = -1
+    widest = -1
+    in_row = False
+
+    def start(name, attrs):
+        nonlocal col, widest, in_row
+        if name == cell_tag:
+            if not in_row:
+                return
+            ref = attrs.get('r')
+            if ref:
+                letters = ref.rstrip('0123456789')
+                col = column_index.get(letters)
+                if col is None:
+                    col = column_letter_to_index(letters)
+            else:
+                col += 1
+            if col > widest:
+                widest = col
+        elif name == row_tag:
+            in_row = True
+            col = -1
+
+    def end(name):
+        nonlocal in_row
+        if name == row_tag:
+            in_row = False
+
+    parser = expat.ParserCreate(namespace_separator='}')
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    with instrument.span('xlsx.width'):
+        with instrument.TimedReader(zip_file.open(sheet_file), 'xlsx.inflate') as f:
+            while True:
+                chunk = f.read(EXPAT_CHUNK)
+                parser.Parse(chunk, not chunk)
+                if not chunk:
+                    break
+    return widest + 1
+
+def _iter_worksheet_rows(zip_file, sheet_name, shared_strings, sheet_file, sparse, use_dimension,
+                         backend):
+    if sheet_file is None:
+        sheet_file = find_sheet_file(zip_file, sheet_name)
+    try:
+        read_cells = _CELL_READERS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown XML backend '{backend}' (choose from {', '.join(XML_BACKENDS)})")
 
-    xlsx_file = sys.argv[1]
-    sheet_name = sys.argv[2]
-    output_csv = sys.argv[3] if len(sys.argv) > 3 else f'{sheet_name}.csv'
+    measure = partial(sheet_width, zip_file, sheet_file)
+    # Measured before the member is opened again, so the two reads never overlap
+    width = measure() if not (sparse or use_dimension) else None
+    with instrument.TimedReader(zip_file.open(sheet_file), 'xlsx.inflate') as f:
+        yield from _layout_rows(read_cells(f, shared_strings), sparse, use_dimension, width=width,
+                                measure=measure)
 
+def _layout_rows(items, sparse, use_dimension, blank='', width=None, measure=None):
+    """Turn (row number, {col: value}) items into padded rows
+
+    blank fills missing cells: '' for text rows, None for typed rows,
+    where sparse then keeps 0.0 and False but drops None and ''.
+    Padded rows take the width of the (None, dimension ref) item with
+    use_dimension, and otherwise the sheet's real width: width when the
+    caller measured it, else measure() before the first row. Either way
+    every row is yielded as soon as it arrives.
+    """
+    last_row = 0
+    max_col = None
+    max_row = None
+    cells = 0
+
+    try:
+        for row, values in items:
+            if row is None:
+                if use_dimension:
+                    col, row = parse_cell_reference(values.split(':')[-1])
+                    if col:
+                        max_col = column_letter_to_index(col)
+                        max_row = row
+                        width = max_col + 1
+                continue
+
+            if max_col is not None:
+                values = {c: v for c, v in values.items() if c <= max_col}
+            if sparse:
+                if blank is None:
+                    values = {c: v for c, v in values.items() if v is not None and v != ''}
+                else:
+                    values = {c: v for c, v in values.items() if v}
+            cells += len(values)
+
+            if max_row is not None and row > max_row:
+                break
+
+            if not values:
+                continue
+
+            if sparse:
+                # One empty row stands in for any run of blank rows
+                if row > last_row + 1:
+                    yield []
+                last_row = row
+                yield [values.get(col_idx, blank) for col_idx in range(max(values) + 1)]
+                continue
+
+            if width is None:
+                width = measure()
+
+            # Emit blank rows for any gap, like Excel shows them
+            for _ in range(last_row + 1, row):
+                yield [blank] * width
+            last_row = row
+            yield [values.get(col_idx, blank) for col_idx in range(width)]
+    finally:
+        instrument.count('xlsx.cells', cells)
+
+# Built-in numFmtIds that display a date or time
+DATE_FORMAT_IDS = frozenset(list(range(14, 23)) + list(range(27, 37)) + list(range(45, 48))
+                            + list(range(50, 59)))
+
+_FORMAT_LITERALS = re.compile(r'"[^"]*"|\\.|\[[^\]]*\]|_.|\*.')
+
+class CellError(str):
+    """Value of an error cell (t="e"), e.g. '#DIV/0!'"""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"CellError({str.__repr__(self)})"
+
+class CellFormats:
+    """What typed decoding needs from styles.xml and workbook.xml
+
+    date_styles holds the cellXfs indexes (the s attribute of a cell)
+    whose number format shows a date or time; date1904 is the workbook's
+    date system.
+    """
+
+    def __init__(self, date_styles=frozenset(), date1904=False):
+        self.date_styles = date_styles
+        self.date1904 = date1904
+
+def is_date_format(code):
+    """True when a numFmt formatCode displays a date or time"""
+    if '[h]' in code.lower() or '[m]' in code.lower() or '[s]' in code.lower():
+        return True
+    # Drop quoted text, escapes, [Red]/[$-416] sections and padding
+    stripped = _FORMAT_LITERALS.sub('', code.split(';', 1)[0]).lower()
+    return stripped != 'general' and any(ch in stripped for ch in 'dmyhs')
+
+def get_cell_formats(zip_file):
+    """Load the date styles and date system of a workbook"""
+    ns = {'ns': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    date1904 = False
+    with zip_file.open('xl/workbook.xml') as f:
+        properties = ET.parse(f).getroot().find('ns:workbookPr', ns)
+        if properties is not None:
+            date1904 = properties.get('date1904', '0').lower() in ('1', 'true')
+
+    try:
+        root = ET.fromstring(zip_file.read('xl/styles.xml'))
+    except KeyError:
+        return CellFormats(date1904=date1904)
+
+    date_ids = set(DATE_FORMAT_IDS)
+    for fmt in root.findall('ns:numFmts/ns:numFmt', ns):
+        num_fmt_id = int(fmt.get('numFmtId', -1))
+        if is_date_format(fmt.get('formatCode', '')):
+            date_ids.add(num_fmt_id)
+        else:
+            date_ids.discard(num_fmt_id)
+    date_styles = frozenset(i for i, xf in enumerate(root.findall('ns:cellXfs/ns:xf', ns))
+                            if int(xf.get('numFmtId', 0)) in date_ids)
+    return CellFormats(date_styles, date1904)
+
+def excel_serial_to_datetime(serial, date1904=False):
+    """Excel date serial -> date (whole days) or datetime, to the second"""
+    if date1904:
+        base = datetime.datetime(1904, 1, 1)
+    elif serial < 60:
+        # Excel counts the nonexistent 1900-02-29 as day 60
+        base = datetime.datetime(1899, 12, 31)
+    else:
+        base = datetime.datetime(1899, 12, 30)
+    seconds = round(serial * 86400)
+    value = base + datetime.timedelta(seconds=seconds)
+    return value.date() if seconds % 86400 == 0 else value
+
+def _typed_value(text, cell_type, style, shared_strings, formats):
+    """Python value of a cell from the text of its <v> and its t/s attributes"""
+    if text is None:
+        return '' if cell_type == 's' else None
+    if cell_type is None or cell_type == 'n':
+        try:
+            number = float(text)
+        except ValueError:
+            return text
+        if style in formats.date_styles:
+            try:
+                return excel_serial_to_datetime(number, formats.date1904)
+            except (OverflowError, ValueError):
+                return number
+        return number
+    if cell_type == 's':
+        try:
+            return shared_strings[int(text)]
+        except (ValueError, IndexError):
+            return text
+    if cell_type == 'b':
+        return text.strip() in ('1', 'true')
+    if cell_type == 'e':
+        return CellError(text)
+    if cell_type == 'd':
+        try:
+            return datetime.datetime.fromisoformat(text)
+        except ValueError:
+            return text
+    # 'str' (formula result) and anything unknown stay text
+    return text
+
+def _expat_typed_cells(f, shared_strings, formats):
+    """(None, dimension ref) and (row number, {col: typed value}) items
+
+    Like _expat_cells, plus inline strings (<is>), the s (style)
+    attribute and typed values from _typed_value.
+    """
+    ns = SHEET_NS[1:-1] + '}'
+    row_tag = ns + 'row'
+    cell_tag = ns + 'c'
+    value_tag = ns + 'v'
+    inline_tag = ns + 'is'
+    text_tag = ns + 't'
+    phonetic_tag = ns + 'rPh'
+    dimension_tag = ns + 'dimension'
+    column_index = COLUMN_INDEX
+
+    out = []
+    values = None
+    row_ref = None
+    row_num = 0
+    last_ref = None
+    col = -1
+    cell_type = None
+    style = 0
+    value = None
+    text = None
+    seen_value = False
+    inline = None
+    in_phonetic = False
+    nested = -1
+
+    def start(name, attrs):
+        nonlocal row_ref, last_ref, col, cell_type, style, value, text, seen_value, inline, in_phonetic
+        nonlocal nested, values
+        if nested >= 0:
+            nested += 1
+            if nested == 1:
+                if name == value_tag and not seen_value:
+                    text = ''
+                elif name == inline_tag and cell_type == 'inlineStr':
+                    inline = []
+            elif inline is not None:
+                if name == phonetic_tag:
+                    in_phonetic = True
+                elif name == text_tag and not in_phonetic:
+                    text = ''
+        elif name == cell_tag:
+            if values is None:
+                return
+            ref = attrs.get('r')
+            if ref:
+                letters = ref.rstrip('0123456789')
+                col = column_index.get(letters)
+                if col is None:
+                    col = column_letter_to_index(letters)
+                if len(letters) < len(ref):
+                    last_ref = ref
+            else:
+                col += 1
+            cell_type = attrs.get('t')
+            style = int(attrs.get('s', 0))
+            value = None
+            seen_value = False
+            inline = None
+            nested = 0
+        elif name == row_tag:
+            values = {}
+            row_ref = attrs.get('r')
+            last_ref = None
+            col = -1
+        elif name == dimension_tag:
+            out.append((None, attrs.get('ref', '')))
+
+    def end(name):
+        nonlocal row_num, value, text, seen_value, inline, in_phonetic, nested, values
+        if nested > 0:
+            nested -= 1
+            if text is not None:
+                if inline is not None and name == text_tag:
+                    inline.append(text)
+                    text = None
+                elif nested == 0 and name == value_tag:
+                    value = _typed_value(text or None, cell_type, style, shared_strings, formats)
+                    seen_value = True
+                    text = None
+            elif name == phonetic_tag:
+                in_phonetic = False
+            elif nested == 0 and inline is not None and name == inline_tag:
+                value = ''.join(inline)
+                seen_value = True
+                inline = None
+        elif nested == 0:
+            values[col] = value
+            nested = -1
+        elif name == row_tag and values is not None:
+            if last_ref:
+                row_num = int(last_ref[len(last_ref.rstrip('0123456789')):])
+            else:
+                row_num = int(row_ref) if row_ref else row_num + 1
+            out.append((row_num, values))
+            values = None
+
+    def characters(data):
+        nonlocal text
+        if text is not None:
+            text += data
+
+    parser = expat.ParserCreate(namespace_separator='}')
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = characters
+
+    while True:
+        chunk = f.read(EXPAT_CHUNK)
+        parser.Parse(chunk, not chunk)
+        if out:
+            yield from out
+            del out[:]
+        if not chunk:
+            break
+
+def iter_typed_rows(zip_file, sheet_name, shared_strings, formats=None, sheet_file=None,
+                    sparse=False, use_dimension=False):
+    """Stream worksheet rows with typed values instead of text
+
+    Numbers become float, booleans bool, error cells CellError, inline
+    and shared strings str, and numbers whose style has a date format
+    date or datetime (formats from get_cell_formats). Empty cells are
+    None. Row layout and the sparse/use_dimension options are the same
+    as iter_worksheet_rows; decoding always uses expat.
+    """
+    if formats is None:
+        formats = get_cell_formats(zip_file)
+    if sheet_file is None:
+        sheet_file = find_sheet_file(zip_file, sheet_name)
+    measure = partial(sheet_width, zip_file, sheet_file)
+    with instrument.span('xlsx.typed_rows'):
+        width = measure() if not (sparse or use_dimension) else None
+        with instrument.TimedReader(zip_file.open(sheet_file), 'xlsx.inflate') as f:
+            yield from _layout_rows(_expat_typed_cells(f, shared_strings, formats), sparse, use_dimension,
+                                    blank=None, width=width, measure=measure)
+
+def write_csv(rows, output_csv):
+    """Write rows to a CSV file and return how many were written"""
+    total_rows = 0
+    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow(row)
+            total_rows += 1
+    return total_rows
+
+# Per-process state for convert_all_sheets workers
+_worker_path = None
+_worker_zip = None
+_worker_strings = None
+_worker_cache = None
+
+def _init_worker(xlsx_file, shared_strings, cache_dir=None):
+    """Open the workbook (and the parse cache) once per worker process"""
+    global _worker_path, _worker_zip, _worker_strings, _worker_cache
+    _worker_path = xlsx_file
+    _worker_zip = zipfile.ZipFile(xlsx_file, 'r')
+    _worker_strings = shared_strings
+    _worker_cache = ParseCache(cache_dir) if cache_dir else None
+
+def _convert_sheet(sheet_name, sheet_file, output_csv, sparse, use_dimension, backend=None):
+    """Convert one sheet inside a worker process
+
+    Returns the conversion stats plus the worker's instrumentation summary
+    for this sheet, which the parent merges into its own registry.
+    """
+    instrument.reset()
+    started = time.perf_counter()
+    # Taken before any row is built: on a cache miss get_or_build reads them all
+    misses_before = _worker_strings.misses
+    rows = iter_worksheet_rows(_worker_zip, sheet_name, _worker_strings, sheet_file=sheet_file,
+                               sparse=sparse, use_dimension=use_dimension, backend=backend)
+    if _worker_cache is not None:
+        # Same key as parse_cache.load_sheet_rows
+        rows = _worker_cache.get_or_build(_worker_path, 'sheet_rows', lambda: list(rows),
+                                          sheet_name, sparse, use_dimension)
+    total_rows = write_csv(rows, output_csv)
+    decoded = _worker_strings.misses - misses_before
+    instrument.count('xlsx.strings_decoded', decoded)
+    return (sheet_name, output_csv, total_rows, time.perf_counter() - started, decoded,
+            instrument.summary())
+
+def convert_all_sheets(xlsx_file, output_dir, workers=None, sparse=False, use_dimension=False,
+                       cache_dir=None, backend=None):
+    """Convert every worksheet to its own CSV using a process pool.
+
+    Workbook metadata and shared strings are parsed once here and handed
+    to the workers. Returns (sheet_name, output_csv, rows, seconds,
+    strings_decoded) tuples in workbook order. With cache_dir, sheet rows
+    are read from and stored in the parse cache. backend selects the
+    worksheet XML decoder (see iter_worksheet_rows).
+    """
     with zipfile.ZipFile(xlsx_file, 'r') as zip_ref:
         shared_strings = get_shared_strings(zip_ref)
-        data = read_worksheet(zip_ref, sheet_name, shared_strings)
+        sheets = list_sheets(zip_ref)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(xlsx_file, shared_strings, cache_dir)) as pool:
+        futures = [
+            pool.submit(_convert_sheet, name, sheet_file, os.path.join(output_dir, f'{name}.csv'),
+                        sparse, use_dimension, backend)
+            for name, sheet_file in sheets
+        ]
+        for future in as_completed(futures):
+            *result, metrics = future.result()
+            instrument.merge(metrics)
+            results[result[0]] = tuple(result)
+
+    return [results[name] for name, _ in sheets]
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert Excel xlsx sheets to CSV')
+    parser.add_argument('xlsx_file')
+    parser.add_argument('sheet_name', nargs='?', help='Sheet to convert (omit with --all-sheets)')
+    parser.add_argument('output_csv', nargs='?', help='Output CSV (default: <sheet_name>.csv)')
+    parser.add_argument('--all-sheets', action='store_true',
+                        help='Convert every sheet in parallel, one CSV per sheet')
+    parser.add_argument('--output-dir', default='.', help='Output directory for --all-sheets')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for --all-sheets (default: CPU count)')
+    parser.add_argument('--sparse', action='store_true',
+                        help='Trim rows after their last non-empty cell and collapse blank rows')
+    parser.add_argument('--use-dimension', action='store_true',
+                        help="Trust the sheet's <dimension>: stream rows at its width and drop cells outside it")
+    parser.add_argument('--xml-backend', choices=XML_BACKENDS, default=DEFAULT_XML_BACKEND,
+                        help=f'Worksheet XML decoder (default: {DEFAULT_XML_BACKEND})')
+    parser.add_argument('--cache-dir', help='Parse cache directory (default: $POSTO_CACHE_DIR, off if unset)')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrument.run('xlsx_to_csv', args):
+        convert(parser, args)
+
+def convert(parser, args):
+    """Run the conversion described by the parsed command line"""
+    cache = open_cache(args.cache_dir)
+
+    if args.all_sheets:
+        started = time.perf_counter()
+        results = convert_all_sheets(args.xlsx_file, args.output_dir, args.workers,
+                                     args.sparse, args.use_dimension,
+                                     cache.directory if cache else None, args.xml_backend)
+        for sheet_name, output_csv, total_rows, seconds, decoded in results:
+            print(f"{sheet_name}: {total_rows} rows -> {output_csv} "
+                  f"({seconds:.3f}s, {decoded} strings decoded)")
+        print(f"Converted {len(results)} sheets in {time.perf_counter() - started:.3f}s")
+        return
 
-        # Write to CSV
-        with open(output_csv, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerows(data)
+    if not args.sheet_name:
+        parser.error('sheet_name is required unless --all-sheets is given')
 
-        print(f"Successfully converted {sheet_name} to {output_csv}")
-        print(f"Total rows: {len(data)}")
+    output_csv = args.output_csv or f'{args.sheet_name}.csv'
+
+    with zipfile.ZipFile(args.xlsx_file, 'r') as zip_ref:
+        shared_strings = get_shared_strings(zip_ref)
+
+        # Stream rows straight into the CSV writer
+        rows = iter_worksheet_rows(zip_ref, args.sheet_name, shared_strings,
+                                   sparse=args.sparse, use_dimension=args.use_dimension,
+                                   backend=args.xml_backend)
+        if cache is not None:
+            # Same key as parse_cache.load_sheet_rows
+            rows = cache.get_or_build(args.xlsx_file, 'sheet_rows', lambda: list(rows),
+                                      args.sheet_name, args.sparse, args.use_dimension)
+        total_rows = write_csv(rows, output_csv)
+
+    print(f"Successfully converted {args.sheet_name} to {output_csv}")
+    print(f"Total rows: {total_rows}")
+
+    stats = shared_strings.stats()
+    instrument.count('xlsx.strings_decoded', stats['decoded'])
+    print(f"Shared strings: {stats['decoded']} of {stats['total']} decoded "
+          f"({stats['hits']} hits, {stats['misses']} misses)")
+    if cache is not None:
+        print(f"Parse cache: {cache.hits} hits, {cache.misses} misses")
+
+if __name__ == '__main__':
+    main()
@@ -2,140 +2,67 @@
 """
 Análise Exploratória da Planilha de Janeiro
 Script para calcular lucro total do mês
+
+Uso: python3 analyze_january.py [mes_01.csv | planilha.xlsx ["Mes, 01."]]
 """
 
-import csv
-from collections import defaultdict
+import argparse
+import os
+import sys
 
-# Mapeamento de colunas baseado na estrutura do arquivo
-def parse_row(row, is_monthly=False):
-    """Parse uma linha do CSV"""
-    return row
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'docs', 'data'))
+import instrument
+from aggregate import top_k
+from extract_spec import MONTH_SPEC, extract_month
+from parse_cache import load_csv_rows, load_sheet_rows, open_cache
 
-def analyze_january():
-    """Analisa dados de janeiro"""
-    
-    with open('/home/thygas/.gemini/antigravity/scratch/Posto-Providencia/docs/data/mes_01.csv', 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
-    
-    # Extrair dados do resumo mensal (Caixa Dia 01 a 31)
-    monthly_summary = {}
-    
-    for i, row in enumerate(rows):
-        if len(row) > 1 and 'Caixa Dia 01 a 31' in row[1]:
-            # Encontrou resumo mensal, extrair dados relevantes
-            for j in range(i, min(i+50, len(rows))):
-                r = rows[j]
-                
-                # Venda Concentrador - Total
-                if len(r) > 2 and 'Total.' in r[2]:
-                    try:
-                        venda_concentrador = float(r[6]) if r[6] else 0
-                        print(f"✓ Venda Concentrador Total: R$ {venda_concentrador:,.2f}")
-                    except:
-                        pass
-                
-                # Total Líquido (após taxas de cartão)
-                if len(r) > 7 and 'Total Liquido' in r[7]:
-                    try:
-                        total_liquido = float(r[8]) if r[8] else 0
-                        print(f"✓ Total Líquido (após taxas): R$ {total_liquido:,.2f}")
-                    except:
-                        pass
-                
-                # Despesas com taxas de cartão
-                if len(r) > 7 and 'Total.' in r[7]:
-                    try:
-                        taxas_cartao = float(r[6]) if r[6] else 0
-                        if taxas_cartao > 0:
-                            print(f"✓ Despesas Taxas de Cartão: R$ {taxas_cartao:,.2f}")
-                    except:
-                        pass
-                
-                # Venda Frentistas - Total
-                if len(r) > 1 and 'Venda Frentistas.' in r[2]:
-                    try:
-                        # A coluna final (última não vazia) contém o total
-                        for val in reversed(r):
-                            if val and val != '0' and val != '1' and val != '#DIV/0!':
-                                try:
-                                    venda_frentistas = float(val)
-                                    if venda_frentistas > 10000:  # valor plausível
-                                        print(f"✓ Venda Frentistas Total: R$ {venda_frentistas:,.2f}")
-                                        break
-                                except:
-                                    pass
-                    except:
-                        pass
-                
-                # Salário Pago
-                if len(r) > 1 and 'Salario Pago' in r[2]:
-                    try:
-                        # Última coluna numérica é o total
-                        for val in reversed(r):
-                            if val and val != '0' and val != '1':
-                                try:
-                                    salario_total = float(val)
-                                    if salario_total > 0:
-                                        print(f"✓ Salário Pago (Total): R$ {salario_total:,.2f}")
-                                        break
-                                except:
-                                    pass
-                    except:
-                        pass
-                
-                # Concentrador x Frentista
-                if len(r) > 2 and 'Concentrador x Frentista' in r[2]:
-                    try:
-                        diferenca = float(r[3]) if r[3] else 0
-                        print(f"✓ Diferença Concentrador x Frentista: R$ {diferenca:,.2f}")
-                    except:
-                        pass
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'docs', 'data', 'mes_01.csv')
+DEFAULT_SHEET = 'Mes, 01.'
+
+# Métricas do resumo mensal exibidas, na ordem (nomes de extract_spec.MONTH_SPEC)
+RESUMO = (
+    ('venda_concentrador', 'Venda Concentrador Total'),
+    ('total_liquido', 'Total Líquido (após taxas)'),
+    ('taxas_cartao', 'Despesas Taxas de Cartão'),
+    ('venda_frentistas', 'Venda Frentistas Total'),
+    ('salarios', 'Salário Pago (Total)'),
+    ('diferenca', 'Diferença Concentrador x Frentista'),
+)
+
+def analyze_january(filename=DEFAULT_CSV, sheet_name=DEFAULT_SHEET):
+    """Analisa dados de janeiro (CSV ou direto da aba de uma planilha .xlsx)"""
+    
+    # Cache opcional em $POSTO_CACHE_DIR
+    if filename.lower().endswith('.xlsx'):
+        rows = load_sheet_rows(filename, sheet_name, open_cache())
+    else:
+        rows = load_csv_rows(filename, open_cache())
+    
+    # Todas as métricas diárias e do resumo mensal numa única passada
+    extracao = extract_month(rows)
+    resumo = extracao.month_summary()
+
+    if resumo is not None:
+        for metrica, titulo in RESUMO:
+            if metrica in resumo:
+                print(f"✓ {titulo}: R$ {resumo[metrica]:,.2f}")
+
+    # Rótulos da especificação que algum bloco preenchido não tinha
+    faltando = extracao.missing_labels(MONTH_SPEC)
+    if faltando:
+        print("\n⚠ Rótulos não encontrados: " + ", ".join(f"{nome} ({n} blocos)" for nome, n in faltando.items()))
+    if extracao.empty:
+        print(f"\nBlocos vazios: {len(extracao.empty)}")
     
     # Análise diária
     print("\n" + "="*60)
     print("ANÁLISE DIÁRIA (Dias 1-24)")
     print("="*60)
     
-    vendas_dia = []
-    taxas_dia = []
-    
-    for i, row in enumerate(rows):
-        if len(row) > 1 and 'Caixa Dia' in row[1] and '01 a 31' not in row[1]:
-            dia_num = row[1].split()[2] if len(row[1].split()) > 2 else "?"
-            
-            # Buscar venda total do dia
-            for j in range(i+5, min(i+40, len(rows))):
-                r = rows[j]
-                
-                # Venda Concentrador Total
-                if len(r) > 2 and 'Total.' in r[2]:
-                    try:
-                        venda = float(r[6]) if r[6] else 0
-                        if venda > 0:
-                            vendas_dia.append((dia_num, venda))
-                    except:
-                        pass
-                    break
-    
-    # Extrair taxas de cada dia
-    for i, row in enumerate(rows):
-        if len(row) > 1 and 'Caixa Dia' in row[1] and '01 a 31' not in row[1]:
-            dia_num = row[1].split()[2] if len(row[1].split()) > 2 else "?"
-            
-            for j in range(i+10, min(i+30, len(rows))):
-                r = rows[j]
-                
-                # Total das taxas
-                if len(r) > 7 and 'Total.' in r[7]:
-                    try:
-                        taxa = float(r[6]) if r[6] else 0
-                        if taxa > 0:
-                            taxas_dia.append((dia_num, taxa))
-                    except:
-                        pass
-                    break
+    vendas_dia = [(f"{dia:02d}", m['venda_concentrador']) for dia, m in sorted(extracao.days.items())
+                  if m.get('venda_concentrador', 0) > 0]
+    taxas_dia = [(f"{dia:02d}", m['taxas_cartao']) for dia, m in sorted(extracao.days.items())
+                 if m.get('taxas_cartao', 0) > 0]
     
     # Resumo dos dias válidos
     print(f"\nTotal de dias analisados: {len(vendas_dia)}")
@@ -150,18 +77,25 @@ def analyze_january():
     
     # Top 5 dias por vendas
     print("\nTop 5 Dias por Vendas:")
-    vendas_dia.sort(key=lambda x: x[1], reverse=True)
-    for dia, valor in vendas_dia[:5]:
+    for dia, valor in top_k([d for d, _ in vendas_dia], [v for _, v in vendas_dia], 5):
         print(f"  Dia {dia}: R$ {valor:,.2f}")
     
     print("\n" + "="*60)
     print("CÁLCULO DO LUCRO")
     print("="*60)
     
-    # Usando dados do resumo mensal
-    venda_total = 292105.64  # Venda Concentrador total (receita bruta)
-    taxas_total = 1537.98  # Taxas de cartão
-    salario_total = 8647.77  # Salários pagos
+    # Mesmo cálculo do analyze_year.py, a partir da mesma extração: resumo
+    # mensal quando preenchido, senão a soma dos dias válidos
+    if resumo is not None and resumo.get('venda_concentrador', 0) > 0:
+        venda_total = resumo['venda_concentrador']  # Venda Concentrador total (receita bruta)
+        taxas_total = resumo.get('taxas_cartao', 0.0)  # Taxas de cartão
+    else:
+        validos = [m for m in extracao.days.values()
+                   if m.get('venda_concentrador', 0) > 0 and m.get('litros', 0) > 0]
+        venda_total = sum(m['venda_concentrador'] for m in validos)
+        taxas_total = sum(m.get('taxas_cartao', 0.0) for m in validos)
+    # Salários pagos, do mesmo bloco de resumo da receita
+    salario_total = resumo.get('salarios', 0.0) if resumo is not None else 0.0
     
     print(f"\n1. Receita Bruta (Venda Concentrador): R$ {venda_total:,.2f}")
     print(f"2. (-) Despesas Taxas de Cartão: R$ {taxas_total:,.2f}")
@@ -187,8 +121,15 @@ def analyze_january():
     }
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Análise exploratória de janeiro')
+    parser.add_argument('arquivo', nargs='?', default=DEFAULT_CSV, help='CSV do mês ou planilha .xlsx')
+    parser.add_argument('aba', nargs='?', default=DEFAULT_SHEET, help='Aba da planilha .xlsx')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
     print("="*60)
     print("ANÁLISE EXPLORATÓRIA - POSTO JORRO - JANEIRO 2026")
     print("="*60)
     
-    resultado = analyze_january()
+    with instrument.run('analyze_january', args):
+        resultado = analyze_january(args.arquivo, args.aba)
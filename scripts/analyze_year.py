@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Análise de vários meses (ano inteiro) da planilha do posto
+Calcula receita, taxas de cartão, salários, lucro e margem por mês e
+acumulado no ano, a partir de CSVs mensais ou direto de uma planilha .xlsx.
+Os meses são processados em paralelo.
+
+Uso:
+    python3 analyze_year.py mes_01.csv mes_02.csv ...
+    python3 analyze_year.py "Posto,Jorro, 2026.xlsx" [--sheets "Mes, 01." "Mes, 02."]
+"""
+
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'docs', 'data'))
+from month_model import MONTH_SHEET_RE
+from parse_cache import load_month_model, load_sheet_model, open_cache
+from xlsx_to_csv import list_sheets
+
+def month_summary_block(model):
+    """Bloco de resumo que cobre o mês (o que termina mais tarde e é mais largo)"""
+    if not model.summaries:
+        return None
+    key = max(model.summaries, key=lambda k: (k[1], k[1] - k[0]))
+    return model.summaries[key]
+
+def analyze_model(label, model):
+    """Calcula os indicadores de um mês já parseado"""
+    # Dias válidos: com venda e litragem positivas (dias em branco ou
+    # parcialmente preenchidos ficam de fora)
+    dias = [(dia, b.venda, b.taxas) for dia, b in sorted(model.days.items())
+            if b.venda > 0 and b.litros > 0]
+
+    resumo = month_summary_block(model)
+    if resumo is not None and resumo.venda > 0:
+        receita = resumo.venda
+        taxas = resumo.taxas
+    else:
+        receita = sum(v for _, v, _ in dias)
+        taxas = sum(t for _, _, t in dias)
+
+    # Salários do mesmo bloco de resumo da receita: somar todos os blocos
+    # contaria duas vezes um resumo parcial ("01 a 15") coberto pelo mensal
+    salarios = 0.0
+    if resumo is not None and resumo.frentistas is not None:
+        salarios = resumo.frentistas.caixa.get('Salario Pago', 0.0)
+
+    lucro = receita - taxas - salarios
+    margem = (lucro / receita) * 100 if receita > 0 else 0
+
+    melhor_dia = max(dias, key=lambda d: d[1]) if dias else None
+
+    return {
+        'mes': label,
+        'dias': len(dias),
+        'receita': receita,
+        'taxas': taxas,
+        'salarios': salarios,
+        'lucro': lucro,
+        'margem': margem,
+        'melhor_dia': melhor_dia[:2] if melhor_dia else None,
+    }
+
+def analyze_task(task, cache_dir=None):
+    """Executa uma tarefa ('csv', caminho, rótulo) ou ('xlsx', caminho, aba, rótulo)"""
+    started = time.perf_counter()
+    cache = open_cache(cache_dir)
+    if task[0] == 'csv':
+        _, path, label = task
+        model = load_month_model(path, cache)
+    else:
+        _, path, sheet_name, label = task
+        model = load_sheet_model(path, sheet_name, cache)
+    result = analyze_model(label, model)
+    result['segundos'] = time.perf_counter() - started
+    return result
+
+def collect_tasks(paths, sheets=None):
+    """Monta a lista de meses a analisar, na ordem dos argumentos"""
+    tasks = []
+    for path in paths:
+        if path.lower().endswith('.xlsx'):
+            with zipfile.ZipFile(path, 'r') as zip_ref:
+                names = [name for name, _ in list_sheets(zip_ref)]
+            if sheets:
+                selected = [name for name in names if name in sheets]
+            else:
+                selected = [name for name in names if MONTH_SHEET_RE.match(name)]
+            for name in selected:
+                tasks.append(('xlsx', path, name, name))
+        else:
+            tasks.append(('csv', path, os.path.splitext(os.path.basename(path))[0]))
+    return tasks
+
+def analyze_tasks(tasks, workers=None, cache_dir=None):
+    """Analisa os meses em paralelo, devolvendo os resultados na ordem das tarefas"""
+    if len(tasks) <= 1 or workers == 1:
+        return [analyze_task(task, cache_dir) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(analyze_task, tasks, [cache_dir] * len(tasks)))
+
+def print_report(results):
+    """Imprime o resultado de cada mês e o acumulado no ano"""
+    print("=" * 100)
+    print(f"{'Mês':<14}{'Dias':>5}{'Receita':>16}{'Taxas':>13}{'Salários':>13}"
+          f"{'Lucro':>16}{'Margem':>9}{'Acum. Lucro':>16}")
+    print("-" * 100)
+
+    acumulado = {'receita': 0.0, 'taxas': 0.0, 'salarios': 0.0, 'lucro': 0.0, 'dias': 0}
+    for r in results:
+        for key in acumulado:
+            acumulado[key] += r[key]
+        print(f"{r['mes']:<14}{r['dias']:>5}{r['receita']:>16,.2f}{r['taxas']:>13,.2f}"
+              f"{r['salarios']:>13,.2f}{r['lucro']:>16,.2f}{r['margem']:>8.2f}%"
+              f"{acumulado['lucro']:>16,.2f}")
+
+    margem = (acumulado['lucro'] / acumulado['receita']) * 100 if acumulado['receita'] > 0 else 0
+    print("-" * 100)
+    print(f"{'Acumulado':<14}{acumulado['dias']:>5}{acumulado['receita']:>16,.2f}"
+          f"{acumulado['taxas']:>13,.2f}{acumulado['salarios']:>13,.2f}"
+          f"{acumulado['lucro']:>16,.2f}{margem:>8.2f}%")
+    print("=" * 100)
+
+    return dict(acumulado, margem=margem)
+
+def main():
+    parser = argparse.ArgumentParser(description='Análise mensal e acumulada no ano')
+    parser.add_argument('paths', nargs='+', help='CSVs mensais e/ou planilhas .xlsx')
+    parser.add_argument('--sheets', nargs='+', help='Abas do .xlsx (padrão: todas as abas "Mes, NN")')
+    parser.add_argument('--workers', type=int, default=None, help='Processos em paralelo (padrão: nº de CPUs)')
+    parser.add_argument('--cache-dir', help='Cache de planilhas já lidas (padrão: $POSTO_CACHE_DIR)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tasks = collect_tasks(args.paths, args.sheets)
+    if not tasks:
+        print("Nenhum mês encontrado")
+        sys.exit(1)
+
+    results = analyze_tasks(tasks, args.workers, args.cache_dir)
+    print_report(results)
+
+    for r in results:
+        if r['melhor_dia']:
+            dia, valor = r['melhor_dia']
+            print(f"{r['mes']}: melhor dia {dia:02d} (R$ {valor:,.2f}), {r['segundos'] * 1000:.0f} ms")
+    print(f"\n{len(results)} meses analisados em {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+-- Migration: Unique (fechamento_id, frentista_id) on FechamentoFrentista
+-- Date: 2026-02-03
+-- Description: Um frentista tem no máximo um registro por fechamento.
+--              Permite o upsert em lote do migrate_frentista.py com
+--              INSERT ... ON CONFLICT ("fechamento_id", "frentista_id") DO UPDATE.
+--              Duplicatas existentes precisam ser resolvidas antes de aplicar.
+
+CREATE UNIQUE INDEX IF NOT EXISTS "FechamentoFrentista_fechamento_frentista_key"
+ON "FechamentoFrentista" ("fechamento_id", "frentista_id");